@@ -0,0 +1,165 @@
+# N parallel feed requests against the app in each database mode.
+#
+#   blocking    sync Session queried directly on the event loop (before run_db)
+#   threadpool  sync Session through run_db (DATABASE_ASYNC=false, the default)
+#   async       AsyncSession through run_db (DATABASE_ASYNC=true, aiosqlite)
+#
+# The feed cache is bypassed so every request queries the database. Reports
+# request latency and the longest event-loop stall seen while the requests
+# were in flight.
+#
+# Usage (from the backend directory):
+#   python benchmarks/bench_db_concurrency.py [--plays 100000] [--requests 200] [--concurrency 10]
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+MODES = ["blocking", "threadpool", "async"]
+WEEK = 3
+
+class UncachedFeeds:
+    """Feed cache stand-in that builds every page from the database"""
+
+    def lookup(self, key):
+        return None
+
+    def fetch(self, db, key, build):
+        from services.feed_cache import FeedEntry, make_etag
+
+        items, next_cursor = build(db)
+        body = json.dumps(items, separators=(",", ":")).encode()
+        return FeedEntry(0, make_etag(body), body, next_cursor)
+
+def seed_database(path: str, plays: int) -> None:
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from benchmarks.bench_highlight_feed import seed
+    from database import Base
+    from migrations import backfill_roster_highlights
+    from models import League, Roster, User
+
+    engine = create_engine(os.environ["DATABASE_URL"])
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as session:
+        seed(session, plays)
+        user = User(email="bench@example.com", username="bench", hashed_password="x")
+        session.add(user)
+        session.flush()
+        session.add(League(id=1, user_id=user.id, sleeper_league_id="1", name="Bench", season="2024",
+                           scoring_settings={}))
+        session.add(Roster(league_id=1, week=WEEK, player_ids=[str(player_id) for player_id in range(0, 1800, 30)]))
+        session.commit()
+    # The roster's feed is the plays saved for it
+    backfill_roster_highlights(engine)
+    engine.dispose()
+
+async def run_requests(mode: str, requests: int, concurrency: int) -> dict:
+    import httpx
+    import main
+    from database import SessionLocal
+    from models import User
+    from routers import auth, highlights
+
+    with SessionLocal() as session:
+        user = session.query(User).first()
+        session.expunge(user)
+    main.app.dependency_overrides[auth.get_current_user] = lambda: user
+    highlights.get_feed_cache = UncachedFeeds
+
+    if mode == "blocking":
+        # What the handlers did before: run the query on the event loop
+        async def run_on_loop(db, fn, *args):
+            return fn(db, *args)
+        highlights.run_db = run_on_loop
+
+    # Longest gap between ticks of a 5 ms timer while requests run
+    stall = {"max": 0.0}
+    done = asyncio.Event()
+
+    async def ticker():
+        loop = asyncio.get_running_loop()
+        last = loop.time()
+        while not done.is_set():
+            await asyncio.sleep(0.005)
+            now = loop.time()
+            stall["max"] = max(stall["max"], now - last - 0.005)
+            last = now
+
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one_request():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(f"/api/highlights/league/1/week/{WEEK}")
+                response.raise_for_status()
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        # Warm up connections and caches
+        await one_request()
+        latencies.clear()
+
+        ticker_task = asyncio.create_task(ticker())
+        start = time.perf_counter()
+        await asyncio.gather(*(one_request() for _ in range(requests)))
+        wall = time.perf_counter() - start
+        done.set()
+        await ticker_task
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "requests_per_second": requests / wall,
+        "p50_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        "max_loop_stall_ms": stall["max"] * 1000,
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--plays", type=int, default=100000)
+    parser.add_argument("--requests", type=int, default=200)
+    # Keep below the pool size (5 + 10 overflow): in blocking mode a request waiting
+    # for a connection stalls the loop that would release one
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--database", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        # Child process: the database mode is fixed when database.py is imported
+        print(json.dumps(asyncio.run(run_requests(args.mode, args.requests, args.concurrency))))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "bench.db")
+        seed_database(path, args.plays)
+        print(f"seeded {args.plays} plays; {args.requests} feed requests, {args.concurrency} at a time")
+        print(f"{'mode':12}{'req/s':>8}{'p50 ms':>10}{'p95 ms':>10}{'max stall ms':>14}")
+
+        for mode in MODES:
+            env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}",
+                       DATABASE_ASYNC="true" if mode == "async" else "false",
+                       YOUTUBE_API_KEY=os.getenv("YOUTUBE_API_KEY", "unused"))
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--mode", mode, "--database", path,
+                 "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+                cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:12}{result['requests_per_second']:8.1f}{result['p50_ms']:10.1f}"
+                  f"{result['p95_ms']:10.1f}{result['max_loop_stall_ms']:14.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+# Compare the highlight feed query with the previous per-play clip lookups.
+#
+# Seeds a throwaway SQLite database with 100k plays (one clip each for a
+# third of them) and reports queries per request and p95 latency, for a
+# whole week and for one roster's feed.
+#
+# Usage (from the backend directory):
+#   python benchmarks/bench_highlight_feed.py [--plays 100000] [--repeat 50]
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.fixtures import TEAMS
+from database import Base
+from models import Clip, Play, PlayPlayer
+from routers.highlights import HighlightResponse
+from services.highlight_feed import highlight_feed_query, involving_players, paginate
+
+WEEKS = 18
+
+def seed(session, plays: int) -> None:
+    rows = []
+    for index in range(plays):
+        week = index % WEEKS + 1
+        away, home = TEAMS[index % 16 * 2], TEAMS[index % 16 * 2 + 1]
+        rows.append({
+            'game_id': f"2024_{week:02d}_{away}_{home}",
+            'play_id': f"2024_{week:02d}_{away}_{home}_{index}",
+            'week': week,
+            'season': '2024',
+            'quarter': index % 4 + 1,
+            'game_clock': str(float(3600 - index % 3600)),
+            'team': away,
+            'home_team': home,
+            'away_team': away,
+            'player_ids': [str(index % 1800), str((index + 7) % 1800)],
+            'event_type': 'pass' if index % 2 else 'run',
+            'yards_gained': index % 60,
+            'fantasy_points': (index % 60) / 10,
+            'is_highlight_worthy': True
+        })
+    session.execute(insert(Play), rows)
+    session.execute(insert(PlayPlayer), [
+        {'play_id': play_id, 'player_id': player_id, 'season': row['season'], 'week': row['week']}
+        for play_id, row in enumerate(rows, start=1)
+        for player_id in row['player_ids']
+    ])
+    session.execute(insert(Clip), [
+        {
+            'play_id': play_id,
+            'provider': 'youtube',
+            'url': f"https://www.youtube.com/watch?v={play_id}",
+            'embed_url': f"https://www.youtube.com/embed/{play_id}",
+            'start_sec': play_id % 600,
+            'end_sec': play_id % 600 + 30,
+            'confidence': 0.8
+        }
+        for play_id in range(1, plays + 1, 3)
+    ])
+    session.commit()
+
+def legacy_feed(session, week: int) -> List[Dict]:
+    """The week endpoint before eager loading: one clip query per play, dicts built by hand"""
+    result = []
+    for highlight in session.query(Play).filter(Play.week == week, Play.is_highlight_worthy == True).all():
+        clips = session.query(Clip).filter(Clip.play_id == highlight.id).all()
+        result.append(HighlightResponse.model_validate({
+            'id': highlight.id,
+            'game_id': highlight.game_id,
+            'play_id': highlight.play_id,
+            'week': highlight.week,
+            'quarter': highlight.quarter,
+            'game_clock': highlight.game_clock,
+            'team': highlight.team,
+            'player_ids': highlight.player_ids,
+            'event_type': highlight.event_type,
+            'yards_gained': highlight.yards_gained,
+            'fantasy_points': highlight.fantasy_points,
+            'is_highlight_worthy': highlight.is_highlight_worthy,
+            'clips': [
+                {
+                    'id': clip.id,
+                    'provider': clip.provider,
+                    'url': clip.url,
+                    'embed_url': clip.embed_url,
+                    'start_sec': clip.start_sec,
+                    'end_sec': clip.end_sec,
+                    'confidence': clip.confidence
+                }
+                for clip in clips
+            ]
+        }).model_dump())
+    return result
+
+def feed_page(session, week: int, limit: int) -> List[Dict]:
+    plays, _ = paginate(highlight_feed_query(session).filter(Play.week == week), None, limit)
+    return [HighlightResponse.model_validate(play).model_dump() for play in plays]
+
+def roster_feed_page(session, week: int, roster: List[str], limit: int) -> List[Dict]:
+    query = involving_players(highlight_feed_query(session), roster, week, '2024')
+    plays, _ = paginate(query, None, limit)
+    return [HighlightResponse.model_validate(play).model_dump() for play in plays]
+
+def measure(session_factory, counter: Dict, fn, repeat: int):
+    """(queries per call, p50 ms, p95 ms) over fresh sessions"""
+    timings = []
+    queries = 0
+    for _ in range(repeat):
+        session = session_factory()
+        counter['queries'] = 0
+        start = time.perf_counter()
+        fn(session)
+        timings.append((time.perf_counter() - start) * 1000)
+        queries = counter['queries']
+        session.close()
+    timings.sort()
+    return queries, timings[len(timings) // 2], timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--plays", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(bind=engine)
+
+        start = time.perf_counter()
+        with session_factory() as session:
+            seed(session, args.plays)
+        print(f"seeded {args.plays} plays in {time.perf_counter() - start:.1f}s")
+
+        counter = {'queries': 0}
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def count_query(*_):
+            counter['queries'] += 1
+
+        week = 3
+        legacy = measure(session_factory, counter, lambda session: legacy_feed(session, week)[:args.limit],
+                         max(1, args.repeat // 10))
+        paged = measure(session_factory, counter, lambda session: feed_page(session, week, args.limit),
+                        args.repeat)
+        roster = [str(player_id) for player_id in range(0, 1800, 113)]
+        roster_feed = measure(session_factory, counter,
+                              lambda session: roster_feed_page(session, week, roster, args.limit), args.repeat)
+        full = measure(session_factory, counter, lambda session: feed_page(session, week, args.plays),
+                       max(1, args.repeat // 10))
+
+        print(f"plays in week {week}: {args.plays // WEEKS}")
+        print(f"{'':24}{'queries':>8}{'p50 ms':>10}{'p95 ms':>10}")
+        print(f"{'per-play clip queries':24}{legacy[0]:8d}{legacy[1]:10.1f}{legacy[2]:10.1f}")
+        print(f"{'eager, whole week':24}{full[0]:8d}{full[1]:10.1f}{full[2]:10.1f}")
+        print(f"{f'eager, page of {args.limit}':24}{paged[0]:8d}{paged[1]:10.1f}{paged[2]:10.1f}")
+        print(f"{f'roster of {len(roster)} players':24}{roster_feed[0]:8d}{roster_feed[1]:10.1f}{roster_feed[2]:10.1f}")
+        engine.dispose()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# Compare live ingestion ticks with re-running the whole-week batch on every poll.
+#
+# Replays a synthetic week (16 games) a few plays per game per tick into a
+# throwaway SQLite database, and reports per-tick latency as the games
+# progress: the live ingestor only routes the new plays, the batch path
+# re-scans and re-saves every play since kickoff.
+#
+# Usage (from the backend directory):
+#   python benchmarks/bench_live_ingestion.py [--leagues 200] [--plays-per-tick 10]
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.orm import selectinload, sessionmaker
+
+from benchmarks.fixtures import make_roster, make_week_pbp
+from database import Base
+from models import League, Play, Roster, User
+from services.highlight_service import HighlightService
+from services.live_ingestion import FileReplaySource, LiveIngestor
+from services.player_crosswalk import get_player_crosswalk
+
+SEASON, WEEK = 2024, 1
+
+def make_session_factory(path: str, leagues: int, roster: List[str]):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    with session_factory() as session:
+        user = User(email="bench", username="bench", hashed_password="x")
+        session.add(user)
+        session.flush()
+        for index in range(leagues):
+            league = League(user_id=user.id, sleeper_league_id=str(index), name=f"L{index}",
+                            season=str(SEASON), scoring_settings={})
+            session.add(league)
+            session.flush()
+            # Overlapping rosters drawn from the players that appear in the week
+            player_ids = [roster[(index * 3 + offset) % len(roster)] for offset in range(15)]
+            session.add(Roster(league_id=league.id, week=WEEK, player_ids=player_ids))
+        session.commit()
+    return engine, session_factory
+
+async def run_live(session_factory, path: str, plays_per_tick: int) -> List[float]:
+    timings = []
+    with session_factory() as session:
+        ingestor = LiveIngestor(session, FileReplaySource(path, plays_per_tick), SEASON, WEEK,
+                                resolve_clips=False)
+        while True:
+            start = time.perf_counter()
+            stats = await ingestor.tick()
+            if not stats['new_plays']:
+                return timings
+            timings.append((time.perf_counter() - start) * 1000)
+
+async def run_rebatch(session_factory, weekly_pbp: pd.DataFrame, plays_per_tick: int) -> List[float]:
+    """The batch path run on every poll: all plays released so far, from kickoff"""
+    timings = []
+    games = [game_plays for _, game_plays in weekly_pbp.groupby('game_id', sort=False)]
+    released = 0
+    with session_factory() as session:
+        rosters = session.query(Roster).options(selectinload(Roster.league)).all()
+        while released < max(len(game_plays) for game_plays in games):
+            released += plays_per_tick
+            start = time.perf_counter()
+            so_far = pd.concat([game_plays.iloc[:released] for game_plays in games], ignore_index=True)
+            highlight_service = HighlightService(session)
+            highlights_by_roster = highlight_service.route_plays(so_far, rosters, SEASON, WEEK)
+            await highlight_service.save_highlights_to_db(highlights_by_roster)
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--leagues", type=int, default=200)
+    parser.add_argument("--plays-per-tick", type=int, default=10)
+    args = parser.parse_args()
+
+    weekly_pbp = make_week_pbp(SEASON, WEEK)
+    gsis_roster = make_roster(weekly_pbp, size=60)
+    # Rosters hold Sleeper ids; the crosswalk maps them to the GSIS ids in play-by-play
+    roster = [f"S{index}" for index in range(len(gsis_roster))]
+    get_player_crosswalk()._set_index(dict(zip(roster, gsis_roster)), time.time())
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        replay_path = os.path.join(tmp_dir, "week.parquet")
+        weekly_pbp.to_parquet(replay_path, index=False)
+
+        live_engine, live_sessions = make_session_factory(os.path.join(tmp_dir, "live.db"), args.leagues, roster)
+        batch_engine, batch_sessions = make_session_factory(os.path.join(tmp_dir, "batch.db"), args.leagues, roster)
+
+        live = asyncio.run(run_live(live_sessions, replay_path, args.plays_per_tick))
+        rebatch = asyncio.run(run_rebatch(batch_sessions, weekly_pbp, args.plays_per_tick))
+
+        with live_sessions() as live_session, batch_sessions() as batch_session:
+            live_plays = sorted(key for (key,) in live_session.query(Play.play_id))
+            batch_plays = sorted(key for (key,) in batch_session.query(Play.play_id))
+
+        print(f"plays in week: {len(weekly_pbp)}, leagues: {args.leagues}, "
+              f"plays per game per tick: {args.plays_per_tick}, ticks: {len(live)}")
+        print(f"highlights saved: live {len(live_plays)}, batch {len(batch_plays)}, "
+              f"same plays: {live_plays == batch_plays}")
+        print(f"{'tick':>6}{'live ms':>10}{'re-batch ms':>13}")
+        for index in sorted({0, len(live) // 4, len(live) // 2, 3 * len(live) // 4, len(live) - 1}):
+            print(f"{index + 1:6d}{live[index]:10.1f}{rebatch[index]:13.1f}")
+        print(f"{'total':>6}{sum(live):10.1f}{sum(rebatch):13.1f}")
+        live_engine.dispose()
+        batch_engine.dispose()
+
+if __name__ == "__main__":
+    main()
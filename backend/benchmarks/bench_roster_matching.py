@@ -0,0 +1,225 @@
+# Compare the vectorized roster matcher with the original iterrows() loop.
+#
+# Timings are against a verbatim copy of the baseline implementation
+# (BaselineHighlightService). The highlight rules and scoring have changed
+# since, so its output is not comparable; correctness is checked against a
+# per-play loop that applies today's rules instead.
+#
+# Usage (from the backend directory):
+#   python benchmarks/bench_roster_matching.py [--repeat 20]
+
+import argparse
+import math
+import os
+import sys
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import make_roster, make_week_pbp
+from services.highlight_service import HighlightService
+
+class BaselineHighlightService:
+    """HighlightService.is_highlight_worthy, calculate_fantasy_points and the
+    process_roster_highlights loop as they were before vectorization (verbatim)"""
+    
+    def is_highlight_worthy(self, play_data: Dict) -> bool:
+        """Determine if a play is highlight-worthy based on fantasy relevance"""
+        event_type = play_data.get('play_type', '')
+        yards_gained = play_data.get('yards_gained', 0)
+        
+        # Touchdowns are always highlight-worthy
+        if 'touchdown' in event_type.lower():
+            return True
+        
+        # Big plays (20+ yards)
+        if yards_gained and yards_gained >= 20:
+            return True
+        
+        # Interceptions and fumbles
+        if event_type in ['pass_interception', 'fumble']:
+            return True
+        
+        # Sacks
+        if event_type == 'pass_sack':
+            return True
+        
+        # Field goals (40+ yards)
+        if event_type == 'field_goal' and yards_gained and yards_gained >= 40:
+            return True
+        
+        return False
+    
+    def calculate_fantasy_points(self, play_data: Dict, scoring_settings: Dict = None) -> float:
+        """Calculate fantasy points for a play"""
+        if not scoring_settings:
+            # Default PPR scoring
+            scoring_settings = {
+                'pass_td': 4,
+                'rush_td': 6,
+                'rec_td': 6,
+                'pass_yd': 0.04,
+                'rush_yd': 0.1,
+                'rec_yd': 0.1,
+                'rec': 1,
+                'int': -2,
+                'fumble_lost': -2
+            }
+        
+        points = 0.0
+        event_type = play_data.get('play_type', '')
+        yards_gained = play_data.get('yards_gained', 0)
+        
+        # Touchdown points
+        if 'pass_touchdown' in event_type:
+            points += scoring_settings.get('pass_td', 4)
+        elif 'rush_touchdown' in event_type:
+            points += scoring_settings.get('rush_td', 6)
+        elif 'receiving_touchdown' in event_type:
+            points += scoring_settings.get('rec_td', 6)
+        
+        # Yardage points
+        if 'pass' in event_type and yards_gained:
+            points += yards_gained * scoring_settings.get('pass_yd', 0.04)
+        elif 'rush' in event_type and yards_gained:
+            points += yards_gained * scoring_settings.get('rush_yd', 0.1)
+        elif 'receiving' in event_type and yards_gained:
+            points += yards_gained * scoring_settings.get('rec_yd', 0.1)
+        
+        # Reception points (PPR)
+        if 'reception' in event_type:
+            points += scoring_settings.get('rec', 1)
+        
+        # Negative points
+        if 'interception' in event_type:
+            points += scoring_settings.get('int', -2)
+        elif 'fumble' in event_type:
+            points += scoring_settings.get('fumble_lost', -2)
+        
+        return points
+    
+    def match_roster_plays(self, weekly_pbp, player_ids: List[str], season: int, week: int) -> List[Dict]:
+        highlights = []
+        
+        # Filter plays for roster players
+        for _, play in weekly_pbp.iterrows():
+            # Check if any roster player is involved
+            involved_players = []
+            for player_id in player_ids:
+                if (play.get('passer_player_id') == player_id or 
+                    play.get('rusher_player_id') == player_id or
+                    play.get('receiver_player_id') == player_id):
+                    involved_players.append(player_id)
+            
+            if involved_players:
+                play_data = {
+                    'game_id': play.get('game_id'),
+                    'play_id': play.get('play_id'),
+                    'week': week,
+                    'season': str(season),
+                    'quarter': play.get('qtr'),
+                    'game_clock': play.get('game_seconds_remaining'),
+                    'team': play.get('posteam'),
+                    'player_ids': involved_players,
+                    'play_type': play.get('play_type'),
+                    'yards_gained': play.get('yards_gained', 0),
+                    'description': play.get('desc', ''),
+                    'fantasy_points': self.calculate_fantasy_points(play.to_dict())
+                }
+                
+                if self.is_highlight_worthy(play_data):
+                    play_data['is_highlight_worthy'] = True
+                    highlights.append(play_data)
+        
+        return highlights
+
+def reference_match_roster_plays(service: HighlightService, weekly_pbp, player_ids: List[str],
+                              season: int, week: int) -> List[Dict]:
+    """The baseline's per-play loop with today's rules and scoring, to check the vectorized output"""
+    highlights = []
+    for _, play in weekly_pbp.iterrows():
+        involved_players = []
+        for player_id in player_ids:
+            if (play.get('passer_player_id') == player_id or
+                play.get('rusher_player_id') == player_id or
+                play.get('receiver_player_id') == player_id):
+                involved_players.append(player_id)
+
+        if involved_players:
+            play_data = {
+                'game_id': play.get('game_id'),
+                'play_id': play.get('play_id'),
+                'week': week,
+                'season': str(season),
+                'quarter': play.get('qtr'),
+                'game_clock': play.get('game_seconds_remaining'),
+                'team': play.get('posteam'),
+                'home_team': play.get('home_team'),
+                'away_team': play.get('away_team'),
+                'player_ids': involved_players,
+                'play_type': play.get('play_type'),
+                'yards_gained': play.get('yards_gained', 0),
+                'description': play.get('desc', ''),
+                'fantasy_points': service.calculate_fantasy_points(play.to_dict(), player_ids=involved_players),
+                'standard_points': service.calculate_fantasy_points(play.to_dict())
+            }
+
+            if service.is_highlight_worthy(play.to_dict()):
+                play_data['is_highlight_worthy'] = True
+                highlights.append(play_data)
+
+    return highlights
+
+def same_highlights(expected: List[Dict], actual: List[Dict]) -> bool:
+    if len(expected) != len(actual):
+        return False
+    for left, right in zip(expected, actual):
+        if left.keys() != right.keys():
+            return False
+        for key in left:
+            a, b = left[key], right[key]
+            if isinstance(a, float) or isinstance(b, float):
+                if not math.isclose(float(a), float(b), rel_tol=1e-6, abs_tol=1e-6):
+                    return False
+            elif a != b:
+                return False
+    return True
+
+def time_call(fn, repeat: int) -> float:
+    """Best wall time of several runs, in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    season, week = 2024, 1
+    weekly_pbp = make_week_pbp(season, week)
+    roster = make_roster(weekly_pbp)
+    service = HighlightService(db=None)
+
+    expected = reference_match_roster_plays(service, weekly_pbp, roster, season, week)
+    actual = service.match_roster_plays(weekly_pbp, roster, season, week)
+    print(f"plays in week: {len(weekly_pbp)}, roster size: {len(roster)}, highlights: {len(actual)}")
+    print(f"outputs match per-play reference: {same_highlights(expected, actual)}")
+
+    baseline = BaselineHighlightService()
+    baseline_ms = time_call(
+        lambda: baseline.match_roster_plays(weekly_pbp, roster, season, week), max(1, args.repeat // 5)
+    )
+    vectorized_ms = time_call(
+        lambda: service.match_roster_plays(weekly_pbp, roster, season, week), args.repeat
+    )
+    print(f"baseline iterrows loop: {baseline_ms:8.2f} ms")
+    print(f"vectorized:             {vectorized_ms:8.2f} ms")
+    print(f"speedup:                {baseline_ms / vectorized_ms:8.1f}x")
+
+if __name__ == "__main__":
+    main()
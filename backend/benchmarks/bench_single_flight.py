@@ -0,0 +1,164 @@
+# A whole league opens the app at once (say after a push notification):
+# every manager requests their roster for the week a few times concurrently,
+# against a Sleeper stand-in with fixed latency.
+#
+#   none           every request that misses the roster fetches from Sleeper
+#   single_flight  concurrent misses wait on one fetch (the default, in-process)
+#
+# Reports Sleeper calls, roster rows and request latency.
+#
+# Usage (from the backend directory):
+#   python benchmarks/bench_single_flight.py [--managers 12] [--requests-per-manager 3] [--sleeper-ms 150]
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from fastapi import Request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+WEEK = 3
+SLEEPER_LEAGUE_ID = "bench"
+
+class FakeSleeperService:
+    """Sleeper stand-in: one league, fixed latency per call"""
+
+    def __init__(self, managers: int, latency_seconds: float):
+        self.managers = managers
+        self.latency_seconds = latency_seconds
+        self.calls = Counter()
+
+    async def _call(self, name: str):
+        self.calls[name] += 1
+        await asyncio.sleep(self.latency_seconds)
+
+    async def get_league_users(self, league_id):
+        await self._call("users")
+        return [{'user_id': f"u{index}", 'display_name': f"Manager {index}"} for index in range(self.managers)]
+
+    async def get_league_rosters(self, league_id):
+        await self._call("rosters")
+        return [
+            {'roster_id': index + 1, 'owner_id': f"u{index}", 'players': [str(index * 20 + slot) for slot in range(15)]}
+            for index in range(self.managers)
+        ]
+
+    async def get_league_matchups(self, league_id, week):
+        await self._call("matchups")
+        return []
+
+class NoSingleFlight:
+    """Every caller runs its own fetch (the behaviour before single-flight)"""
+
+    async def do(self, key, fetch):
+        return await fetch()
+
+def bench_user(request: Request):
+    from routers.auth import Principal
+
+    return Principal(id=int(request.headers["x-bench-user"]), email="", username="")
+
+def seed(session_factory, managers: int) -> list:
+    from models import League, User
+
+    with session_factory() as session:
+        leagues = []
+        for index in range(managers):
+            user = User(email=f"m{index}@example.com", username=f"m{index}", hashed_password="x")
+            session.add(user)
+            session.flush()
+            league = League(user_id=user.id, sleeper_league_id=SLEEPER_LEAGUE_ID, sleeper_user_id=f"u{index}",
+                            name="Bench", season="2024", scoring_settings={})
+            session.add(league)
+            session.flush()
+            leagues.append((user.id, league.id))
+        session.commit()
+    return leagues
+
+async def run_mode(mode: str, leagues: list, requests_per_manager: int, latency_seconds: float) -> dict:
+    import httpx
+    import main
+    from database import SessionLocal
+    from models import LeagueRosterSnapshot, Roster
+    from routers import auth, leagues as leagues_router
+    from services.single_flight import SingleFlight
+    from services.sleeper_service import get_sleeper_service
+
+    with SessionLocal() as session:
+        session.query(Roster).delete()
+        session.query(LeagueRosterSnapshot).delete()
+        session.commit()
+
+    sleeper_service = FakeSleeperService(len(leagues), latency_seconds)
+    single_flight = NoSingleFlight() if mode == "none" else SingleFlight()
+    leagues_router.get_single_flight = lambda: single_flight
+    main.app.dependency_overrides[get_sleeper_service] = lambda: sleeper_service
+    main.app.dependency_overrides[auth.get_current_user] = bench_user
+
+    latencies = []
+    errors = Counter()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one_request(user_id: int, league_id: int):
+            start = time.perf_counter()
+            response = await client.get(f"/api/leagues/{league_id}/roster/{WEEK}",
+                                        headers={"x-bench-user": str(user_id)})
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                errors[response.status_code] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            one_request(user_id, league_id)
+            for _ in range(requests_per_manager) for user_id, league_id in leagues
+        ))
+        wall = time.perf_counter() - start
+
+    with SessionLocal() as session:
+        rosters = session.query(Roster).count()
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "sleeper_calls": sum(sleeper_service.calls.values()),
+        "rosters": rosters,
+        "errors": dict(errors),
+        "p50_ms": latencies[len(latencies) // 2],
+        "max_ms": latencies[-1],
+        "wall_ms": wall * 1000,
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--managers", type=int, default=12)
+    parser.add_argument("--requests-per-manager", type=int, default=3)
+    parser.add_argument("--sleeper-ms", type=float, default=150)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+        os.environ.setdefault("YOUTUBE_API_KEY", "unused")
+        from database import SessionLocal, engine
+        from migrations import run_migrations
+
+        run_migrations(engine)
+        leagues = seed(SessionLocal, args.managers)
+
+        print(f"{args.managers} managers in one league, {args.requests_per_manager} concurrent requests each, "
+              f"Sleeper latency {args.sleeper_ms:.0f} ms")
+        print(f"{'mode':15}{'sleeper calls':>14}{'rosters':>9}{'errors':>8}{'p50 ms':>9}{'max ms':>9}{'wall ms':>9}")
+        for mode in ["none", "single_flight"]:
+            result = asyncio.run(run_mode(mode, leagues, args.requests_per_manager, args.sleeper_ms / 1000))
+            print(f"{result['mode']:15}{result['sleeper_calls']:14d}{result['rosters']:9d}"
+                  f"{sum(result['errors'].values()):8d}{result['p50_ms']:9.1f}{result['max_ms']:9.1f}"
+                  f"{result['wall_ms']:9.1f}")
+        engine.dispose()
+
+if __name__ == "__main__":
+    main()
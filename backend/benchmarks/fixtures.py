@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+from typing import List
+
+TEAMS = [
+    'ARI', 'ATL', 'BAL', 'BUF', 'CAR', 'CHI', 'CIN', 'CLE', 'DAL', 'DEN', 'DET', 'GB',
+    'HOU', 'IND', 'JAX', 'KC', 'LA', 'LAC', 'LV', 'MIA', 'MIN', 'NE', 'NO', 'NYG',
+    'NYJ', 'PHI', 'PIT', 'SEA', 'SF', 'TB', 'TEN', 'WAS'
+]
+
+def player_pool(size: int = 1800) -> List[str]:
+    """GSIS-style player ids"""
+    return [f"00-00{30000 + i:05d}" for i in range(size)]
+
+def make_week_pbp(season: int = 2024, week: int = 1, plays_per_game: int = 170,
+                  seed: int = 7) -> pd.DataFrame:
+    """Synthetic full week of nflverse-shaped play-by-play (16 games)"""
+    rng = np.random.default_rng(seed)
+    players = np.array(player_pool())
+    rows = []
+
+    for game_index in range(16):
+        away_team, home_team = TEAMS[2 * game_index], TEAMS[2 * game_index + 1]
+        game_id = f"{season}_{week:02d}_{away_team}_{home_team}"
+        # Each team uses a fixed slice of the player pool
+        away_players = players[game_index * 110:game_index * 110 + 55]
+        home_players = players[game_index * 110 + 55:game_index * 110 + 110]
+
+        for play_index in range(plays_per_game):
+            posteam = away_team if play_index % 2 == 0 else home_team
+            offense = away_players if posteam == away_team else home_players
+            play_type = rng.choice(
+                ['pass', 'run', 'punt', 'field_goal', 'kickoff', 'extra_point', 'no_play'],
+                p=[0.48, 0.36, 0.04, 0.02, 0.05, 0.02, 0.03]
+            )
+            yards_gained = float(np.clip(rng.normal(5, 9), -10, 80))
+            if rng.random() < 0.08:
+                # Explosive play
+                yards_gained += float(rng.integers(15, 60))
+            passer = rusher = receiver = None
+            if play_type == 'pass':
+                passer = offense[0]
+                receiver = offense[rng.integers(1, len(offense))] if rng.random() < 0.9 else None
+            elif play_type == 'run':
+                rusher = offense[rng.integers(0, 8)]
+            else:
+                yards_gained = 0.0
+
+            touchdown = play_type in ('pass', 'run') and rng.random() < 0.03
+            complete = play_type == 'pass' and receiver is not None and rng.random() < 0.65
+            intercepted = play_type == 'pass' and not complete and rng.random() < 0.05
+            rows.append({
+                'game_id': game_id,
+                'play_id': float(play_index * 23 + 1),
+                'week': week,
+                'home_team': home_team,
+                'away_team': away_team,
+                'qtr': min(play_index * 4 // plays_per_game + 1, 4),
+                'game_seconds_remaining': float(3600 - play_index * 3600 // plays_per_game),
+                'posteam': posteam,
+                'play_type': play_type,
+                'yards_gained': yards_gained,
+                'touchdown': float(touchdown and (complete or play_type == 'run')),
+                'desc': f"{posteam} {play_type}{' TOUCHDOWN' if touchdown else ''}",
+                'passer_player_id': passer,
+                'rusher_player_id': rusher,
+                'receiver_player_id': receiver,
+                'pass_attempt': float(play_type == 'pass'),
+                'complete_pass': float(complete),
+                'incomplete_pass': float(play_type == 'pass' and not complete and not intercepted),
+                'interception': float(intercepted),
+                'passing_yards': yards_gained if complete else None,
+                'receiving_yards': yards_gained if complete else None,
+                'rush_attempt': float(play_type == 'run'),
+                'rushing_yards': yards_gained if play_type == 'run' else None,
+                'pass_touchdown': float(touchdown and complete),
+                'rush_touchdown': float(touchdown and play_type == 'run'),
+                'fumble': 0.0,
+                'fumble_lost': 0.0,
+                'sack': 0.0,
+                'two_point_conv_result': None,
+                'field_goal_result': 'made' if play_type == 'field_goal' else None,
+                'kick_distance': float(rng.integers(20, 58)) if play_type == 'field_goal' else None,
+                'extra_point_result': 'good' if play_type == 'extra_point' else None,
+            })
+
+    return pd.DataFrame(rows)
+
+def make_roster(pbp: pd.DataFrame, size: int = 16, seed: int = 11) -> List[str]:
+    """Roster of player ids, most of which appear in the week's plays"""
+    rng = np.random.default_rng(seed)
+    involved = pd.unique(pbp[['passer_player_id', 'rusher_player_id', 'receiver_player_id']]
+                         .stack().dropna())
+    roster = list(rng.choice(involved, size=size - 2, replace=False))
+    # Bench players with no snaps this week
+    return roster + ['00-0099998', '00-0099999']
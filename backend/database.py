@@ -1,21 +1,95 @@
-from sqlalchemy import create_engine
+from contextlib import asynccontextmanager
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+from typing import Callable, TypeVar
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./fantasy_clips.db")
+# DATABASE_ASYNC=true serves API requests from AsyncSession (needs aiosqlite or asyncpg)
+DATABASE_ASYNC = os.getenv("DATABASE_ASYNC", "false").lower() == "true"
 
-engine = create_engine(DATABASE_URL)
+T = TypeVar("T")
+
+def _engine_options(url: str) -> dict:
+    """Pool and driver settings for the configured database"""
+    if make_url(url).get_backend_name() == "sqlite":
+        # Sessions move between the event loop and threadpool threads
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800")),
+        # Drop connections the server closed while they sat in the pool
+        "pool_pre_ping": True,
+    }
+
+def _configure_sqlite(sync_engine, url: str) -> None:
+    """WAL lets readers run while a worker writes; busy_timeout waits for locks instead of failing"""
+    if make_url(url).get_backend_name() != "sqlite":
+        return
+    in_memory = make_url(url).database in (None, "", ":memory:")
+    busy_timeout_ms = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+    @event.listens_for(sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not in_memory:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={busy_timeout_ms}")
+        cursor.close()
+
+def async_database_url(url: str) -> str:
+    """Same database through its asyncio driver"""
+    parsed = make_url(url)
+    driver = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}[parsed.get_backend_name()]
+    return parsed.set(drivername=f"{parsed.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
+_configure_sqlite(engine, DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = None
+AsyncSessionLocal = None
+if DATABASE_ASYNC:
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+    async_engine = create_async_engine(async_database_url(DATABASE_URL), **_engine_options(DATABASE_URL))
+    _configure_sqlite(async_engine.sync_engine, DATABASE_URL)
+    # Objects are read after commit, outside the session's greenlet
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
-def get_db():
+@asynccontextmanager
+async def db_session():
+    """A session for API code: AsyncSession when DATABASE_ASYNC, else a sync Session"""
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
+        # Closing returns the connection to the pool; don't do it on the event loop
+        await run_in_threadpool(db.close)
+
+async def get_db():
+    async with db_session() as db:
+        yield db
+
+async def run_db(db, fn: Callable[..., T], *args) -> T:
+    """Run fn(session, *args) without blocking the event loop"""
+    # AsyncSession: run_sync on the async driver; Session: the threadpool
+    if isinstance(db, Session):
+        return await run_in_threadpool(fn, db, *args)
+    return await db.run_sync(fn, *args)
@@ -0,0 +1,44 @@
+import argparse
+import asyncio
+import os
+import signal
+import threading
+from dotenv import load_dotenv
+
+from database import SessionLocal, engine
+from migrations import run_migrations
+from services.live_ingestion import LiveIngestor, get_play_source
+from services.sleeper_service import close_sleeper_service
+
+# Load environment variables
+load_dotenv()
+
+async def run_live_ingestion(season: int, week: int, poll_seconds: float, stop_event) -> None:
+    db = SessionLocal()
+    try:
+        await LiveIngestor(db, get_play_source(), season, week).run(poll_seconds, stop_event)
+    finally:
+        db.close()
+        await close_sleeper_service()
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest plays while games are in progress")
+    parser.add_argument("--season", type=int, required=True)
+    parser.add_argument("--week", type=int, required=True)
+    parser.add_argument("--poll-seconds", type=float, default=float(os.getenv("LIVE_POLL_SECONDS", "30")))
+    args = parser.parse_args()
+
+    run_migrations(engine)
+
+    stop_event = threading.Event()
+
+    def stop(signum, frame):
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    asyncio.run(run_live_ingestion(args.season, args.week, args.poll_seconds, stop_event))
+
+if __name__ == "__main__":
+    main()
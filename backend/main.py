@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
@@ -5,9 +6,17 @@ import uvicorn
 from dotenv import load_dotenv
 import os
 
+import database
 from database import get_db, engine, Base
+from migrations import run_migrations
 from models import User, League, Roster, Play, Clip
-from services.sleeper_service import SleeperService
+from services.sleeper_service import SleeperService, get_sleeper_service, close_sleeper_service
+from services.player_directory import get_player_directory
+from services.player_crosswalk import get_player_crosswalk
+from services.search_cache import get_search_cache
+from services.password_hasher import get_password_hasher
+from services.feed_cache import get_feed_cache
+from services.single_flight import get_single_flight
 from services.highlight_service import HighlightService
 from services.youtube_service import YouTubeService
 from routers import auth, leagues, highlights
@@ -15,10 +24,22 @@ from routers import auth, leagues, highlights
 # Load environment variables
 load_dotenv()
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# Create database tables and add columns new models need
+run_migrations(engine)
 
-app = FastAPI(title="Fantasy Clips POC", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled Sleeper client for the whole process
+    app.state.sleeper_service = get_sleeper_service()
+    # Warm the player directory from its local copy; it refreshes itself when stale
+    get_player_directory().load_local()
+    get_player_crosswalk().load_local()
+    yield
+    await close_sleeper_service()
+    if database.async_engine is not None:
+        await database.async_engine.dispose()
+
+app = FastAPI(title="Fantasy Clips POC", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -27,6 +48,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Paged feeds return the next page's cursor in a header, and an ETag the app sends back
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 # Include routers
@@ -42,5 +65,21 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+def metrics():
+    # Plain def: FastAPI runs it in the threadpool, off the event loop
+    return {
+        "player_crosswalk": get_player_crosswalk().metrics(),
+        "youtube_search_cache": get_search_cache().metrics(),
+        "password_hasher": get_password_hasher().metrics(),
+        "highlight_feed_cache": get_feed_cache().metrics(),
+        "single_flight": get_single_flight().metrics(),
+        "auth_principal_cache": {
+            "size": len(auth.principal_cache),
+            "hits": auth.principal_cache.hits,
+            "misses": auth.principal_cache.misses
+        }
+    }
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
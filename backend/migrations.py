@@ -0,0 +1,188 @@
+from sqlalchemy import bindparam, delete, func, insert, inspect, select, text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from database import Base
+from models import League, Play, PlayPlayer, Roster, RosterHighlight
+from services.play_merge import merge_play_into
+
+def add_missing_columns(engine: Engine) -> None:
+    """Add columns and indexes that were added to models after a table was created"""
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        missing = [column for column in table.columns if column.name not in existing]
+        if missing:
+            with engine.begin() as connection:
+                for column in missing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                    print(f"Added column {table.name}.{column.name}")
+
+        # Indexes added to existing columns, as well as those of new columns
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+def drop_unique_sleeper_league_index(engine: Engine) -> None:
+    """Let several users connect the same Sleeper league (now unique per user instead)"""
+    inspector = inspect(engine)
+    if not inspector.has_table('leagues'):
+        return
+    for index in inspector.get_indexes('leagues'):
+        if index['name'] == 'ix_leagues_sleeper_league_id' and index['unique']:
+            with engine.begin() as connection:
+                connection.execute(text('DROP INDEX ix_leagues_sleeper_league_id'))
+            print("Dropped unique index ix_leagues_sleeper_league_id")
+
+def dedupe_rosters(engine: Engine) -> None:
+    """Keep the first roster per league and week, so the unique index on them can be created"""
+    inspector = inspect(engine)
+    if not inspector.has_table('rosters'):
+        return
+    if any(index['name'] == 'uq_rosters_league_week' for index in inspector.get_indexes('rosters')):
+        return
+    with engine.begin() as connection:
+        first_ids = select(func.min(Roster.id)).group_by(Roster.league_id, Roster.week)
+        result = connection.execute(delete(Roster).where(Roster.id.not_in(first_ids)))
+    if result.rowcount:
+        print(f"Removed {result.rowcount} duplicate rosters")
+
+def backfill_play_players(engine: Engine, batch_size: int = 1000) -> None:
+    """Fill play_players for plays saved before the table existed"""
+    with Session(engine) as session:
+        last_id = 0
+        backfilled = 0
+        while True:
+            plays = session.execute(
+                select(Play.id, Play.player_ids, Play.season, Play.week).where(
+                    Play.id > last_id,
+                    ~select(PlayPlayer.id).where(PlayPlayer.play_id == Play.id).exists()
+                ).order_by(Play.id).limit(batch_size)
+            ).all()
+            if not plays:
+                break
+
+            rows = [
+                {'play_id': play_id, 'player_id': player_id, 'season': season, 'week': week}
+                for play_id, player_ids, season, week in plays
+                for player_id in dict.fromkeys(player_ids or [])
+            ]
+            if rows:
+                session.execute(insert(PlayPlayer), rows)
+                session.commit()
+            backfilled += len(rows)
+            last_id = plays[-1][0]
+
+        if backfilled:
+            print(f"Backfilled {backfilled} play_players rows")
+
+def rekey_play_ids(engine: Engine, batch_size: int = 1000) -> None:
+    """Prefix bare nflverse play ids with their game id, the key plays are stored under now"""
+    # Older rows hold str(float) play ids such as "1234.0", which repeat across games.
+    # A partial earlier run can leave both formats, so rows already re-keyed are skipped
+    # and rows whose new key is taken are merged into the row holding it.
+    prefix = Play.game_id + '_'
+    with Session(engine) as session:
+        legacy = session.execute(
+            select(Play.id, Play.game_id, Play.play_id).where(
+                Play.game_id.is_not(None),
+                func.substr(Play.play_id, 1, func.length(prefix)) != prefix
+            ).order_by(Play.id)
+        ).all()
+        if not legacy:
+            return
+
+        new_keys = {}
+        for play_pk, game_id, play_id in legacy:
+            try:
+                # Same key as highlight_service.play_key
+                new_keys[play_pk] = f"{game_id}_{int(float(play_id))}"
+            except (TypeError, ValueError):
+                print(f"Skipping play {play_pk} with unparseable play_id {play_id!r}")
+
+        # Which row keeps each key: one already re-keyed, else the oldest legacy row
+        keys = sorted(set(new_keys.values()))
+        keeper_by_key = {}
+        for start in range(0, len(keys), batch_size):
+            keeper_by_key.update(session.execute(
+                select(Play.play_id, Play.id).where(Play.play_id.in_(keys[start:start + batch_size]))
+            ).all())
+        duplicates = {}
+        for play_pk, key in new_keys.items():
+            if key in keeper_by_key:
+                duplicates[play_pk] = keeper_by_key[key]
+            else:
+                keeper_by_key[key] = play_pk
+
+        for play_pk, keeper_pk in duplicates.items():
+            # Players only the duplicate had stay in the feed through the surviving play
+            merge_play_into(session, play_pk, keeper_pk)
+
+        rekeyed = [
+            {'pk': play_pk, 'key': key} for play_pk, key in new_keys.items() if play_pk not in duplicates
+        ]
+        for start in range(0, len(rekeyed), batch_size):
+            session.connection().execute(
+                update(Play).where(Play.id == bindparam('pk')).values(play_id=bindparam('key')),
+                rekeyed[start:start + batch_size]
+            )
+        session.commit()
+
+    if duplicates:
+        print(f"Merged {len(duplicates)} duplicate plays")
+    if rekeyed:
+        print(f"Re-keyed {len(rekeyed)} play ids")
+
+def backfill_roster_highlights(engine: Engine) -> None:
+    """Give every roster the saved highlights involving its players, for databases from before
+    roster_highlights; their points are the single value the play was saved with"""
+    with Session(engine) as session:
+        rosters = session.execute(
+            select(Roster.id, Roster.week, Roster.player_ids, League.season).join(League, League.id == Roster.league_id)
+        ).all()
+        backfilled = 0
+        for roster_id, week, player_ids, season in rosters:
+            if not player_ids:
+                continue
+            plays = session.execute(
+                select(Play.id, Play.player_ids, Play.fantasy_points).where(
+                    Play.is_highlight_worthy == True,
+                    Play.week == week,
+                    Play.id.in_(select(PlayPlayer.play_id).where(
+                        PlayPlayer.player_id.in_(player_ids),
+                        PlayPlayer.week == week,
+                        PlayPlayer.season == str(season)
+                    ))
+                )
+            ).all()
+            rows = [
+                {
+                    'roster_id': roster_id,
+                    'play_id': play_id,
+                    'player_ids': [player_id for player_id in player_ids if player_id in (play_players or [])],
+                    'fantasy_points': fantasy_points or 0.0
+                }
+                for play_id, play_players, fantasy_points in plays
+            ]
+            if rows:
+                session.execute(insert(RosterHighlight), rows)
+                backfilled += len(rows)
+        session.commit()
+
+    if backfilled:
+        print(f"Backfilled {backfilled} roster_highlights rows")
+
+def run_migrations(engine: Engine) -> None:
+    """Create missing tables and bring existing ones up to date with the models"""
+    # Rosters only get highlights from jobs once the table exists
+    had_roster_highlights = inspect(engine).has_table('roster_highlights')
+    Base.metadata.create_all(bind=engine)
+    # Before add_missing_columns, which creates the indexes these make room for
+    drop_unique_sleeper_league_index(engine)
+    dedupe_rosters(engine)
+    add_missing_columns(engine)
+    rekey_play_ids(engine)
+    backfill_play_players(engine)
+    if not had_roster_highlights:
+        backfill_roster_highlights(engine)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Float, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Text, Float, Boolean, ForeignKey, JSON, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -17,13 +17,19 @@ class User(Base):
 
 class League(Base):
     __tablename__ = "leagues"
+    __table_args__ = (
+        # Every manager in a Sleeper league connects it to their own account
+        Index("uq_leagues_user_sleeper_league", "user_id", "sleeper_league_id", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
-    sleeper_league_id = Column(String, unique=True, index=True)
+    sleeper_league_id = Column(String, index=True)
+    sleeper_user_id = Column(String)  # the user's Sleeper account, to find their team
     name = Column(String)
     season = Column(String)
     scoring_settings = Column(JSON)
+    highlight_rules = Column(JSON)  # overrides of the default highlight rules, if any
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
@@ -32,16 +38,41 @@ class League(Base):
 
 class Roster(Base):
     __tablename__ = "rosters"
+    __table_args__ = (
+        Index("uq_rosters_league_week", "league_id", "week", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     league_id = Column(Integer, ForeignKey("leagues.id"))
     week = Column(Integer)
+    sleeper_roster_id = Column(Integer)  # the team in the league's snapshot
     player_ids = Column(JSON)  # List of Sleeper player IDs
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
     league = relationship("League", back_populates="rosters")
 
+class LeagueRosterSnapshot(Base):
+    """Every team of a Sleeper league for one week, synced together"""
+    __tablename__ = "league_roster_snapshots"
+    __table_args__ = (
+        UniqueConstraint("sleeper_league_id", "week", "sleeper_roster_id", name="uq_league_roster_snapshots_team"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    sleeper_league_id = Column(String, nullable=False, index=True)
+    week = Column(Integer, nullable=False)
+    sleeper_roster_id = Column(Integer, nullable=False)
+    owner_id = Column(String)  # Sleeper user id
+    co_owner_ids = Column(JSON)
+    owner_name = Column(String)
+    team_name = Column(String)
+    matchup_id = Column(Integer)
+    points = Column(Float)
+    player_ids = Column(JSON)  # List of Sleeper player IDs
+    starters = Column(JSON)
+    synced_at = Column(DateTime(timezone=True), server_default=func.now())
+
 class Play(Base):
     __tablename__ = "plays"
     
@@ -53,21 +84,58 @@ class Play(Base):
     quarter = Column(Integer)
     game_clock = Column(String)
     team = Column(String)
+    home_team = Column(String)
+    away_team = Column(String)
     player_ids = Column(JSON)  # List of player IDs involved
     event_type = Column(String)  # touchdown, reception, rush, etc.
     yards_gained = Column(Integer)
-    fantasy_points = Column(Float)
+    fantasy_points = Column(Float)  # standard scoring for everyone involved; leagues' own are in roster_highlights
     is_highlight_worthy = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
     clips = relationship("Clip", back_populates="play")
+    players = relationship("PlayPlayer", back_populates="play", cascade="all, delete-orphan")
+
+class PlayPlayer(Base):
+    """One row per player involved in a play, so feeds can use an index instead of the JSON column"""
+    __tablename__ = "play_players"
+    __table_args__ = (
+        UniqueConstraint("play_id", "player_id", name="uq_play_players_play_player"),
+        Index("ix_play_players_player_season_week", "player_id", "season", "week"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    play_id = Column(Integer, ForeignKey("plays.id"), nullable=False, index=True)
+    player_id = Column(String, nullable=False)  # Sleeper player ID
+    season = Column(String)
+    week = Column(Integer)
+    
+    # Relationships
+    play = relationship("Play", back_populates="players")
+
+class RosterHighlight(Base):
+    """A play in one roster's feed, with the points its players earned under the league's scoring"""
+    __tablename__ = "roster_highlights"
+    __table_args__ = (
+        UniqueConstraint("roster_id", "play_id", name="uq_roster_highlights_roster_play"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    roster_id = Column(Integer, ForeignKey("rosters.id"), nullable=False)
+    play_id = Column(Integer, ForeignKey("plays.id"), nullable=False, index=True)
+    player_ids = Column(JSON)  # the roster's players involved, as Sleeper IDs
+    fantasy_points = Column(Float)
+    
+    # Relationships
+    play = relationship("Play")
 
 class Clip(Base):
     __tablename__ = "clips"
     
     id = Column(Integer, primary_key=True, index=True)
-    play_id = Column(Integer, ForeignKey("plays.id"))
+    play_id = Column(Integer, ForeignKey("plays.id"), index=True)
+    game_video_id = Column(Integer, ForeignKey("game_videos.id"), index=True)  # set when cut from a game video
     provider = Column(String)  # youtube, twitter, etc.
     url = Column(String)
     embed_url = Column(String)
@@ -78,3 +146,101 @@ class Clip(Base):
     
     # Relationships
     play = relationship("Play", back_populates="clips")
+    game_video = relationship("GameVideo")
+
+class HighlightJob(Base):
+    __tablename__ = "highlight_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    job_key = Column(String, unique=True, index=True)  # league:season:week, one job per key
+    league_id = Column(Integer, ForeignKey("leagues.id"), index=True)
+    week = Column(Integer, index=True)
+    season = Column(Integer, index=True)
+    status = Column(String, default="queued", index=True)  # queued, running, completed, failed
+    stage = Column(String)  # scanning, saving, clips
+    attempts = Column(Integer, default=0)
+    worker_id = Column(String)
+    plays_scanned = Column(Integer, default=0)
+    highlights_found = Column(Integer, default=0)
+    clips_resolved = Column(Integer, default=0)
+    error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    heartbeat_at = Column(DateTime(timezone=True))  # last progress reported by the worker running it
+    finished_at = Column(DateTime(timezone=True))
+    
+    # Relationships
+    league = relationship("League")
+
+class LivePlayCursor(Base):
+    """Highest play_id already ingested for a game during live ingestion"""
+    __tablename__ = "live_play_cursors"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    game_id = Column(String, unique=True, index=True, nullable=False)
+    season = Column(Integer, nullable=False)
+    week = Column(Integer, nullable=False, index=True)
+    last_play_id = Column(Integer, nullable=False)
+    plays_ingested = Column(Integer, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class HighlightJobEvent(Base):
+    """Progress and results of a highlight job, in the order they were committed"""
+    __tablename__ = "highlight_job_events"
+    __table_args__ = (
+        Index("ix_highlight_job_events_job_id_id", "job_id", "id"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("highlight_jobs.id"), nullable=False)
+    event_type = Column(String, nullable=False)  # progress, highlight, completed, failed
+    payload = Column(JSON)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class HighlightFeedVersion(Base):
+    """Bumped whenever a league's feed for a week changes, so cached copies can be recognised as stale"""
+    __tablename__ = "highlight_feed_versions"
+    __table_args__ = (
+        UniqueConstraint("league_id", "week", name="uq_highlight_feed_versions_league_week"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    league_id = Column(Integer, ForeignKey("leagues.id"), nullable=False)
+    week = Column(Integer, nullable=False)
+    version = Column(Integer, nullable=False, default=1)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class YouTubeSearchCache(Base):
+    __tablename__ = "youtube_search_cache"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String, unique=True, index=True)  # hash of normalized query + params
+    query = Column(String)  # normalized query
+    params = Column(JSON)
+    results = Column(JSON)  # search_videos output
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), index=True)
+    last_used_at = Column(DateTime(timezone=True), index=True)
+
+class GameVideo(Base):
+    __tablename__ = "game_videos"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    game_id = Column(String, unique=True, index=True)  # nflverse game id
+    season = Column(Integer)
+    week = Column(Integer, index=True)
+    home_team = Column(String)
+    away_team = Column(String)
+    status = Column(String)  # found, not_found (searched, no video), error (lookup failed, retried)
+    provider = Column(String)
+    video_id = Column(String)
+    url = Column(String)
+    embed_url = Column(String)
+    title = Column(String)
+    channel_title = Column(String)
+    description = Column(Text)
+    timestamp_index = Column(JSON)  # chapters parsed once for aligning plays
+    confidence = Column(Float)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    resolved_at = Column(DateTime(timezone=True))
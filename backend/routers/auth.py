@@ -1,16 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from pydantic import BaseModel
 from typing import Optional
 import os
 from dotenv import load_dotenv
 
-from database import get_db
+from database import get_db, run_db
 from models import User
+from services.password_hasher import PasswordHasherBusy, get_password_hasher
+from services.ttl_cache import TTLCache
 
 load_dotenv()
 
@@ -21,7 +23,13 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Authenticated users by id, so most requests need no DB query for auth.
+# Account changes invalidate entries in this process; the TTL bounds staleness elsewhere.
+principal_cache = TTLCache(
+    maxsize=int(os.getenv("AUTH_PRINCIPAL_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("AUTH_PRINCIPAL_TTL_SECONDS", "60"))
+)
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 class UserCreate(BaseModel):
@@ -38,15 +46,33 @@ class UserResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class Principal(BaseModel):
+    """The authenticated user as handlers see it (a detached snapshot of User)"""
+    id: int
+    email: str
+    username: str
+    created_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+        frozen = True
+
 class Token(BaseModel):
     access_token: str
     token_type: str
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_password_hasher().context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return get_password_hasher().context.hash(password)
+
+def _hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many sign-in attempts in progress, try again shortly",
+        headers={"Retry-After": "1"},
+    )
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -69,6 +95,18 @@ def authenticate_user(db: Session, username: str, password: str):
         return False
     return user
 
+def get_user_by_id(db: Session, user_id: int):
+    return db.query(User).filter(User.id == user_id).first()
+
+def invalidate_principal(user_id: int) -> None:
+    """Drop a cached principal; call after changing or deleting an account"""
+    principal_cache.delete(user_id)
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target):
+    invalidate_principal(target.id)
+
 async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -80,38 +118,77 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
+        user_id = payload.get("uid")
     except JWTError:
         raise credentials_exception
-    user = get_user_by_username(db, username=username)
-    if user is None:
+    
+    if user_id is None:
+        # Tokens issued before the uid claim
+        user = await run_db(db, get_user_by_username, username)
+        if user is None:
+            raise credentials_exception
+        return Principal.model_validate(user)
+    
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        user = await run_db(db, get_user_by_id, user_id)
+        if user is None:
+            raise credentials_exception
+        principal = Principal.model_validate(user)
+        principal_cache.set(user_id, principal)
+    
+    if principal.username != username:
         raise credentials_exception
-    return user
+    return principal
 
 @router.post("/register", response_model=UserResponse)
 async def register(user: UserCreate, db: Session = Depends(get_db)):
     # Check if user already exists
-    if get_user_by_username(db, user.username):
+    if await run_db(db, get_user_by_username, user.username):
         raise HTTPException(
             status_code=400,
             detail="Username already registered"
         )
     
-    # Create new user
-    hashed_password = get_password_hash(user.password)
+    # Create new user (bcrypt runs on the password hasher's own pool)
+    try:
+        hashed_password = await get_password_hasher().hash(user.password)
+    except PasswordHasherBusy:
+        raise _hasher_busy()
     db_user = User(
         email=user.email,
         username=user.username,
         hashed_password=hashed_password
     )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
     
-    return db_user
+    def save(session: Session) -> User:
+        session.add(db_user)
+        session.commit()
+        session.refresh(db_user)
+        return db_user
+    
+    return await run_db(db, save)
 
 @router.post("/login", response_model=Token)
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await run_db(db, get_user_by_username, form_data.username)
+    if user:
+        try:
+            verified, new_hash = await get_password_hasher().verify_and_update(
+                form_data.password, user.hashed_password
+            )
+        except PasswordHasherBusy:
+            raise _hasher_busy()
+        
+        if not verified:
+            user = None
+        elif new_hash:
+            # BCRYPT_ROUNDS changed since this password was hashed
+            def rehash(session: Session) -> None:
+                session.query(User).filter(User.id == user.id).update({User.hashed_password: new_hash})
+                session.commit()
+            
+            await run_db(db, rehash)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -120,10 +197,10 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
         )
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data={"sub": user.username, "uid": user.id}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=UserResponse)
-async def read_users_me(current_user: User = Depends(get_current_user)):
+async def read_users_me(current_user: Principal = Depends(get_current_user)):
     return current_user
@@ -1,18 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+import asyncio
+import os
+import time
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Dict, Optional
 from pydantic import BaseModel
 from datetime import datetime
 
-from database import get_db
-from models import User, League, Play, Clip
-from services.sleeper_service import SleeperService
-from services.highlight_service import HighlightService
-from services.youtube_service import YouTubeService
-from routers.auth import get_current_user
+from database import db_session, get_db, run_db
+from models import User, League, Roster, Play, Clip, HighlightJob
+from services.highlight_feed import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, highlight_feed_query, in_roster_feed, involving_players,
+    paginate, roster_highlights
+)
+from services.feed_cache import FeedEntry, etag_matches, get_feed_cache
+from services.job_events import TERMINAL_EVENTS, format_sse, progress_payload, read_job_events
+from services.job_queue import get_job_queue
+from routers.auth import Principal, get_current_user
 
 router = APIRouter()
 
+JOB_EVENTS_POLL_SECONDS = float(os.getenv("JOB_EVENTS_POLL_SECONDS", "1"))
+JOB_EVENTS_KEEPALIVE_SECONDS = 15
+
+class ClipResponse(BaseModel):
+    id: int
+    provider: Optional[str] = None
+    url: Optional[str] = None
+    embed_url: Optional[str] = None
+    start_sec: Optional[int] = None
+    end_sec: Optional[int] = None
+    confidence: Optional[float] = None
+    
+    class Config:
+        from_attributes = True
+
 class HighlightResponse(BaseModel):
     id: int
     game_id: str
@@ -26,7 +49,7 @@ class HighlightResponse(BaseModel):
     yards_gained: int
     fantasy_points: float
     is_highlight_worthy: bool
-    clips: List[Dict]
+    clips: List[ClipResponse]
     
     class Config:
         from_attributes = True
@@ -36,223 +59,277 @@ class GenerateHighlightsRequest(BaseModel):
     week: int
     season: int = 2024
 
+class BatchGenerateHighlightsRequest(BaseModel):
+    league_ids: List[int]
+    week: int
+    season: int = 2024
+
+class HighlightJobResponse(BaseModel):
+    id: int
+    league_id: int
+    week: int
+    season: int
+    status: str
+    stage: Optional[str] = None
+    attempts: int
+    plays_scanned: int
+    highlights_found: int
+    clips_resolved: int
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+def _user_league(db: Session, user_id: int, league_id: int) -> Optional[League]:
+    return db.query(League).filter(
+        League.id == league_id,
+        League.user_id == user_id
+    ).first()
+
+def _week_roster(db: Session, league_id: int, week: int) -> Optional[Roster]:
+    return db.query(Roster).filter(
+        Roster.league_id == league_id,
+        Roster.week == week
+    ).first()
+
 @router.post("/generate")
 async def generate_highlights(
     request: GenerateHighlightsRequest,
-    background_tasks: BackgroundTasks,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Generate highlights for a specific league and week"""
     # Verify league belongs to user
-    league = db.query(League).filter(
-        League.id == request.league_id,
-        League.user_id == current_user.id
-    ).first()
+    league = await run_db(db, _user_league, current_user.id, request.league_id)
     
     if not league:
         raise HTTPException(status_code=404, detail="League not found")
     
     # Get roster for the week
-    from models import Roster
-    roster = db.query(Roster).filter(
-        Roster.league_id == request.league_id,
-        Roster.week == request.week
-    ).first()
+    roster = await run_db(db, _week_roster, request.league_id, request.week)
     
     if not roster:
         raise HTTPException(status_code=404, detail="Roster not found for this week")
     
-    # Start background task to process highlights
-    background_tasks.add_task(
-        process_highlights_background,
-        league_id=request.league_id,
-        week=request.week,
-        season=request.season,
-        roster_id=roster.id
-    )
+    # Queue the job for the worker pool (returns the existing job if one is in flight)
+    job = await run_db(db, get_job_queue().enqueue, request.league_id, request.week, request.season)
     
-    return {"message": "Highlight generation started", "status": "processing"}
+    return {"message": "Highlight generation started", "status": job.status, "job_id": job.id}
 
-async def process_highlights_background(
-    league_id: int,
-    week: int,
-    season: int,
-    roster_id: int
+@router.post("/generate/batch")
+async def generate_batch_highlights(
+    request: BatchGenerateHighlightsRequest,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
-    """Background task to process highlights"""
-    from database import SessionLocal
-    from services.sleeper_service import SleeperService
+    """Generate highlights for several leagues in one pass over the week's plays"""
+    # Verify leagues belong to user
+    leagues = await run_db(db, lambda session: session.query(League).filter(
+        League.id.in_(request.league_ids),
+        League.user_id == current_user.id
+    ).all())
     
-    db = SessionLocal()
-    try:
-        # Get roster
-        from models import Roster
-        roster = db.query(Roster).filter(Roster.id == roster_id).first()
-        if not roster:
-            return
-        
-        # Process highlights
-        highlight_service = HighlightService(db)
-        highlights = await highlight_service.process_roster_highlights(roster, season, week)
-        
-        # Save highlights to database
-        saved_plays = await highlight_service.save_highlights_to_db(highlights)
-        
-        # Find video clips for each highlight
-        youtube_service = YouTubeService()
-        sleeper_service = SleeperService()
-        
-        # Get players data for names
-        players = await sleeper_service.get_players()
-        
-        for play in saved_plays:
-            if play.is_highlight_worthy:
-                # Get player name (simplified - in production, you'd want better player matching)
-                player_id = play.player_ids[0] if play.player_ids else None
-                player_name = "Unknown Player"
-                
-                if player_id and player_id in players:
-                    player_data = players[player_id]
-                    player_name = player_data.get('full_name', 'Unknown Player')
-                
-                # Find video clip
-                clip_data = youtube_service.find_best_clip(
-                    {
-                        'description': f"{play.event_type} {play.yards_gained} yards",
-                        'week': play.week,
-                        'quarter': play.quarter,
-                        'game_clock': play.game_clock
-                    },
-                    player_name,
-                    play.team,  # Simplified - you'd want actual home/away teams
-                    "Opponent"  # Simplified
-                )
-                
-                if clip_data:
-                    # Save clip to database
-                    clip = Clip(
-                        play_id=play.id,
-                        provider=clip_data['provider'],
-                        url=clip_data['url'],
-                        embed_url=clip_data['embed_url'],
-                        start_sec=clip_data['start_sec'],
-                        end_sec=clip_data['end_sec'],
-                        confidence=clip_data['confidence']
-                    )
-                    db.add(clip)
-        
-        db.commit()
+    if len(leagues) != len(set(request.league_ids)):
+        raise HTTPException(status_code=404, detail="League not found")
+    
+    # Get rosters for the week
+    rosters = await run_db(db, lambda session: session.query(Roster).filter(
+        Roster.league_id.in_(request.league_ids),
+        Roster.week == request.week
+    ).all())
+    
+    if not rosters:
+        raise HTTPException(status_code=404, detail="Roster not found for this week")
+    
+    # Queue one job per league; workers run every job for the same week with one scan
+    job_queue = get_job_queue()
+    jobs = await run_db(db, lambda session: [
+        job_queue.enqueue(session, league_id, request.week, request.season)
+        for league_id in sorted({roster.league_id for roster in rosters})
+    ])
+    
+    return {
+        "message": "Highlight generation started",
+        "status": "processing",
+        "roster_count": len(rosters),
+        "job_ids": [job.id for job in jobs]
+    }
+
+@router.get("/jobs/{job_id}", response_model=HighlightJobResponse)
+async def get_highlight_job(
+    job_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get the status of a highlight generation job"""
+    job = await run_db(db, lambda session: session.query(HighlightJob).join(League).filter(
+        HighlightJob.id == job_id,
+        League.user_id == current_user.id
+    ).first())
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return job
+
+@router.get("/jobs/{job_id}/events")
+async def stream_highlight_job_events(
+    job_id: int,
+    request: Request,
+    last_event_id: Optional[int] = Query(None),
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Stream a job's progress and each highlight as it is saved (Server-Sent Events)"""
+    job = await run_db(db, lambda session: session.query(HighlightJob).join(League).filter(
+        HighlightJob.id == job_id,
+        League.user_id == current_user.id
+    ).first())
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    # Reconnecting clients resume after the last event they saw
+    after_id = last_event_id or 0
+    if last_event_id_header and last_event_id_header.isdigit():
+        after_id = max(after_id, int(last_event_id_header))
+    
+    async def poll(after: int):
+        # A short-lived session per poll; the request's session is closed while this streams
+        async with db_session() as session:
+            return await run_db(session, lambda s: (read_job_events(s, job_id, after), s.get(HighlightJob, job_id)))
+    
+    async def events():
+        nonlocal after_id
+        last_sent = time.monotonic()
+        if after_id == 0:
+            yield format_sse("progress", progress_payload(job))
         
-    except Exception as e:
-        print(f"Error processing highlights: {e}")
-        db.rollback()
-    finally:
-        db.close()
+        while not await request.is_disconnected():
+            job_events, current_job = await poll(after_id)
+            for event in job_events:
+                after_id = event.id
+                yield format_sse(event.event_type, event.payload, event.id)
+                if event.event_type in TERMINAL_EVENTS:
+                    return
+            
+            if current_job is None:
+                # Deleted while streaming (e.g. with its league); there is nothing more to send
+                yield format_sse("failed", {'status': 'failed', 'error': "Job no longer exists"})
+                return
+            
+            if not job_events and current_job.status in TERMINAL_EVENTS:
+                # Finished without a recorded terminal event (e.g. before events existed)
+                yield format_sse(current_job.status, progress_payload(current_job))
+                return
+            
+            if job_events:
+                # There may be more already waiting
+                last_sent = time.monotonic()
+                continue
+            if time.monotonic() - last_sent >= JOB_EVENTS_KEEPALIVE_SECONDS:
+                # Keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+            await asyncio.sleep(JOB_EVENTS_POLL_SECONDS)
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
 
 @router.get("/league/{league_id}/week/{week}", response_model=List[HighlightResponse])
 async def get_highlights_for_week(
     league_id: int,
     week: int,
-    current_user: User = Depends(get_current_user),
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    if_none_match: Optional[str] = Header(None),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get highlights for a specific league and week"""
-    # Verify league belongs to user
-    league = db.query(League).filter(
-        League.id == league_id,
-        League.user_id == current_user.id
-    ).first()
-    
-    if not league:
-        raise HTTPException(status_code=404, detail="League not found")
-    
-    # Get highlights for the week
-    highlights = db.query(Play).filter(
-        Play.week == week,
-        Play.is_highlight_worthy == True
-    ).all()
+    _check_cursor(cursor)
     
-    # Get clips for each highlight
-    result = []
-    for highlight in highlights:
-        clips = db.query(Clip).filter(Clip.play_id == highlight.id).all()
-        clip_data = [
-            {
-                'id': clip.id,
-                'provider': clip.provider,
-                'url': clip.url,
-                'embed_url': clip.embed_url,
-                'start_sec': clip.start_sec,
-                'end_sec': clip.end_sec,
-                'confidence': clip.confidence
-            }
-            for clip in clips
-        ]
+    def load(session: Session):
+        # Verify league belongs to user
+        league = _user_league(session, current_user.id, league_id)
+        
+        if not league:
+            raise HTTPException(status_code=404, detail="League not found")
+        
+        # The league's roster for the week decides whose plays are in the feed
+        roster = _week_roster(session, league_id, week)
         
-        result.append({
-            'id': highlight.id,
-            'game_id': highlight.game_id,
-            'play_id': highlight.play_id,
-            'week': highlight.week,
-            'quarter': highlight.quarter,
-            'game_clock': highlight.game_clock,
-            'team': highlight.team,
-            'player_ids': highlight.player_ids,
-            'event_type': highlight.event_type,
-            'yards_gained': highlight.yards_gained,
-            'fantasy_points': highlight.fantasy_points,
-            'is_highlight_worthy': highlight.is_highlight_worthy,
-            'clips': clip_data
-        })
+        if not roster or not roster.player_ids:
+            return [], None
+        
+        # The roster's highlights still involving its players, with their clips in one extra query
+        query = involving_players(
+            in_roster_feed(highlight_feed_query(session), roster.id), roster.player_ids, week, league.season
+        )
+        plays, next_cursor = paginate(query, cursor, limit)
+        
+        # Plays are shared between leagues; players and points are this roster's own
+        own = roster_highlights(session, roster.id, plays)
+        items = []
+        for play in plays:
+            item = HighlightResponse.model_validate(play).model_dump(mode="json")
+            item['player_ids'] = own[play.id].player_ids
+            item['fantasy_points'] = own[play.id].fantasy_points
+            items.append(item)
+        return items, next_cursor
     
-    return result
+    # The feed only changes when a job finishes or the roster is synced, so polls are
+    # answered from the cache; the user id keeps one owner's pages from another
+    feed_cache = get_feed_cache()
+    key = (league_id, week, current_user.id, cursor, limit)
+    entry = feed_cache.lookup(key) or await run_db(db, feed_cache.fetch, key, load)
+    return _cached_page(entry, if_none_match)
 
-@router.get("/player/{player_id}/week/{week}")
+@router.get("/player/{player_id}/week/{week}", response_model=List[HighlightResponse])
 async def get_player_highlights(
     player_id: str,
     week: int,
-    current_user: User = Depends(get_current_user),
+    response: Response,
+    season: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get highlights for a specific player and week"""
-    # Get highlights for the player
-    highlights = db.query(Play).filter(
-        Play.week == week,
-        Play.player_ids.contains([player_id]),
-        Play.is_highlight_worthy == True
-    ).all()
+    _check_cursor(cursor)
     
-    result = []
-    for highlight in highlights:
-        clips = db.query(Clip).filter(Clip.play_id == highlight.id).all()
-        clip_data = [
-            {
-                'id': clip.id,
-                'provider': clip.provider,
-                'url': clip.url,
-                'embed_url': clip.embed_url,
-                'start_sec': clip.start_sec,
-                'end_sec': clip.end_sec,
-                'confidence': clip.confidence
-            }
-            for clip in clips
-        ]
-        
-        result.append({
-            'id': highlight.id,
-            'game_id': highlight.game_id,
-            'play_id': highlight.play_id,
-            'week': highlight.week,
-            'quarter': highlight.quarter,
-            'game_clock': highlight.game_clock,
-            'team': highlight.team,
-            'player_ids': highlight.player_ids,
-            'event_type': highlight.event_type,
-            'yards_gained': highlight.yards_gained,
-            'fantasy_points': highlight.fantasy_points,
-            'is_highlight_worthy': highlight.is_highlight_worthy,
-            'clips': clip_data
-        })
+    # Get highlights for the player
+    def load(session: Session):
+        query = involving_players(highlight_feed_query(session), [player_id], week, season)
+        return paginate(query, cursor, limit)
     
-    return result
+    return _page(*await run_db(db, load), response)
+
+def _check_cursor(cursor: Optional[str]) -> None:
+    if not cursor:
+        return
+    try:
+        decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _page(plays: List[Play], next_cursor: Optional[str], response: Response) -> List[Play]:
+    # The body stays a plain list; the next page is advertised in a header
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return plays
+
+def _cached_page(entry: FeedEntry, if_none_match: Optional[str]) -> Response:
+    headers = {"ETag": entry.etag, "Cache-Control": "private, no-cache"}
+    if entry.next_cursor:
+        headers["X-Next-Cursor"] = entry.next_cursor
+    if etag_matches(if_none_match, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
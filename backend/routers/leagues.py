@@ -1,13 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List, Dict
+import asyncio
+from typing import Any, List, Dict, Optional
 from pydantic import BaseModel
 from datetime import datetime
 
-from database import get_db
-from models import User, League, Roster
-from services.sleeper_service import SleeperService
-from routers.auth import get_current_user
+from database import get_db, run_db
+from models import User, League, Roster, RosterHighlight, LeagueRosterSnapshot
+from services.sleeper_service import SleeperService, get_sleeper_service
+from services.player_directory import get_player_directory
+from services.feed_cache import bump_feed_versions, get_feed_cache
+from services.highlight_rules import get_highlight_rule_engine
+from services.roster_sync import fetch_league_week, find_owner_team, load_snapshot, save_snapshot
+from services.job_queue import get_job_queue
+from services.single_flight import get_single_flight
+from routers.auth import Principal, get_current_user
 
 router = APIRouter()
 
@@ -33,167 +41,333 @@ class RosterResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class HighlightRulesUpdate(BaseModel):
+    # A list replaces the default rules; {"rules": [...], "disable": [...]} adjusts them; null resets
+    highlight_rules: Any = None
+
+class HighlightRulesResponse(BaseModel):
+    highlight_rules: Any = None
+    effective_rules: List[Dict]
+
+def get_user_league(db: Session, user_id: int, league_id: int):
+    return db.query(League).filter(
+        League.id == league_id,
+        League.user_id == user_id
+    ).first()
+
 @router.post("/connect", response_model=LeagueResponse)
 async def connect_league(
     league_data: LeagueConnect,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    sleeper_service: SleeperService = Depends(get_sleeper_service)
 ):
     """Connect a Sleeper league to the user's account"""
-    sleeper_service = SleeperService()
-    
-    try:
-        # Get league info from Sleeper
-        league_info = await sleeper_service.get_league_info(league_data.league_id)
+    async def connect() -> LeagueResponse:
+        # Get league info and the user's Sleeper account from Sleeper
+        league_info, sleeper_user = await asyncio.gather(
+            sleeper_service.get_league_info(league_data.league_id),
+            sleeper_service.get_user_by_username(league_data.sleeper_username)
+        )
         if not league_info:
             raise HTTPException(status_code=404, detail="League not found")
+        if not sleeper_user:
+            raise HTTPException(status_code=404, detail="Sleeper user not found")
+        sleeper_user_id = sleeper_user.get('user_id')
         
-        # Check if league already exists for this user
-        existing_league = db.query(League).filter(
-            League.user_id == current_user.id,
-            League.sleeper_league_id == league_data.league_id
-        ).first()
+        def save(session: Session, retry: bool = True) -> LeagueResponse:
+            # Check if league already exists for this user
+            existing_league = session.query(League).filter(
+                League.user_id == current_user.id,
+                League.sleeper_league_id == league_data.league_id
+            ).first()
+            
+            if existing_league:
+                # Leagues connected before owners were tracked learn theirs now
+                if existing_league.sleeper_user_id != sleeper_user_id:
+                    existing_league.sleeper_user_id = sleeper_user_id
+                    session.commit()
+                    session.refresh(existing_league)
+                return LeagueResponse.model_validate(existing_league)
+            
+            # Create new league record
+            league = League(
+                user_id=current_user.id,
+                sleeper_league_id=league_data.league_id,
+                sleeper_user_id=sleeper_user_id,
+                name=league_info.get('name', 'Unknown League'),
+                season=league_info.get('season', '2024'),
+                scoring_settings=league_info.get('scoring_settings', {})
+            )
+            
+            session.add(league)
+            try:
+                session.commit()
+            except IntegrityError:
+                if not retry:
+                    raise
+                # Connected by a request in another process since the check
+                session.rollback()
+                return save(session, retry=False)
+            session.refresh(league)
+            return LeagueResponse.model_validate(league)
         
-        if existing_league:
-            return existing_league
-        
-        # Create new league record
-        league = League(
-            user_id=current_user.id,
-            sleeper_league_id=league_data.league_id,
-            name=league_info.get('name', 'Unknown League'),
-            season=league_info.get('season', '2024'),
-            scoring_settings=league_info.get('scoring_settings', {})
-        )
-        
-        db.add(league)
-        db.commit()
-        db.refresh(league)
-        
-        await sleeper_service.close()
-        return league
+        return await run_db(db, save)
+    
+    try:
+        # Double taps and retries share one connect instead of racing to insert the league
+        return await get_single_flight().do(f"league:{current_user.id}:{league_data.league_id}", connect)
         
+    except HTTPException:
+        raise
     except Exception as e:
-        await sleeper_service.close()
         raise HTTPException(status_code=500, detail=f"Error connecting league: {str(e)}")
 
 @router.get("/", response_model=List[LeagueResponse])
 async def get_user_leagues(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get all leagues for the current user"""
-    leagues = db.query(League).filter(League.user_id == current_user.id).all()
+    leagues = await run_db(db, lambda session: session.query(League).filter(
+        League.user_id == current_user.id
+    ).all())
     return leagues
 
 @router.get("/{league_id}/roster/{week}", response_model=RosterResponse)
 async def get_roster_for_week(
     league_id: int,
     week: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    sleeper_service: SleeperService = Depends(get_sleeper_service)
 ):
     """Get roster for a specific league and week"""
     # Verify league belongs to user
-    league = db.query(League).filter(
-        League.id == league_id,
-        League.user_id == current_user.id
-    ).first()
+    league = await run_db(db, get_user_league, current_user.id, league_id)
     
     if not league:
         raise HTTPException(status_code=404, detail="League not found")
     
     # Check if roster already exists
-    existing_roster = db.query(Roster).filter(
-        Roster.league_id == league_id,
-        Roster.week == week
-    ).first()
+    existing_roster = await run_db(db, get_week_roster, league_id, week)
     
     if existing_roster:
         return existing_roster
     
-    # Fetch roster from Sleeper
-    sleeper_service = SleeperService()
+    require_sleeper_account(league)
+    
+    async def fetch_roster() -> RosterResponse:
+        # Saved by the request this one waited on, possibly in another process
+        roster = await run_db(db, get_week_roster, league_id, week)
+        if not roster:
+            teams = await get_league_week_teams(db, sleeper_service, league.sleeper_league_id, week)
+            roster = await save_user_roster(db, league, week, teams)
+        return RosterResponse.model_validate(roster)
     
     try:
-        # Get league users to find current user's roster
-        league_users = await sleeper_service.get_league_users(league.sleeper_league_id)
-        user_mapping = {user['user_id']: user for user in league_users}
+        # Concurrent misses (a whole league opening the app after a push) wait on one fetch
+        return await get_single_flight().do(f"roster:{league_id}:{week}", fetch_roster)
         
-        # Get rosters
-        rosters = await sleeper_service.get_league_rosters(league.sleeper_league_id)
-        
-        # Find user's roster
-        user_roster = None
-        for roster in rosters:
-            if roster.get('owner_id') in user_mapping:
-                user_roster = roster
-                break
-        
-        if not user_roster:
-            raise HTTPException(status_code=404, detail="Roster not found")
-        
-        # Create roster record
-        roster = Roster(
-            league_id=league_id,
-            week=week,
-            player_ids=user_roster.get('players', [])
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching roster: {str(e)}")
+
+@router.post("/{league_id}/roster/{week}/sync", response_model=RosterResponse)
+async def sync_roster_for_week(
+    league_id: int,
+    week: int,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    sleeper_service: SleeperService = Depends(get_sleeper_service)
+):
+    """Re-sync every team in the league for a week and update the user's roster"""
+    league = await run_db(db, get_user_league, current_user.id, league_id)
+    
+    if not league:
+        raise HTTPException(status_code=404, detail="League not found")
+    
+    require_sleeper_account(league)
+    
+    try:
+        teams = await get_single_flight().do(
+            f"sync:{league.sleeper_league_id}:{week}",
+            lambda: sync_league_week(db, sleeper_service, league.sleeper_league_id, week)
         )
+        return await save_user_roster(db, league, week, teams)
         
-        db.add(roster)
-        db.commit()
-        db.refresh(roster)
-        
-        await sleeper_service.close()
-        return roster
-        
+    except HTTPException:
+        raise
     except Exception as e:
-        await sleeper_service.close()
-        raise HTTPException(status_code=500, detail=f"Error fetching roster: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error syncing roster: {str(e)}")
+
+def get_week_roster(db: Session, league_id: int, week: int) -> Optional[Roster]:
+    return db.query(Roster).filter(
+        Roster.league_id == league_id,
+        Roster.week == week
+    ).first()
+
+async def get_league_week_teams(db: Session, sleeper_service: SleeperService, sleeper_league_id: str,
+                                week: int) -> List[LeagueRosterSnapshot]:
+    """The league's snapshot for the week; every team is synced together, so the other
+    managers in the league are served from it"""
+    async def load_or_sync() -> List[LeagueRosterSnapshot]:
+        teams = await run_db(db, load_snapshot, sleeper_league_id, week)
+        return teams or await sync_league_week(db, sleeper_service, sleeper_league_id, week)
+    
+    return await get_single_flight().do(f"snapshot:{sleeper_league_id}:{week}", load_or_sync)
+
+async def sync_league_week(db: Session, sleeper_service: SleeperService, sleeper_league_id: str,
+                           week: int) -> List[LeagueRosterSnapshot]:
+    """Fetch every team from Sleeper and store them as the league's snapshot for the week"""
+    teams = await fetch_league_week(sleeper_service, sleeper_league_id, week)
+    if not teams:
+        # Sleeper unavailable or the league has no rosters; keep whatever was stored
+        raise HTTPException(status_code=404, detail="Roster not found")
+    return await run_db(db, save_snapshot, sleeper_league_id, week, teams)
+
+def require_sleeper_account(league: League) -> None:
+    """Leagues connected before the Sleeper account was stored can't be matched to a team;
+    the app username isn't necessarily the Sleeper one, so the client must reconnect"""
+    if not league.sleeper_user_id:
+        raise HTTPException(
+            status_code=409,
+            detail="Reconnect the league with your Sleeper username (sleeper_username) to find your roster"
+        )
+
+async def save_user_roster(db: Session, league: League, week: int,
+                           teams: List[LeagueRosterSnapshot]) -> Roster:
+    """Create or update the user's roster from their team in the snapshot"""
+    team = find_owner_team(teams, league.sleeper_user_id)
+    
+    if not team:
+        raise HTTPException(status_code=404, detail="Roster not found")
+    
+    def save(session: Session, retry: bool = True) -> Roster:
+        roster = get_week_roster(session, league.id, week)
+        if roster is None:
+            roster = Roster(league_id=league.id, week=week)
+            session.add(roster)
+        roster.sleeper_roster_id = team.sleeper_roster_id
+        roster.player_ids = list(team.player_ids or [])
+        try:
+            session.flush()
+        except IntegrityError:
+            if not retry:
+                raise
+            # Inserted by a request in another process since the read; update that one
+            session.rollback()
+            return save(session, retry=False)
+        # The week's feed depends on who is on the roster
+        bump_feed_versions(session, [(league.id, week)])
+        session.commit()
+        session.refresh(roster)
+        return roster
+    
+    roster = await run_db(db, save)
+    get_feed_cache().invalidate([(league.id, week)])
+    return roster
 
 @router.get("/{league_id}/players")
 async def get_league_players(
     league_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    sleeper_service: SleeperService = Depends(get_sleeper_service)
 ):
     """Get all players in a league with their details"""
     # Verify league belongs to user
-    league = db.query(League).filter(
-        League.id == league_id,
-        League.user_id == current_user.id
-    ).first()
+    league = await run_db(db, get_user_league, current_user.id, league_id)
     
     if not league:
         raise HTTPException(status_code=404, detail="League not found")
     
-    sleeper_service = SleeperService()
-    
     try:
-        # Get all players
-        players = await sleeper_service.get_players()
+        # Make sure the local player directory is loaded
+        player_directory = get_player_directory()
+        await player_directory.ensure_fresh(sleeper_service)
         
         # Get league rosters to see which players are rostered
         rosters = await sleeper_service.get_league_rosters(league.sleeper_league_id)
         all_rostered_players = set()
         for roster in rosters:
-            all_rostered_players.update(roster.get('players', []))
+            all_rostered_players.update(roster.get('players') or [])
         
-        # Filter and format player data
+        # Look up and format player data
         league_players = []
-        for player_id, player_data in players.items():
-            if player_id in all_rostered_players:
-                league_players.append({
-                    'player_id': player_id,
-                    'name': player_data.get('full_name', 'Unknown'),
-                    'position': player_data.get('position', 'Unknown'),
-                    'team': player_data.get('team', 'Unknown'),
-                    'status': player_data.get('status', 'Unknown')
-                })
+        for player_id, player in player_directory.get_many(all_rostered_players).items():
+            league_players.append({
+                'player_id': player_id,
+                'name': player.full_name or 'Unknown',
+                'position': player.position or 'Unknown',
+                'team': player.team or 'Unknown',
+                'status': player.status or 'Unknown'
+            })
         
-        await sleeper_service.close()
         return league_players
         
     except Exception as e:
-        await sleeper_service.close()
         raise HTTPException(status_code=500, detail=f"Error fetching players: {str(e)}")
+
+@router.get("/{league_id}/highlight-rules", response_model=HighlightRulesResponse)
+async def get_highlight_rules(
+    league_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get the league's highlight rule overrides and the rules they produce"""
+    league = await run_db(db, get_user_league, current_user.id, league_id)
+    
+    if not league:
+        raise HTTPException(status_code=404, detail="League not found")
+    
+    return {
+        "highlight_rules": league.highlight_rules,
+        "effective_rules": get_highlight_rule_engine().resolve(league.highlight_rules)
+    }
+
+@router.put("/{league_id}/highlight-rules", response_model=HighlightRulesResponse)
+async def update_highlight_rules(
+    league_id: int,
+    rules_data: HighlightRulesUpdate,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Set which plays count as highlights for this league; its saved highlights are rebuilt under them"""
+    rule_engine = get_highlight_rule_engine()
+    try:
+        # Rejects unknown columns and operators before anything is saved
+        rule_engine.compile(rules_data.highlight_rules)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    def save(session: Session):
+        league = get_user_league(session, current_user.id, league_id)
+        if not league:
+            raise HTTPException(status_code=404, detail="League not found")
+        league.highlight_rules = rules_data.highlight_rules
+        
+        # Highlights picked under the old rules leave the league's feeds now
+        rosters = session.query(Roster.id, Roster.week).filter(Roster.league_id == league.id).all()
+        session.query(RosterHighlight).filter(
+            RosterHighlight.roster_id.in_([roster_id for roster_id, _ in rosters])
+        ).delete(synchronize_session=False)
+        weeks = sorted({week for _, week in rosters})
+        bump_feed_versions(session, [(league.id, week) for week in weeks])
+        session.commit()
+        session.refresh(league)
+        return league, weeks
+    
+    league, weeks = await run_db(db, save)
+    get_feed_cache().invalidate([(league.id, week) for week in weeks])
+    
+    # ...and jobs rebuild them under the new rules
+    job_queue = get_job_queue()
+    for week in weeks:
+        await run_db(db, job_queue.enqueue, league.id, week, int(league.season))
+    
+    return {
+        "highlight_rules": league.highlight_rules,
+        "effective_rules": rule_engine.resolve(league.highlight_rules)
+    }
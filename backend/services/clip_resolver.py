@@ -0,0 +1,228 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+from models import Clip, GameVideo, Play
+from services.teams import parse_game_id
+from services.timestamp_index import TimestampIndex
+from services.youtube_service import YouTubeService
+
+load_dotenv()
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # SQLite hands timestamps back without a timezone
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+def _clock_seconds(game_clock) -> Optional[float]:
+    try:
+        return float(game_clock)
+    except (TypeError, ValueError):
+        return None
+
+class ClipResolver:
+    """Finds clips for many plays by resolving one highlights video per game"""
+
+    def __init__(self, concurrency: Optional[int] = None, timeout_seconds: Optional[float] = None,
+                 commit_batch_size: Optional[int] = None, retry_seconds: Optional[int] = None):
+        self.concurrency = concurrency or int(os.getenv("CLIP_SEARCH_CONCURRENCY", "8"))
+        # Upper bound for one game's lookup (search plus detail calls)
+        self.timeout_seconds = timeout_seconds or float(os.getenv("CLIP_SEARCH_TIMEOUT_SECONDS", "30"))
+        self.commit_batch_size = commit_batch_size or int(os.getenv("CLIP_COMMIT_BATCH_SIZE", "5"))
+        # Games without a video yet are searched again after this long
+        self.retry_seconds = retry_seconds or int(os.getenv("GAME_VIDEO_RETRY_SECONDS", "3600"))
+        self._local = threading.local()
+
+    def _youtube_service(self) -> YouTubeService:
+        # The Google API client isn't thread-safe, so each pool thread gets its own
+        if not hasattr(self._local, 'youtube_service'):
+            self._local.youtube_service = YouTubeService()
+        return self._local.youtube_service
+
+    def _find_game_video(self, game: Dict) -> Optional[Dict]:
+        return self._youtube_service().find_game_video(
+            game['home_team'],
+            game['away_team'],
+            game['week'],
+            game['season']
+        )
+
+    async def _find_game_video_with_timeout(self, loop, executor,
+                                            game: Dict) -> Tuple[Dict, Optional[Dict], bool]:
+        """(game, video, failed): failed lookups are told apart from searches that found nothing"""
+        try:
+            video = await asyncio.wait_for(
+                loop.run_in_executor(executor, self._find_game_video, game),
+                timeout=self.timeout_seconds
+            )
+        except asyncio.TimeoutError:
+            print(f"Timed out finding video for game {game['game_id']}")
+            return game, None, True
+        except Exception as e:
+            # HTTP errors, quota 403s, a missing API key: the plays are saved without a clip for now
+            print(f"Error finding video for game {game['game_id']}: {e}")
+            return game, None, True
+        return game, video, False
+
+    def _needs_search(self, game_video: Optional[GameVideo]) -> bool:
+        if game_video is None:
+            return True
+        if game_video.status == "found":
+            return False
+        if game_video.status == "error":
+            # The last lookup failed rather than finding nothing, so the next job tries again
+            return True
+        resolved_at = _as_utc(game_video.resolved_at)
+        return resolved_at is None or _utcnow() - resolved_at >= timedelta(seconds=self.retry_seconds)
+
+    def _save_game_video(self, db: Session, game: Dict, game_video: Optional[GameVideo],
+                         video: Optional[Dict], failed: bool = False) -> GameVideo:
+        if game_video is None:
+            game_video = GameVideo(game_id=game['game_id'])
+            db.add(game_video)
+
+        game_video.season = game['season']
+        game_video.week = game['week']
+        game_video.home_team = game['home_team']
+        game_video.away_team = game['away_team']
+        game_video.resolved_at = _utcnow()
+        if video:
+            game_video.status = "found"
+            game_video.provider = "youtube"
+            game_video.video_id = video['video_id']
+            game_video.url = video['url']
+            game_video.embed_url = video['embed_url']
+            game_video.title = video['title']
+            game_video.channel_title = video['channel_title']
+            game_video.description = video['description']
+            game_video.timestamp_index = TimestampIndex.build(
+                video['description'], video.get('duration')
+            ).to_json()
+            game_video.confidence = video['confidence']
+        elif failed:
+            game_video.status = "error"
+        else:
+            game_video.status = "not_found"
+
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another worker resolved the same game first
+            db.rollback()
+            game_video = db.query(GameVideo).filter(GameVideo.game_id == game['game_id']).first()
+        return game_video
+
+    def _timestamp_index(self, game_video: GameVideo) -> TimestampIndex:
+        if game_video.timestamp_index is None:
+            # Videos resolved before the index existed
+            game_video.timestamp_index = TimestampIndex.build(game_video.description).to_json()
+        return TimestampIndex.from_json(game_video.timestamp_index)
+
+    def _make_clip(self, game_video: GameVideo, timestamp_index: TimestampIndex, play: Play,
+                   player_name: str) -> Clip:
+        # Only the timestamp alignment runs per play
+        start_sec = timestamp_index.align({
+            'play_type': play.event_type,
+            'player_name': player_name,
+            'quarter': play.quarter,
+            'game_clock': _clock_seconds(play.game_clock)
+        })
+        return Clip(
+            play_id=play.id,
+            game_video_id=game_video.id,
+            provider=game_video.provider,
+            url=game_video.url,
+            embed_url=game_video.embed_url,
+            start_sec=start_sec,
+            end_sec=start_sec + 30,  # 30 second clip
+            confidence=game_video.confidence
+        )
+
+    async def resolve(self, db: Session, plays: List[Play], player_names: Dict[int, str],
+                      on_commit: Optional[Callable[[List[Clip]], None]] = None) -> int:
+        """Find and save clips for the plays, returning how many were saved"""
+        # on_commit gets each batch of clips flushed (so they have ids) but not yet
+        # committed, so callers can record progress in the same transaction
+        # Read everything the threads need up front; ORM objects stay on this thread
+        games: Dict[str, Dict] = {}
+        plays_by_game: Dict[str, List[Play]] = {}
+        for play in plays:
+            if play.game_id not in games:
+                away_team, home_team = play.away_team, play.home_team
+                if not home_team or not away_team:
+                    away_team, home_team = parse_game_id(play.game_id)
+                games[play.game_id] = {
+                    'game_id': play.game_id,
+                    'season': int(play.season),
+                    'week': play.week,
+                    'home_team': home_team,
+                    'away_team': away_team
+                }
+            plays_by_game.setdefault(play.game_id, []).append(play)
+        if not games:
+            return 0
+
+        # Videos already resolved for these games, by earlier jobs or other leagues
+        game_videos = {
+            game_video.game_id: game_video
+            for game_video in db.query(GameVideo).filter(GameVideo.game_id.in_(list(games))).all()
+        }
+        to_search = [game for game_id, game in games.items() if self._needs_search(game_videos.get(game_id))]
+
+        saved = 0
+        pending: List[Clip] = []
+
+        def flush():
+            db.add_all(pending)
+            db.flush()
+            if on_commit:
+                on_commit(pending)
+            db.commit()
+
+        def add_clips(game_video: Optional[GameVideo]) -> None:
+            nonlocal saved, pending
+            if game_video is None or game_video.status != "found":
+                return
+            timestamp_index = self._timestamp_index(game_video)
+            for play in plays_by_game[game_video.game_id]:
+                pending.append(self._make_clip(
+                    game_video, timestamp_index, play, player_names.get(play.id, "Unknown Player")
+                ))
+
+                # Commit in batches so clips show up while the job is still running
+                if len(pending) >= self.commit_batch_size:
+                    flush()
+                    saved += len(pending)
+                    pending = []
+
+        searched_ids = {game['game_id'] for game in to_search}
+        for game_id in games:
+            if game_id not in searched_ids:
+                add_clips(game_videos.get(game_id))
+
+        if to_search:
+            loop = asyncio.get_running_loop()
+            executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="clip")
+            try:
+                tasks = [self._find_game_video_with_timeout(loop, executor, game) for game in to_search]
+                for task in asyncio.as_completed(tasks):
+                    game, video, failed = await task
+                    add_clips(self._save_game_video(db, game, game_videos.get(game['game_id']), video, failed))
+            finally:
+                # Don't block the event loop on lookups that already timed out
+                executor.shutdown(wait=False)
+
+        if pending:
+            flush()
+            saved += len(pending)
+
+        return saved
@@ -0,0 +1,222 @@
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+from models import HighlightFeedVersion
+from services.ttl_cache import TTLCache
+
+load_dotenv()
+
+@dataclass(frozen=True)
+class FeedEntry:
+    """One serialized feed page, as sent to clients"""
+    version: int
+    etag: str
+    body: bytes
+    next_cursor: Optional[str] = None
+
+    def to_json(self) -> str:
+        return json.dumps({
+            'version': self.version,
+            'etag': self.etag,
+            'body': self.body.decode(),
+            'next_cursor': self.next_cursor
+        })
+
+    @classmethod
+    def from_json(cls, data) -> "FeedEntry":
+        payload = json.loads(data)
+        return cls(payload['version'], payload['etag'], payload['body'].encode(), payload['next_cursor'])
+
+def make_etag(body: bytes) -> str:
+    return f'"{hashlib.sha1(body).hexdigest()}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check; weak validators compare equal to their strong form"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+def bump_feed_versions(db: Session, feeds: Iterable[Tuple[int, int]]) -> None:
+    """Mark (league_id, week) feeds as changed; the caller commits"""
+    for league_id, week in sorted(set(feeds)):
+        updated = db.query(HighlightFeedVersion).filter(
+            HighlightFeedVersion.league_id == league_id,
+            HighlightFeedVersion.week == week
+        ).update({HighlightFeedVersion.version: HighlightFeedVersion.version + 1}, synchronize_session=False)
+        if updated:
+            continue
+
+        try:
+            with db.begin_nested():
+                db.add(HighlightFeedVersion(league_id=league_id, week=week, version=1))
+        except IntegrityError:
+            # Created by another process since the UPDATE
+            db.query(HighlightFeedVersion).filter(
+                HighlightFeedVersion.league_id == league_id,
+                HighlightFeedVersion.week == week
+            ).update({HighlightFeedVersion.version: HighlightFeedVersion.version + 1}, synchronize_session=False)
+
+class FeedCache:
+    """Serialized league feeds keyed by feed version: in-process LRU with an optional Redis tier"""
+
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[int] = None,
+                 version_ttl_seconds: Optional[float] = None, redis_url: Optional[str] = None):
+        self.ttl_seconds = ttl_seconds or int(os.getenv("FEED_CACHE_TTL_SECONDS", "600"))
+        self.entries = TTLCache(
+            maxsize=max_entries or int(os.getenv("FEED_CACHE_MAX_ENTRIES", "2048")),
+            ttl=self.ttl_seconds
+        )
+        # Versions bumped in another process (the workers) are noticed once this expires
+        self.version_ttl_seconds = version_ttl_seconds or float(os.getenv("FEED_VERSION_TTL_SECONDS", "5"))
+        self.versions = TTLCache(maxsize=16384, ttl=self.version_ttl_seconds)
+        self.redis = None
+        self.redis_prefix = os.getenv("FEED_CACHE_REDIS_PREFIX", "fantasy_clips:feed")
+        redis_url = redis_url or os.getenv("FEED_CACHE_REDIS_URL")
+        if redis_url:
+            import redis
+
+            self.redis = redis.Redis.from_url(redis_url)
+        self.redis_hits = 0
+        self.builds = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, key: Tuple[Hashable, ...]) -> Optional[FeedEntry]:
+        """Memory-only lookup for a feed whose version was checked recently; no I/O"""
+        version = self.versions.get(self._feed(key))
+        if version is None:
+            return None
+        entry = self.entries.get(key)
+        if entry is None or entry.version != version:
+            return None
+        return entry
+
+    def fetch(self, db: Session, key: Tuple[Hashable, ...],
+              build: Callable[[Session], Tuple[List, Optional[str]]]) -> FeedEntry:
+        """Cached feed at the current version, built with build(db) on a miss"""
+        version = self._version(db, key)
+
+        entry = self.entries.get(key)
+        if entry is not None and entry.version == version:
+            return entry
+
+        entry = self._redis_get(key, version)
+        if entry is not None:
+            with self._lock:
+                self.redis_hits += 1
+            self.entries.set(key, entry)
+            return entry
+
+        items, next_cursor = build(db)
+        body = json.dumps(items, separators=(",", ":")).encode()
+        entry = FeedEntry(version, make_etag(body), body, next_cursor)
+        with self._lock:
+            self.builds += 1
+        self.entries.set(key, entry)
+        self._redis_set(key, entry)
+        return entry
+
+    def invalidate(self, feeds: Iterable[Tuple[int, int]]) -> None:
+        """Forget cached versions after bump_feed_versions has been committed"""
+        for feed in set(feeds):
+            self.versions.delete(feed)
+            if self.redis is not None:
+                try:
+                    self.redis.delete(self._version_key(feed))
+                except Exception as e:
+                    print(f"Error invalidating feed cache in Redis: {e}")
+
+    def metrics(self) -> Dict:
+        lookups = self.entries.hits + self.entries.misses
+        return {
+            'entries': len(self.entries),
+            'hits': self.entries.hits,
+            'misses': self.entries.misses,
+            'redis_hits': self.redis_hits,
+            'builds': self.builds,
+            'hit_rate': self.entries.hits / lookups if lookups else 0.0
+        }
+
+    def _feed(self, key: Tuple[Hashable, ...]) -> Tuple[int, int]:
+        # Keys start with (league_id, week); the rest identifies the page
+        return key[0], key[1]
+
+    def _version_key(self, feed: Tuple[int, int]) -> str:
+        return f"{self.redis_prefix}:version:{feed[0]}:{feed[1]}"
+
+    def _entry_key(self, key: Tuple[Hashable, ...], version: int) -> str:
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return f"{self.redis_prefix}:entry:{version}:{digest}"
+
+    def _version(self, db: Session, key: Tuple[Hashable, ...]) -> int:
+        feed = self._feed(key)
+        version = self.versions.get(feed)
+        if version is not None:
+            return version
+
+        if self.redis is not None:
+            try:
+                cached = self.redis.get(self._version_key(feed))
+                if cached is not None:
+                    version = int(cached)
+            except Exception as e:
+                print(f"Error reading feed version from Redis: {e}")
+
+        if version is None:
+            version = db.query(HighlightFeedVersion.version).filter(
+                HighlightFeedVersion.league_id == feed[0],
+                HighlightFeedVersion.week == feed[1]
+            ).scalar() or 0
+            if self.redis is not None:
+                try:
+                    # A worker may have bumped and invalidated since the read: never overwrite
+                    # a version another process stored, and keep ours no longer than in memory
+                    self.redis.set(self._version_key(feed), version, nx=True,
+                                   px=int(self.version_ttl_seconds * 1000))
+                except Exception as e:
+                    print(f"Error writing feed version to Redis: {e}")
+
+        self.versions.set(feed, version)
+        return version
+
+    def _redis_get(self, key: Tuple[Hashable, ...], version: int) -> Optional[FeedEntry]:
+        if self.redis is None:
+            return None
+        try:
+            data = self.redis.get(self._entry_key(key, version))
+            return FeedEntry.from_json(data) if data is not None else None
+        except Exception as e:
+            print(f"Error reading feed cache from Redis: {e}")
+            return None
+
+    def _redis_set(self, key: Tuple[Hashable, ...], entry: FeedEntry) -> None:
+        if self.redis is None:
+            return
+        try:
+            self.redis.set(self._entry_key(key, entry.version), entry.to_json(), ex=self.ttl_seconds)
+        except Exception as e:
+            print(f"Error writing feed cache to Redis: {e}")
+
+_feed_cache: Optional[FeedCache] = None
+_feed_cache_lock = threading.Lock()
+
+def get_feed_cache() -> FeedCache:
+    """Get the process-wide feed cache"""
+    global _feed_cache
+    with _feed_cache_lock:
+        if _feed_cache is None:
+            _feed_cache = FeedCache()
+    return _feed_cache
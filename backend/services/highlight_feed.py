@@ -0,0 +1,76 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Query, Session, load_only, selectinload
+from models import Clip, Play, PlayPlayer, RosterHighlight
+
+# Columns the feed endpoints return; everything else stays unloaded
+PLAY_FEED_COLUMNS = (
+    Play.id, Play.game_id, Play.play_id, Play.week, Play.quarter, Play.game_clock, Play.team,
+    Play.player_ids, Play.event_type, Play.yards_gained, Play.fantasy_points, Play.is_highlight_worthy
+)
+CLIP_FEED_COLUMNS = (
+    Clip.id, Clip.play_id, Clip.provider, Clip.url, Clip.embed_url, Clip.start_sec, Clip.end_sec,
+    Clip.confidence
+)
+
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(play: Play) -> str:
+    return f"{play.week}:{play.id}"
+
+def decode_cursor(cursor: str) -> Tuple[int, int]:
+    """Cursor -> (week, id); raises ValueError when malformed"""
+    week, play_id = cursor.split(':')
+    return int(week), int(play_id)
+
+def highlight_feed_query(db: Session) -> Query:
+    """Highlight plays with their clips: one query for the plays, one for all their clips"""
+    return db.query(Play).options(
+        load_only(*PLAY_FEED_COLUMNS),
+        selectinload(Play.clips).load_only(*CLIP_FEED_COLUMNS)
+    ).filter(Play.is_highlight_worthy == True)
+
+def involving_players(query: Query, player_ids: Iterable[str], week: int,
+                      season: Optional[str] = None) -> Query:
+    """Restrict a feed query to plays involving any of the players, through play_players"""
+    # Served by the (player_id, season, week) index; IN keeps each play once
+    # even when several of the players are in it
+    involved = select(PlayPlayer.play_id).where(
+        PlayPlayer.player_id.in_(list(player_ids)),
+        PlayPlayer.week == week
+    )
+    if season is not None:
+        involved = involved.where(PlayPlayer.season == str(season))
+    return query.filter(Play.week == week, Play.id.in_(involved))
+
+def in_roster_feed(query: Query, roster_id: int) -> Query:
+    """Restrict a feed query to the plays a job saved as highlights for the roster"""
+    return query.filter(Play.id.in_(
+        select(RosterHighlight.play_id).where(RosterHighlight.roster_id == roster_id)
+    ))
+
+def roster_highlights(db: Session, roster_id: int, plays: List[Play]) -> Dict[int, RosterHighlight]:
+    """The roster's own players and points for a page of plays, by play row id"""
+    if not plays:
+        return {}
+    return {
+        highlight.play_id: highlight
+        for highlight in db.query(RosterHighlight).filter(
+            RosterHighlight.roster_id == roster_id,
+            RosterHighlight.play_id.in_([play.id for play in plays])
+        )
+    }
+
+def paginate(query: Query, cursor: Optional[str], limit: int) -> Tuple[List[Play], Optional[str]]:
+    """Keyset page ordered by (week, id), plus the cursor for the next page"""
+    if cursor:
+        week, play_id = decode_cursor(cursor)
+        query = query.filter(or_(Play.week > week, and_(Play.week == week, Play.id > play_id)))
+
+    # One extra row tells whether there is another page
+    plays = query.order_by(Play.week, Play.id).limit(limit + 1).all()
+    if len(plays) > limit:
+        plays = plays[:limit]
+        return plays, encode_cursor(plays[-1])
+    return plays, None
@@ -0,0 +1,133 @@
+from typing import Dict, List, Set
+from sqlalchemy.orm import Session, selectinload
+from models import Clip, HighlightJob, Roster
+from services.clip_resolver import ClipResolver
+from services.highlight_service import HighlightService
+from services.job_events import add_job_event, add_progress_events, highlight_payload
+from services.job_queue import get_job_queue
+from services.play_merge import reconcile_live_plays
+from services.player_crosswalk import get_player_crosswalk
+from services.player_directory import get_player_directory
+from services.sleeper_service import get_sleeper_service
+
+def _set_stage(db: Session, jobs: List[HighlightJob], stage: str) -> None:
+    for job in jobs:
+        job.stage = stage
+    get_job_queue().heartbeat(jobs)
+    add_progress_events(db, jobs)
+    db.commit()
+
+async def run_highlight_jobs(db: Session, jobs: List[HighlightJob], worker_id: str) -> None:
+    """Run claimed jobs for one season and week with a single play-by-play scan"""
+    job_queue = get_job_queue()
+    season, week = jobs[0].season, jobs[0].week
+
+    try:
+        _set_stage(db, jobs, "scanning")
+
+        # Every roster of every league in the batch
+        jobs_by_league = {job.league_id: job for job in jobs}
+        rosters = db.query(Roster).options(selectinload(Roster.league)).filter(
+            Roster.league_id.in_(list(jobs_by_league)),
+            Roster.week == week
+        ).all()
+
+        # Roster ids are matched against play-by-play through the crosswalk
+        sleeper_service = get_sleeper_service()
+        await get_player_crosswalk().ensure_fresh(sleeper_service)
+
+        # Process highlights for every roster in one pass
+        highlight_service = HighlightService(db)
+        weekly_pbp = await highlight_service.fetch_weekly_plays(season, week)
+        # Errors fail the job here: its results replace the rosters' saved highlights below
+        highlights_by_roster = highlight_service.route_plays(weekly_pbp, rosters, season, week)
+
+        # Which jobs each play belongs to, with that job's roster highlight, for per-job progress
+        jobs_by_play: Dict[str, Dict[int, Dict]] = {}
+        for job in jobs:
+            job.plays_scanned = len(weekly_pbp)
+            job.highlights_found = 0
+        for roster in rosters:
+            job = jobs_by_league[roster.league_id]
+            for highlight in highlights_by_roster.get(roster.id, []):
+                job.highlights_found += 1
+                jobs_by_play.setdefault(str(highlight['play_id']), {})[job.id] = highlight
+
+        # Save highlights to database
+        _set_stage(db, jobs, "saving")
+        # A full scan is each roster's complete result, so highlights the league's
+        # rules no longer allow are dropped; without play-by-play, nothing is dropped
+        saved_plays = await highlight_service.save_highlights_to_db(
+            highlights_by_roster, replace=not weekly_pbp.empty
+        )
+        # Plays ingested live during the games are folded into these, clips and all
+        reconcile_live_plays(db, season, week)
+
+        # Find video clips for each highlight
+        _set_stage(db, jobs, "clips")
+
+        # Load the player directory for names
+        player_directory = get_player_directory()
+        await player_directory.ensure_fresh(sleeper_service)
+
+        # Plays saved by an earlier job keep their clips; the rest (new or not) get one now
+        saved_ids = [play.id for play in saved_plays]
+        with_clips = {
+            play_id for (play_id,) in db.query(Clip.play_id).filter(Clip.play_id.in_(saved_ids)).distinct()
+        }
+        highlight_plays = [
+            play for play in saved_plays if play.is_highlight_worthy and play.id not in with_clips
+        ]
+        player_names = {}
+        for play in highlight_plays:
+            # Get player name (simplified - in production, you'd want better player matching)
+            player_id = play.player_ids[0] if play.player_ids else None
+            player = player_directory.get(player_id) if player_id else None
+            if player and player.full_name:
+                player_names[play.id] = player.full_name
+
+        jobs_by_id = {job.id: job for job in jobs}
+
+        def add_highlight_events(play, clips: List[Clip]) -> None:
+            # Streams show each highlight once its clips are committed, with the job's league's points
+            for job_id, highlight in jobs_by_play.get(str(play.play_id), {}).items():
+                add_job_event(db, job_id, "highlight", highlight_payload(play, clips, highlight))
+
+        # Highlights that already had clips are complete now
+        existing_clips: Dict[int, List[Clip]] = {}
+        for clip in db.query(Clip).filter(Clip.play_id.in_(list(with_clips))).all():
+            existing_clips.setdefault(clip.play_id, []).append(clip)
+        for play in saved_plays:
+            if play.is_highlight_worthy and play.id in existing_clips:
+                add_highlight_events(play, existing_clips[play.id])
+        db.commit()
+
+        plays_by_id = {play.id: play for play in highlight_plays}
+        streamed: Set[int] = set()
+
+        def record_progress(clips: List[Clip]) -> None:
+            clips_by_play: Dict[int, List[Clip]] = {}
+            for clip in clips:
+                clips_by_play.setdefault(clip.play_id, []).append(clip)
+                for job_id in jobs_by_play.get(str(plays_by_id[clip.play_id].play_id), ()):
+                    jobs_by_id[job_id].clips_resolved += 1
+            for play_id, play_clips in clips_by_play.items():
+                add_highlight_events(plays_by_id[play_id], play_clips)
+                streamed.add(play_id)
+            job_queue.heartbeat(jobs)
+            add_progress_events(db, jobs)
+
+        # Lookups run concurrently; finished clips are committed in batches
+        await ClipResolver().resolve(db, highlight_plays, player_names, on_commit=record_progress)
+
+        # Highlights no video was found for still belong in the feed
+        for play in highlight_plays:
+            if play.id not in streamed:
+                add_highlight_events(play, [])
+        db.commit()
+        job_queue.complete(db, jobs, worker_id)
+
+    except Exception as e:
+        print(f"Error processing highlights: {e}")
+        db.rollback()
+        job_queue.fail(db, jobs, worker_id, str(e))
@@ -0,0 +1,212 @@
+import hashlib
+import json
+import os
+import threading
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Default criteria over nflverse play-by-play columns. A play is a highlight
+# when every condition of any one rule holds.
+DEFAULT_HIGHLIGHT_RULES = [
+    {'name': 'touchdown', 'when': {'touchdown': 1}},
+    {'name': 'big_play', 'when': {'yards_gained': {'gte': 20}}},
+    {'name': 'interception', 'when': {'interception': 1}},
+    {'name': 'fumble_lost', 'when': {'fumble_lost': 1}},
+    {'name': 'sack', 'when': {'sack': 1}},
+    {'name': 'long_field_goal', 'when': {'field_goal_result': 'made', 'kick_distance': {'gte': 40}}},
+]
+
+# Columns rules may use (all kept in the play store)
+NUMERIC_RULE_COLUMNS = [
+    'qtr',
+    'game_seconds_remaining',
+    'yards_gained',
+    'passing_yards',
+    'rushing_yards',
+    'receiving_yards',
+    'pass_attempt',
+    'complete_pass',
+    'rush_attempt',
+    'touchdown',
+    'pass_touchdown',
+    'rush_touchdown',
+    'interception',
+    'sack',
+    'fumble',
+    'fumble_lost',
+    'kick_distance',
+]
+TEXT_RULE_COLUMNS = [
+    'play_type',
+    'posteam',
+    'two_point_conv_result',
+    'field_goal_result',
+    'extra_point_result',
+]
+
+OPERATORS = {
+    'eq': lambda values, operand: values == operand,
+    'ne': lambda values, operand: values != operand,
+    'gt': lambda values, operand: values > operand,
+    'gte': lambda values, operand: values >= operand,
+    'lt': lambda values, operand: values < operand,
+    'lte': lambda values, operand: values <= operand,
+    'in': lambda values, operand: pd.Series(values).isin(operand).to_numpy(),
+}
+# Text columns only support equality checks
+TEXT_OPERATORS = {'eq', 'ne', 'in'}
+
+RuleSet = Union[List[Dict], Dict, None]
+# (column, operator, operand) with a hashable operand, so equal conditions share one evaluation
+Condition = Tuple[str, str, object]
+
+def _condition_key(column: str, operator: str, operand) -> Condition:
+    return column, operator, tuple(operand) if operator == 'in' else operand
+
+def _column_values(plays: pd.DataFrame, column: str) -> np.ndarray:
+    if column in NUMERIC_RULE_COLUMNS:
+        # Missing stats become NaN, which only 'ne' matches
+        return pd.to_numeric(plays[column], errors='coerce').to_numpy(dtype=float)
+    return plays[column].astype(object).where(plays[column].notna(), None).to_numpy()
+
+class CompiledRules:
+    """A rule set compiled to conditions that are evaluated column-wise"""
+    __slots__ = ('rules_hash', 'rules', 'columns')
+
+    def __init__(self, rules_hash: str, rules: List[Tuple[str, List[Condition]]]):
+        self.rules_hash = rules_hash
+        self.rules = rules
+        self.columns = sorted({condition[0] for _, conditions in rules for condition in conditions})
+
+class HighlightRuleEngine:
+    """Compiles highlight rules (defaults plus per-league overrides) and evaluates them over frames"""
+
+    def __init__(self, default_rules: Optional[List[Dict]] = None, max_compiled: int = 512):
+        self.default_rules = default_rules or self._configured_rules()
+        self.max_compiled = max_compiled
+        self._compiled: "OrderedDict[str, CompiledRules]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _configured_rules() -> List[Dict]:
+        """Rules from the JSON file at HIGHLIGHT_RULES_PATH, or the built-in defaults"""
+        path = os.getenv("HIGHLIGHT_RULES_PATH")
+        if not path:
+            return DEFAULT_HIGHLIGHT_RULES
+        with open(path) as f:
+            return json.load(f)
+
+    def resolve(self, overrides: RuleSet = None) -> List[Dict]:
+        """Effective rules for a league: a list replaces the defaults; a dict adds/replaces
+        rules by name ("rules") and switches defaults off ("disable")"""
+        if not overrides:
+            return self.default_rules
+        if isinstance(overrides, list):
+            return overrides
+        if not isinstance(overrides, dict):
+            raise ValueError("Highlight rules must be a list of rules or an object of overrides")
+
+        unknown_keys = set(overrides) - {'rules', 'disable'}
+        if unknown_keys:
+            raise ValueError(f"Unknown highlight rule override keys: {sorted(unknown_keys)}")
+        added = {rule.get('name'): rule for rule in overrides.get('rules', []) if isinstance(rule, dict)}
+        disabled = set(overrides.get('disable', []))
+        rules = [
+            added.pop(rule['name'], rule) for rule in self.default_rules if rule['name'] not in disabled
+        ]
+        return rules + [rule for name, rule in added.items() if name not in disabled]
+
+    def compile(self, overrides: RuleSet = None) -> CompiledRules:
+        """Compile a league's rules once; later calls with equal rules hit the cache.
+        Raises ValueError for rules that use unknown columns or operators."""
+        rules = self.resolve(overrides)
+        key = hashlib.sha1(json.dumps(rules, sort_keys=True, default=str).encode()).hexdigest()
+        with self._lock:
+            if key in self._compiled:
+                self._compiled.move_to_end(key)
+                return self._compiled[key]
+
+        compiled = CompiledRules(key, [self._compile_rule(index, rule) for index, rule in enumerate(rules)])
+
+        with self._lock:
+            self._compiled[key] = compiled
+            while len(self._compiled) > self.max_compiled:
+                self._compiled.popitem(last=False)
+
+        return compiled
+
+    def _compile_rule(self, index: int, rule: Dict) -> Tuple[str, List[Condition]]:
+        if not isinstance(rule, dict) or not isinstance(rule.get('when'), dict) or not rule['when']:
+            raise ValueError(f"Highlight rule {index} needs a non-empty 'when' object")
+        name = str(rule.get('name') or f"rule_{index}")
+
+        conditions = []
+        for column, condition in rule['when'].items():
+            if column not in NUMERIC_RULE_COLUMNS and column not in TEXT_RULE_COLUMNS:
+                raise ValueError(f"Highlight rule '{name}' uses unknown column '{column}'")
+            # A bare value means equality
+            if not isinstance(condition, dict):
+                condition = {'eq': condition}
+            for operator, operand in condition.items():
+                if operator not in OPERATORS:
+                    raise ValueError(f"Highlight rule '{name}' uses unknown operator '{operator}'")
+                if column in TEXT_RULE_COLUMNS and operator not in TEXT_OPERATORS:
+                    raise ValueError(f"Highlight rule '{name}': '{column}' only supports eq, ne and in")
+                if operator == 'in' and not isinstance(operand, list):
+                    raise ValueError(f"Highlight rule '{name}': 'in' needs a list")
+                if column in NUMERIC_RULE_COLUMNS:
+                    try:
+                        operand = [float(value) for value in operand] if operator == 'in' else float(operand)
+                    except (TypeError, ValueError):
+                        raise ValueError(f"Highlight rule '{name}': '{column}' compares against numbers")
+                conditions.append(_condition_key(column, operator, operand))
+        return name, conditions
+
+    def evaluate(self, plays: pd.DataFrame, overrides: RuleSet = None) -> np.ndarray:
+        """Boolean highlight mask for every play under one league's rules"""
+        return self.evaluate_many(plays, [self.compile(overrides)])[:, 0]
+
+    def evaluate_many(self, plays: pd.DataFrame, rule_sets: List[CompiledRules]) -> np.ndarray:
+        """Highlight masks for several leagues' rules in one pass (plays x rule sets).
+        Each distinct condition is computed once, however many rule sets use it."""
+        result = np.zeros((len(plays), len(rule_sets)), dtype=bool)
+        if plays.empty or not rule_sets:
+            return result
+
+        columns = sorted({column for rule_set in rule_sets for column in rule_set.columns})
+        frame = plays.reindex(columns=columns)
+        values: Dict[str, np.ndarray] = {}
+        masks: Dict[Condition, np.ndarray] = {}
+
+        def condition_mask(condition: Condition) -> np.ndarray:
+            if condition not in masks:
+                column, operator, operand = condition
+                if column not in values:
+                    values[column] = _column_values(frame, column)
+                masks[condition] = np.asarray(OPERATORS[operator](values[column], operand), dtype=bool)
+            return masks[condition]
+
+        for index, rule_set in enumerate(rule_sets):
+            for _, conditions in rule_set.rules:
+                rule_mask = np.ones(len(plays), dtype=bool)
+                for condition in conditions:
+                    rule_mask &= condition_mask(condition)
+                result[:, index] |= rule_mask
+        return result
+
+# Process-wide engine so compiled rules are shared by every request
+_highlight_rule_engine: Optional[HighlightRuleEngine] = None
+_highlight_rule_engine_lock = threading.Lock()
+
+def get_highlight_rule_engine() -> HighlightRuleEngine:
+    """Get the process-wide highlight rule engine"""
+    global _highlight_rule_engine
+    with _highlight_rule_engine_lock:
+        if _highlight_rule_engine is None:
+            _highlight_rule_engine = HighlightRuleEngine()
+        return _highlight_rule_engine
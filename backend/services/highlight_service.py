@@ -1,179 +1,402 @@
-import nfl_data_py as nfl
 import pandas as pd
 from typing import List, Dict, Optional
+from sqlalchemy import insert as sa_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
-from models import Play, Roster
+from models import Play, PlayPlayer, Roster, RosterHighlight
+from services.play_store import get_play_store
+from services.highlight_rules import get_highlight_rule_engine
+from services.player_crosswalk import get_player_crosswalk
+from services.scoring_engine import ROLE_COLUMNS, get_scoring_engine
+from services.teams import parse_game_id
 import asyncio
 
+# Play-by-play columns that identify the players involved in a play
+PLAYER_ID_COLUMNS = ['passer_player_id', 'rusher_player_id', 'receiver_player_id']
+
+# Plays written per INSERT statement
+UPSERT_BATCH_SIZE = 500
+
+def play_key(game_id: str, play_id, prefix: str = "") -> str:
+    """Stored play id: nflverse play ids are only unique within a game. Sources with their
+    own numbering (live feeds) pass a prefix so their plays never share a key with nflverse's"""
+    return f"{prefix}{game_id}_{int(float(play_id))}"
+
 class HighlightService:
     def __init__(self, db: Session):
         self.db = db
     
-    def is_highlight_worthy(self, play_data: Dict) -> bool:
-        """Determine if a play is highlight-worthy based on fantasy relevance"""
-        event_type = play_data.get('play_type', '')
-        yards_gained = play_data.get('yards_gained', 0)
+    def is_highlight_worthy(self, play_data: Dict, highlight_rules: Dict = None) -> bool:
+        """Determine if a play (a row of play-by-play) is highlight-worthy under a league's rules"""
+        return bool(get_highlight_rule_engine().evaluate(pd.DataFrame([play_data]), highlight_rules)[0])
+    
+    def calculate_fantasy_points(self, play_data: Dict, scoring_settings: Dict = None,
+                                 player_ids: Optional[List[str]] = None) -> float:
+        """Calculate fantasy points for a play: those earned by player_ids in their roles on it,
+        or by everyone involved"""
+        play = pd.DataFrame([play_data])
+        if player_ids is None:
+            return float(get_scoring_engine().score(play, scoring_settings)[0])
+        role_points = get_scoring_engine().score_roles(play, [scoring_settings])[0, :, 0]
+        role_players = play.reindex(columns=ROLE_COLUMNS).iloc[0]
+        return float(sum(points for points, player_id in zip(role_points, role_players) if player_id in player_ids))
+    
+    def highlight_worthy_mask(self, plays: pd.DataFrame, highlight_rules: Dict = None) -> pd.Series:
+        """Vectorized is_highlight_worthy over a frame of plays"""
+        return pd.Series(get_highlight_rule_engine().evaluate(plays, highlight_rules), index=plays.index)
+    
+    def match_roster_plays(self, weekly_pbp: pd.DataFrame, player_ids: List[str],
+                           season: int, week: int, scoring_settings: Dict = None,
+                           highlight_rules: Dict = None) -> List[Dict]:
+        """Find highlight-worthy plays involving any of the given players"""
+        return self.match_rosters_plays(
+            weekly_pbp, {0: player_ids}, season, week, {0: scoring_settings}, {0: highlight_rules}
+        )[0]
+    
+    def match_rosters_plays(self, weekly_pbp: pd.DataFrame, rosters: Dict[int, List[str]],
+                            season: int, week: int,
+                            scoring_settings: Dict[int, Dict] = None,
+                            highlight_rules: Dict[int, Dict] = None) -> Dict[int, List[Dict]]:
+        """Find highlight-worthy plays for many rosters in a single pass over the week"""
+        grouped = {roster_id: [] for roster_id in rosters}
+        if weekly_pbp.empty:
+            return grouped
         
-        # Touchdowns are always highlight-worthy
-        if 'touchdown' in event_type.lower():
-            return True
+        # Inverted index: player_id -> roster ids that roster the player
+        rosters_by_player: Dict[str, List[int]] = {}
+        roster_order: Dict[int, Dict[str, int]] = {}
+        for roster_id, player_ids in rosters.items():
+            roster_order[roster_id] = {player_id: index for index, player_id in enumerate(player_ids)}
+            for player_id in roster_order[roster_id]:
+                rosters_by_player.setdefault(player_id, []).append(roster_id)
         
-        # Big plays (20+ yards)
-        if yards_gained and yards_gained >= 20:
-            return True
+        if not rosters_by_player:
+            return grouped
         
-        # Interceptions and fumbles
-        if event_type in ['pass_interception', 'fumble']:
-            return True
+        # Rows where any of the passer/rusher/receiver is on any roster
+        id_frame = weekly_pbp.reindex(columns=PLAYER_ID_COLUMNS)
+        involved_mask = id_frame.isin(set(rosters_by_player)).any(axis=1)
+        plays = weekly_pbp[involved_mask]
+        if plays.empty:
+            return grouped
         
-        # Sacks
-        if event_type == 'pass_sack':
-            return True
+        # Matching, scoring and highlight detection run as column operations;
+        # Python-level work is only done for the plays that are returned.
+        # Rules are evaluated once per distinct league rule set, all in one pass.
+        highlight_rules = highlight_rules or {}
+        rule_engine = get_highlight_rule_engine()
+        rule_sets_by_hash: Dict[str, int] = {}
+        rule_sets = []
+        roster_rule_sets: Dict[int, int] = {}
+        for roster_id in rosters:
+            try:
+                compiled = rule_engine.compile(highlight_rules.get(roster_id))
+            except ValueError as e:
+                # Saved overrides are validated, but the defaults they extend may have changed
+                print(f"Error compiling highlight rules for roster {roster_id}: {e}")
+                compiled = rule_engine.compile(None)
+            if compiled.rules_hash not in rule_sets_by_hash:
+                rule_sets_by_hash[compiled.rules_hash] = len(rule_sets)
+                rule_sets.append(compiled)
+            roster_rule_sets[roster_id] = rule_sets_by_hash[compiled.rules_hash]
+        worthy = rule_engine.evaluate_many(plays, rule_sets)
+        keep = worthy.any(axis=1)
+        plays, worthy = plays[keep], worthy[keep]
+        if plays.empty:
+            return grouped
         
-        # Field goals (40+ yards)
-        if event_type == 'field_goal' and yards_gained and yards_gained >= 40:
-            return True
+        # Score the plays once per distinct league scoring settings
+        scoring_settings = scoring_settings or {}
+        scoring_engine = get_scoring_engine()
+        settings_columns: Dict[str, int] = {}
+        settings_list = []
+        roster_columns: Dict[int, int] = {}
+        for roster_id in rosters:
+            settings = scoring_settings.get(roster_id)
+            key = scoring_engine.compile(settings).settings_hash
+            if key not in settings_columns:
+                settings_columns[key] = len(settings_list)
+                settings_list.append(settings)
+            roster_columns[roster_id] = settings_columns[key]
+        # League-neutral points for the play itself, kept on the shared plays row
+        standard_key = scoring_engine.compile(None).settings_hash
+        if standard_key not in settings_columns:
+            settings_columns[standard_key] = len(settings_list)
+            settings_list.append(None)
+        standard_column = settings_columns[standard_key]
+        # Each rostered player only earns the points of their own role on the play
+        role_points = scoring_engine.score_roles(plays, settings_list)
+        role_rows = plays.reindex(columns=ROLE_COLUMNS).itertuples(index=False)
         
-        return False
-    
-    def calculate_fantasy_points(self, play_data: Dict, scoring_settings: Dict = None) -> float:
-        """Calculate fantasy points for a play"""
-        if not scoring_settings:
-            # Default PPR scoring
-            scoring_settings = {
-                'pass_td': 4,
-                'rush_td': 6,
-                'rec_td': 6,
-                'pass_yd': 0.04,
-                'rush_yd': 0.1,
-                'rec_yd': 0.1,
-                'rec': 1,
-                'int': -2,
-                'fumble_lost': -2
-            }
+        records = plays.reindex(columns=[
+            'game_id', 'play_id', 'home_team', 'away_team', 'qtr', 'game_seconds_remaining',
+            'posteam', 'play_type', 'yards_gained', 'desc'
+        ]).to_dict('records')
         
-        points = 0.0
-        event_type = play_data.get('play_type', '')
-        yards_gained = play_data.get('yards_gained', 0)
-        
-        # Touchdown points
-        if 'pass_touchdown' in event_type:
-            points += scoring_settings.get('pass_td', 4)
-        elif 'rush_touchdown' in event_type:
-            points += scoring_settings.get('rush_td', 6)
-        elif 'receiving_touchdown' in event_type:
-            points += scoring_settings.get('rec_td', 6)
-        
-        # Yardage points
-        if 'pass' in event_type and yards_gained:
-            points += yards_gained * scoring_settings.get('pass_yd', 0.04)
-        elif 'rush' in event_type and yards_gained:
-            points += yards_gained * scoring_settings.get('rush_yd', 0.1)
-        elif 'receiving' in event_type and yards_gained:
-            points += yards_gained * scoring_settings.get('rec_yd', 0.1)
-        
-        # Reception points (PPR)
-        if 'reception' in event_type:
-            points += scoring_settings.get('rec', 1)
-        
-        # Negative points
-        if 'interception' in event_type:
-            points += scoring_settings.get('int', -2)
-        elif 'fumble' in event_type:
-            points += scoring_settings.get('fumble_lost', -2)
-        
-        return points
+        for record, row, role_row, points, worthy_for in zip(records, id_frame.loc[plays.index].itertuples(index=False),
+                                                             role_rows, role_points, worthy):
+            away_team, home_team = record['away_team'], record['home_team']
+            if not isinstance(home_team, str) or not isinstance(away_team, str):
+                # Older partitions without team columns
+                away_team, home_team = parse_game_id(record['game_id'])
+            
+            # Involved players per roster, in roster order
+            involved: Dict[int, set] = {}
+            for player_id in row:
+                for roster_id in rosters_by_player.get(player_id, ()):
+                    # Only rosters whose league counts this play as a highlight
+                    if worthy_for[roster_rule_sets[roster_id]]:
+                        involved.setdefault(roster_id, set()).add(player_id)
+            
+            for roster_id, players in involved.items():
+                column = roster_columns[roster_id]
+                fantasy_points = sum(
+                    points[role, column] for role, player_id in enumerate(role_row) if player_id in players
+                )
+                grouped[roster_id].append({
+                    'game_id': record['game_id'],
+                    'play_id': record['play_id'],
+                    'week': week,
+                    'season': str(season),
+                    'quarter': record['qtr'],
+                    'game_clock': record['game_seconds_remaining'],
+                    'team': record['posteam'],
+                    'home_team': home_team,
+                    'away_team': away_team,
+                    'player_ids': sorted(players, key=roster_order[roster_id].get),
+                    'play_type': record['play_type'],
+                    'yards_gained': record['yards_gained'],
+                    'description': record['desc'],
+                    'fantasy_points': float(fantasy_points),
+                    'standard_points': float(points[:, standard_column].sum()),
+                    'is_highlight_worthy': True
+                })
+        
+        return grouped
     
     async def fetch_weekly_plays(self, season: int, week: int) -> pd.DataFrame:
-        """Fetch play-by-play data for a specific week"""
+        """Fetch play-by-play data for a specific week from the shared play store"""
         try:
-            # Fetch play-by-play data
-            pbp = nfl.import_pbp_data([season], downcast=True, cache=True, alt_path=None)
-            
-            # Filter for the specific week
-            weekly_pbp = pbp[pbp['week'] == week].copy()
-            
-            return weekly_pbp
+            play_store = get_play_store()
+            # Reading (or first-time ingesting) a partition is blocking I/O.
+            # The frame is shared between requests, so it must not be modified.
+            return await asyncio.to_thread(play_store.get_week, season, week)
         except Exception as e:
             print(f"Error fetching weekly plays: {e}")
             return pd.DataFrame()
     
     async def process_roster_highlights(self, roster: Roster, season: int, week: int) -> List[Dict]:
         """Process highlights for a specific roster"""
+        highlights_by_roster = await self.process_batch_highlights([roster], season, week)
+        return highlights_by_roster.get(roster.id, [])
+    
+    async def process_batch_highlights(self, rosters: List[Roster], season: int, week: int,
+                                       weekly_pbp: Optional[pd.DataFrame] = None) -> Dict[int, List[Dict]]:
+        """Process highlights for many rosters with one scan of the week's plays
+        (weekly_pbp, if the caller already loaded them)"""
         try:
-            # Fetch weekly plays
-            weekly_pbp = await self.fetch_weekly_plays(season, week)
-            
-            if weekly_pbp.empty:
-                return []
-            
-            highlights = []
-            player_ids = roster.player_ids or []
-            
-            # Filter plays for roster players
-            for _, play in weekly_pbp.iterrows():
-                # Check if any roster player is involved
-                involved_players = []
-                for player_id in player_ids:
-                    if (play.get('passer_player_id') == player_id or 
-                        play.get('rusher_player_id') == player_id or
-                        play.get('receiver_player_id') == player_id):
-                        involved_players.append(player_id)
-                
-                if involved_players:
-                    play_data = {
-                        'game_id': play.get('game_id'),
-                        'play_id': play.get('play_id'),
-                        'week': week,
-                        'season': str(season),
-                        'quarter': play.get('qtr'),
-                        'game_clock': play.get('game_seconds_remaining'),
-                        'team': play.get('posteam'),
-                        'player_ids': involved_players,
-                        'play_type': play.get('play_type'),
-                        'yards_gained': play.get('yards_gained', 0),
-                        'description': play.get('desc', ''),
-                        'fantasy_points': self.calculate_fantasy_points(play.to_dict())
-                    }
-                    
-                    if self.is_highlight_worthy(play_data):
-                        play_data['is_highlight_worthy'] = True
-                        highlights.append(play_data)
-            
-            return highlights
+            if weekly_pbp is None:
+                weekly_pbp = await self.fetch_weekly_plays(season, week)
+            return self.route_plays(weekly_pbp, rosters, season, week)
             
         except Exception as e:
-            print(f"Error processing roster highlights: {e}")
+            print(f"Error processing batch highlights: {e}")
+            return {roster.id: [] for roster in rosters}
+    
+    def route_plays(self, plays: pd.DataFrame, rosters: List[Roster], season: int, week: int,
+                    key_prefix: str = "") -> Dict[int, List[Dict]]:
+        """Highlights in a frame of plays (a whole week or just new plays) for each roster"""
+        # Rosters hold Sleeper ids but play-by-play uses GSIS ids, so each
+        # roster is translated once before the scan
+        player_crosswalk = get_player_crosswalk()
+        gsis_rosters = {roster.id: player_crosswalk.to_gsis(roster.player_ids or []) for roster in rosters}
+        
+        highlights_by_roster = self.match_rosters_plays(
+            plays,
+            {roster_id: list(gsis_ids) for roster_id, gsis_ids in gsis_rosters.items()},
+            season,
+            week,
+            {roster.id: roster.league.scoring_settings if roster.league else None for roster in rosters},
+            {roster.id: roster.league.highlight_rules if roster.league else None for roster in rosters}
+        )
+        
+        # Report involved players by their Sleeper ids, and plays by their stored id
+        for roster_id, highlights in highlights_by_roster.items():
+            gsis_ids = gsis_rosters[roster_id]
+            for highlight in highlights:
+                highlight['player_ids'] = [gsis_ids[gsis_id] for gsis_id in highlight['player_ids']]
+                highlight['play_id'] = play_key(highlight['game_id'], highlight['play_id'], key_prefix)
+        
+        return highlights_by_roster
+    
+    async def save_highlights_to_db(self, highlights_by_roster: Dict[int, List[Dict]],
+                                    replace: bool = False) -> List[Play]:
+        """Save each roster's highlights, returning every saved play (new or existing).
+        Plays shared by several rosters are written once; each roster keeps its own
+        players and its league's points in roster_highlights. With replace, these are
+        the rosters' complete results and their other saved highlights are dropped."""
+        rows_by_key: Dict[str, Dict] = {}
+        players_by_key: Dict[str, List[str]] = {}
+        for highlights in highlights_by_roster.values():
+            for highlight in highlights:
+                key = highlight['play_id']
+                players_by_key.setdefault(key, [])
+                players_by_key[key] += [
+                    player_id for player_id in highlight['player_ids'] if player_id not in players_by_key[key]
+                ]
+                rows_by_key.setdefault(key, {
+                    'game_id': highlight['game_id'],
+                    'play_id': key,
+                    'week': highlight['week'],
+                    'season': highlight['season'],
+                    'quarter': highlight['quarter'],
+                    'game_clock': str(highlight['game_clock']),
+                    'team': highlight['team'],
+                    'home_team': highlight.get('home_team'),
+                    'away_team': highlight.get('away_team'),
+                    'event_type': highlight['play_type'],
+                    'yards_gained': highlight['yards_gained'],
+                    'fantasy_points': highlight.get('standard_points'),
+                    'is_highlight_worthy': highlight.get('is_highlight_worthy', False)
+                })
+        if not rows_by_key:
+            if replace:
+                self._drop_other_highlights(highlights_by_roster, {})
+                self.db.commit()
             return []
+        for key, row in rows_by_key.items():
+            row['player_ids'] = players_by_key[key]
+        
+        ids_by_key: Dict[str, int] = {}
+        rows = list(rows_by_key.values())
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            ids_by_key.update(self._upsert_plays(rows[start:start + UPSERT_BATCH_SIZE]))
+        
+        # Existing plays keep the players other rosters saved for them
+        plays_by_id = {
+            play.id: play
+            for play in self.db.query(Play).populate_existing().filter(Play.id.in_(list(ids_by_key.values())))
+        }
+        association_rows = []
+        for key, play_id in ids_by_key.items():
+            play = plays_by_id[play_id]
+            player_ids = list(play.player_ids or [])
+            player_ids += [player_id for player_id in players_by_key[key] if player_id not in player_ids]
+            if player_ids != play.player_ids:
+                play.player_ids = player_ids
+            association_rows += [
+                {'play_id': play_id, 'player_id': player_id, 'season': play.season, 'week': play.week}
+                for player_id in players_by_key[key]
+            ]
+        self._insert_play_players(association_rows)
+        self._upsert_roster_highlights([
+            {
+                'roster_id': roster_id,
+                'play_id': ids_by_key[highlight['play_id']],
+                'player_ids': highlight['player_ids'],
+                'fantasy_points': highlight['fantasy_points']
+            }
+            for roster_id, highlights in highlights_by_roster.items()
+            for highlight in highlights
+        ])
+        if replace:
+            self._drop_other_highlights(highlights_by_roster, ids_by_key)
+        
+        self.db.commit()
+        return [plays_by_id[ids_by_key[key]] for key in rows_by_key]
     
-    async def save_highlights_to_db(self, highlights: List[Dict]) -> List[Play]:
-        """Save highlights to database"""
-        saved_plays = []
-        
-        for highlight in highlights:
-            # Check if play already exists
-            existing_play = self.db.query(Play).filter(
-                Play.play_id == highlight['play_id']
-            ).first()
-            
-            if not existing_play:
-                play = Play(
-                    game_id=highlight['game_id'],
-                    play_id=highlight['play_id'],
-                    week=highlight['week'],
-                    season=highlight['season'],
-                    quarter=highlight['quarter'],
-                    game_clock=str(highlight['game_clock']),
-                    team=highlight['team'],
-                    player_ids=highlight['player_ids'],
-                    event_type=highlight['play_type'],
-                    yards_gained=highlight['yards_gained'],
-                    fantasy_points=highlight['fantasy_points'],
-                    is_highlight_worthy=highlight.get('is_highlight_worthy', False)
+    def _upsert_plays(self, rows: List[Dict]) -> Dict[str, int]:
+        """Insert or update plays in one statement, returning play_id -> row id for all of them"""
+        dialect = self.db.get_bind().dialect.name
+        if dialect not in ('sqlite', 'postgresql'):
+            return self._upsert_plays_portable(rows)
+        
+        insert = sqlite_insert if dialect == 'sqlite' else postgresql_insert
+        statement = insert(Play).values(rows)
+        # DO UPDATE (rather than DO NOTHING) so RETURNING includes rows that already existed
+        statement = statement.on_conflict_do_update(
+            index_elements=[Play.play_id],
+            set_={
+                'home_team': statement.excluded.home_team,
+                'away_team': statement.excluded.away_team,
+                'fantasy_points': statement.excluded.fantasy_points,
+                'is_highlight_worthy': statement.excluded.is_highlight_worthy
+            }
+        ).returning(Play.id, Play.play_id)
+        return {play_id: id for id, play_id in self.db.execute(statement)}
+    
+    def _upsert_plays_portable(self, rows: List[Dict]) -> Dict[str, int]:
+        """Select-then-insert fallback for dialects without ON CONFLICT"""
+        ids_by_key = dict(
+            self.db.query(Play.play_id, Play.id).filter(Play.play_id.in_([row['play_id'] for row in rows]))
+        )
+        new_plays = [Play(**row) for row in rows if row['play_id'] not in ids_by_key]
+        self.db.add_all(new_plays)
+        self.db.flush()
+        ids_by_key.update({play.play_id: play.id for play in new_plays})
+        return ids_by_key
+    
+    def _insert_play_players(self, rows: List[Dict]) -> None:
+        if not rows:
+            return
+        dialect = self.db.get_bind().dialect.name
+        if dialect not in ('sqlite', 'postgresql'):
+            existing = set(self.db.query(PlayPlayer.play_id, PlayPlayer.player_id).filter(
+                PlayPlayer.play_id.in_({row['play_id'] for row in rows})
+            ))
+            rows = [row for row in rows if (row['play_id'], row['player_id']) not in existing]
+            if rows:
+                self.db.execute(sa_insert(PlayPlayer), rows)
+            return
+        
+        insert = sqlite_insert if dialect == 'sqlite' else postgresql_insert
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            self.db.execute(
+                insert(PlayPlayer).values(rows[start:start + UPSERT_BATCH_SIZE]).on_conflict_do_nothing(
+                    index_elements=[PlayPlayer.play_id, PlayPlayer.player_id]
                 )
-                
-                self.db.add(play)
-                saved_plays.append(play)
+            )
+    
+    def _drop_other_highlights(self, highlights_by_roster: Dict[int, List[Dict]], ids_by_key: Dict[str, int]) -> None:
+        """Remove roster highlights that are no longer in the rosters' results (e.g. under tightened rules)"""
+        for roster_id, highlights in highlights_by_roster.items():
+            self.db.query(RosterHighlight).filter(
+                RosterHighlight.roster_id == roster_id,
+                RosterHighlight.play_id.notin_([ids_by_key[highlight['play_id']] for highlight in highlights])
+            ).delete(synchronize_session=False)
+    
+    def _upsert_roster_highlights(self, rows: List[Dict]) -> None:
+        """Insert each roster's highlights, or refresh their players and points (the league's
+        scoring or the roster may have changed since)"""
+        if not rows:
+            return
+        dialect = self.db.get_bind().dialect.name
+        if dialect not in ('sqlite', 'postgresql'):
+            existing = {
+                (highlight.roster_id, highlight.play_id): highlight
+                for highlight in self.db.query(RosterHighlight).filter(
+                    RosterHighlight.roster_id.in_({row['roster_id'] for row in rows}),
+                    RosterHighlight.play_id.in_({row['play_id'] for row in rows})
+                )
+            }
+            for row in rows:
+                highlight = existing.get((row['roster_id'], row['play_id']))
+                if highlight is None:
+                    self.db.add(RosterHighlight(**row))
+                else:
+                    highlight.player_ids = row['player_ids']
+                    highlight.fantasy_points = row['fantasy_points']
+            self.db.flush()
+            return
         
-        self.db.commit()
-        return saved_plays
+        insert = sqlite_insert if dialect == 'sqlite' else postgresql_insert
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            statement = insert(RosterHighlight).values(rows[start:start + UPSERT_BATCH_SIZE])
+            self.db.execute(statement.on_conflict_do_update(
+                index_elements=[RosterHighlight.roster_id, RosterHighlight.play_id],
+                set_={
+                    'player_ids': statement.excluded.player_ids,
+                    'fantasy_points': statement.excluded.fantasy_points
+                }
+            ))
@@ -0,0 +1,57 @@
+import json
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy.orm import Session
+from models import Clip, HighlightJob, HighlightJobEvent, Play
+from services.highlight_feed import CLIP_FEED_COLUMNS, PLAY_FEED_COLUMNS
+
+TERMINAL_EVENTS = ('completed', 'failed')
+
+def progress_payload(job: HighlightJob) -> Dict:
+    return {
+        'status': job.status,
+        'stage': job.stage,
+        'plays_scanned': job.plays_scanned or 0,
+        'highlights_found': job.highlights_found or 0,
+        'clips_resolved': job.clips_resolved or 0,
+        'error': job.error
+    }
+
+def highlight_payload(play: Play, clips: Iterable[Clip], roster_highlight: Optional[Dict] = None) -> Dict:
+    """A play and its clips, shaped like an item of the highlight feed; roster_highlight
+    supplies the roster's own players and its league's points"""
+    payload = {column.key: getattr(play, column.key) for column in PLAY_FEED_COLUMNS}
+    if roster_highlight is not None:
+        payload['player_ids'] = roster_highlight['player_ids']
+        payload['fantasy_points'] = roster_highlight['fantasy_points']
+    payload['clips'] = [
+        {column.key: getattr(clip, column.key) for column in CLIP_FEED_COLUMNS if column.key != 'play_id'}
+        for clip in clips
+    ]
+    return payload
+
+def add_job_event(db: Session, job_id: int, event_type: str, payload: Dict) -> None:
+    """Record an event; it becomes visible to streams when the caller commits"""
+    db.add(HighlightJobEvent(job_id=job_id, event_type=event_type, payload=payload))
+
+def add_progress_events(db: Session, jobs: Iterable[HighlightJob]) -> None:
+    for job in jobs:
+        add_job_event(db, job.id, 'progress', progress_payload(job))
+
+def read_job_events(db: Session, job_id: int, after_id: int = 0, limit: int = 200) -> List[HighlightJobEvent]:
+    return db.query(HighlightJobEvent).filter(
+        HighlightJobEvent.job_id == job_id,
+        HighlightJobEvent.id > after_id
+    ).order_by(HighlightJobEvent.id).limit(limit).all()
+
+def clear_job_events(db: Session, job_id: int) -> None:
+    """Forget a previous run's events before the job is run again"""
+    db.query(HighlightJobEvent).filter(HighlightJobEvent.job_id == job_id).delete(synchronize_session=False)
+
+def format_sse(event_type: str, payload: Dict, event_id: Optional[int] = None) -> str:
+    """One Server-Sent Events message"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(payload, default=str)}")
+    return "\n".join(lines) + "\n\n"
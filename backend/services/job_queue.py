@@ -0,0 +1,231 @@
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+from models import HighlightJob
+from services.feed_cache import bump_feed_versions, get_feed_cache
+from services.job_events import add_job_event, add_progress_events, clear_job_events, progress_payload
+
+load_dotenv()
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+def make_job_key(league_id: int, season: int, week: int) -> str:
+    """Idempotency key: one job per league, season and week"""
+    return f"{league_id}:{season}:{week}"
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+class SQLJobQueue:
+    """Highlight job queue backed by the highlight_jobs table (the default backend)"""
+
+    def __init__(self, job_timeout_seconds: Optional[int] = None, max_attempts: Optional[int] = None,
+                 poll_seconds: Optional[float] = None):
+        # Running jobs that reported no progress for this long are assumed to belong to a dead worker
+        self.job_timeout_seconds = job_timeout_seconds or int(os.getenv("JOB_TIMEOUT_SECONDS", "1800"))
+        self.max_attempts = max_attempts or int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+        self.poll_seconds = poll_seconds or float(os.getenv("JOB_POLL_SECONDS", "2"))
+
+    def enqueue(self, db: Session, league_id: int, week: int, season: int) -> HighlightJob:
+        """Queue a job, or return the one already queued or running for the same key"""
+        key = make_job_key(league_id, season, week)
+        job = db.query(HighlightJob).filter(HighlightJob.job_key == key).first()
+
+        if job and job.status in ACTIVE_STATUSES:
+            return job
+
+        if job is None:
+            job = HighlightJob(job_key=key, league_id=league_id, week=week, season=season, status="queued")
+            db.add(job)
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another request queued the same key first
+                db.rollback()
+                return db.query(HighlightJob).filter(HighlightJob.job_key == key).first()
+        else:
+            # Finished jobs are re-run from scratch
+            job.status = "queued"
+            job.stage = None
+            job.attempts = 0
+            job.worker_id = None
+            job.plays_scanned = 0
+            job.highlights_found = 0
+            job.clips_resolved = 0
+            job.error = None
+            job.started_at = None
+            job.heartbeat_at = None
+            job.finished_at = None
+            clear_job_events(db, job.id)
+            db.commit()
+
+        db.refresh(job)
+        self._notify([job.id])
+        return job
+
+    def _notify(self, job_ids: List[int]) -> None:
+        """Hook for backends that push queued job ids to workers"""
+        pass
+
+    def requeue_stale(self, db: Session) -> None:
+        """Put running jobs whose worker stopped reporting back on the queue"""
+        cutoff = _utcnow() - timedelta(seconds=self.job_timeout_seconds)
+        stale = db.query(HighlightJob).filter(
+            HighlightJob.status == "running",
+            func.coalesce(HighlightJob.heartbeat_at, HighlightJob.started_at) < cutoff
+        ).all()
+        if not stale:
+            return
+
+        for job in stale:
+            if job.attempts >= self.max_attempts:
+                job.status = "failed"
+                job.error = "Worker timed out"
+                job.finished_at = _utcnow()
+                add_job_event(db, job.id, "failed", progress_payload(job))
+            else:
+                job.status = "queued"
+        db.commit()
+        self._notify([job.id for job in stale if job.status == "queued"])
+
+    def claim_week(self, db: Session, season: int, week: int, worker_id: str) -> List[HighlightJob]:
+        """Claim every queued job for a season and week so one scan serves them all"""
+        # A single conditional UPDATE, so two workers can never claim the same job;
+        # RETURNING names exactly the rows this call claimed
+        claimed_ids = [job_id for (job_id,) in db.execute(
+            update(HighlightJob).where(
+                HighlightJob.status == "queued",
+                HighlightJob.season == season,
+                HighlightJob.week == week
+            ).values(
+                status="running",
+                worker_id=worker_id,
+                started_at=_utcnow(),
+                heartbeat_at=_utcnow(),
+                attempts=HighlightJob.attempts + 1
+            ).returning(HighlightJob.id).execution_options(synchronize_session=False)
+        )]
+        db.commit()
+        if not claimed_ids:
+            return []
+
+        return db.query(HighlightJob).filter(
+            HighlightJob.id.in_(claimed_ids)
+        ).order_by(HighlightJob.id).all()
+
+    def claim_batch(self, db: Session, worker_id: str) -> List[HighlightJob]:
+        """Claim the oldest queued job together with every other job for its week"""
+        self.requeue_stale(db)
+        job = db.query(HighlightJob).filter(
+            HighlightJob.status == "queued"
+        ).order_by(HighlightJob.id).first()
+        if job is None:
+            return []
+        return self.claim_week(db, job.season, job.week, worker_id)
+
+    def wait(self) -> None:
+        """Block until more work may be available"""
+        time.sleep(self.poll_seconds)
+
+    def heartbeat(self, jobs: List[HighlightJob]) -> None:
+        """Record that the jobs' worker is still making progress; the caller commits"""
+        for job in jobs:
+            job.heartbeat_at = _utcnow()
+
+    def _still_owned(self, db: Session, jobs: List[HighlightJob], worker_id: str) -> List[HighlightJob]:
+        """The jobs this worker still holds; others were requeued as stale (and maybe claimed again).
+        The conditional UPDATE also locks the rows, so requeue_stale can't take them until commit."""
+        owned_ids = {job_id for (job_id,) in db.execute(
+            update(HighlightJob).where(
+                HighlightJob.id.in_([job.id for job in jobs]),
+                HighlightJob.status == "running",
+                HighlightJob.worker_id == worker_id
+            ).values(heartbeat_at=_utcnow()).returning(HighlightJob.id).execution_options(synchronize_session=False)
+        )}
+        for job in jobs:
+            if job.id not in owned_ids:
+                print(f"Job {job.id} was taken from worker {worker_id}; leaving its status alone")
+        return [job for job in jobs if job.id in owned_ids]
+
+    def complete(self, db: Session, jobs: List[HighlightJob], worker_id: str) -> None:
+        for job in self._still_owned(db, jobs, worker_id):
+            job.status = "completed"
+            job.stage = None
+            job.finished_at = _utcnow()
+            add_job_event(db, job.id, "completed", progress_payload(job))
+        # Cached feeds for these leagues and weeks are now stale (their highlights were saved either way)
+        feeds = [(job.league_id, job.week) for job in jobs]
+        bump_feed_versions(db, feeds)
+        db.commit()
+        get_feed_cache().invalidate(feeds)
+
+    def fail(self, db: Session, jobs: List[HighlightJob], worker_id: str, error: str) -> None:
+        """Retry failed jobs until they run out of attempts"""
+        jobs = self._still_owned(db, jobs, worker_id)
+        for job in jobs:
+            job.error = error
+            if job.attempts >= self.max_attempts:
+                job.status = "failed"
+                job.finished_at = _utcnow()
+                add_job_event(db, job.id, "failed", progress_payload(job))
+            else:
+                job.status = "queued"
+        add_progress_events(db, [job for job in jobs if job.status == "queued"])
+        db.commit()
+        self._notify([job.id for job in jobs if job.status == "queued"])
+
+class RedisJobQueue(SQLJobQueue):
+    """SQL job records with a Redis list to wake workers instead of polling"""
+
+    def __init__(self, redis_url: Optional[str] = None, **kwargs):
+        super().__init__(**kwargs)
+        import redis
+
+        self.redis = redis.Redis.from_url(redis_url or os.getenv("REDIS_URL", "redis://localhost:6379"))
+        self.list_key = os.getenv("JOB_QUEUE_REDIS_KEY", "fantasy_clips:highlight_jobs")
+
+    def _notify(self, job_ids: List[int]) -> None:
+        if not job_ids:
+            return
+        try:
+            self.redis.lpush(self.list_key, *job_ids)
+        except Exception as e:
+            # The job is persisted; workers still find it through the SQL fallback
+            print(f"Error pushing jobs to Redis: {e}")
+
+    def claim_batch(self, db: Session, worker_id: str) -> List[HighlightJob]:
+        self.requeue_stale(db)
+        item = self.redis.brpop(self.list_key, timeout=max(1, int(self.poll_seconds)))
+        if item is None:
+            # Nothing pushed; also pick up jobs queued while Redis was unavailable
+            return super().claim_batch(db, worker_id)
+
+        job = db.get(HighlightJob, int(item[1]))
+        if job is None or job.status != "queued":
+            # Already claimed along with another job for the same week
+            return []
+        return self.claim_week(db, job.season, job.week, worker_id)
+
+    def wait(self) -> None:
+        # claim_batch already blocks on Redis
+        pass
+
+_job_queue: Optional[SQLJobQueue] = None
+
+def get_job_queue() -> SQLJobQueue:
+    """Get the configured job queue backend (JOB_QUEUE_BACKEND=sql|redis)"""
+    global _job_queue
+    if _job_queue is None:
+        backend = os.getenv("JOB_QUEUE_BACKEND", "sql").lower()
+        if backend == "redis":
+            _job_queue = RedisJobQueue()
+        elif backend == "sql":
+            _job_queue = SQLJobQueue()
+        else:
+            raise ValueError(f"Unknown JOB_QUEUE_BACKEND: {backend}")
+    return _job_queue
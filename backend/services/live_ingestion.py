@@ -0,0 +1,399 @@
+import asyncio
+import httpx
+import importlib
+import os
+import re
+import time
+import numpy as np
+import pandas as pd
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session, selectinload
+from dotenv import load_dotenv
+from models import Clip, League, LivePlayCursor, Roster
+from services.clip_resolver import ClipResolver
+from services.feed_cache import bump_feed_versions, get_feed_cache
+from services.highlight_service import HighlightService
+from services.play_store import PBP_COLUMNS
+from services.player_crosswalk import get_player_crosswalk
+from services.player_directory import get_player_directory
+from services.sleeper_service import get_sleeper_service
+
+load_dotenv()
+
+class PlaySource(ABC):
+    """Where live play-by-play comes from; subclasses return only plays past the cursors"""
+
+    # Prepended to stored play ids when the source numbers plays differently from nflverse
+    key_prefix = ""
+
+    @abstractmethod
+    def fetch_new_plays(self, season: int, week: int, cursors: Dict[str, int]) -> pd.DataFrame:
+        """Plays with play_id above their game's cursor (every play for games without one)"""
+
+class FileReplaySource(PlaySource):
+    """Replays a saved play-by-play file (Parquet or CSV) a few plays per game at a time"""
+
+    def __init__(self, path: Optional[str] = None, plays_per_tick: Optional[int] = None):
+        self.path = path or os.getenv("LIVE_REPLAY_PATH")
+        if not self.path:
+            raise ValueError("FileReplaySource needs a path (LIVE_REPLAY_PATH)")
+        # Plays each game "advances" per poll; 0 releases the whole file at once
+        self.plays_per_tick = plays_per_tick if plays_per_tick is not None else int(
+            os.getenv("LIVE_REPLAY_PLAYS_PER_TICK", "10")
+        )
+        plays = pd.read_parquet(self.path) if self.path.endswith(".parquet") else pd.read_csv(self.path)
+        plays = plays.reindex(columns=PBP_COLUMNS).dropna(subset=['game_id', 'play_id'])
+        plays = plays.sort_values(['game_id', 'play_id'], kind="stable")
+
+        # Per (week, game): its plays in order and their ids for binary search
+        self._games: Dict[Tuple[int, str], Tuple[pd.DataFrame, np.ndarray]] = {}
+        for (week, game_id), game_plays in plays.groupby(['week', 'game_id'], sort=False):
+            game_plays = game_plays.reset_index(drop=True)
+            self._games[(int(week), game_id)] = (game_plays, game_plays['play_id'].to_numpy(dtype=float))
+        self._released: Dict[str, int] = {}
+
+    def fetch_new_plays(self, season: int, week: int, cursors: Dict[str, int]) -> pd.DataFrame:
+        frames = []
+        for (game_week, game_id), (game_plays, play_ids) in self._games.items():
+            if game_week != week:
+                continue
+            if self.plays_per_tick:
+                released = min(len(play_ids), self._released.get(game_id, 0) + self.plays_per_tick)
+            else:
+                released = len(play_ids)
+            self._released[game_id] = released
+
+            start = 0
+            if game_id in cursors:
+                start = int(np.searchsorted(play_ids, cursors[game_id], side="right"))
+            if start < released:
+                frames.append(game_plays.iloc[start:released])
+
+        if not frames:
+            return pd.DataFrame(columns=PBP_COLUMNS)
+        return pd.concat(frames, ignore_index=True)
+
+# ESPN abbreviations that differ from nflverse's
+ESPN_TEAMS = {'WSH': 'WAS', 'LAR': 'LA'}
+
+# ESPN play type -> (nflverse play_type, flags for the stat columns)
+ESPN_PLAY_TYPES = {
+    'Pass Reception': ('pass', {'pass_attempt', 'complete_pass'}),
+    'Passing Touchdown': ('pass', {'pass_attempt', 'complete_pass', 'pass_touchdown', 'touchdown'}),
+    'Pass Incompletion': ('pass', {'pass_attempt', 'incomplete_pass'}),
+    'Pass Interception Return': ('pass', {'pass_attempt', 'interception'}),
+    'Interception Return Touchdown': ('pass', {'pass_attempt', 'interception', 'touchdown'}),
+    'Sack': ('pass', {'sack'}),
+    'Rush': ('run', {'rush_attempt'}),
+    'Rushing Touchdown': ('run', {'rush_attempt', 'rush_touchdown', 'touchdown'}),
+    'Fumble Recovery (Own)': ('run', {'fumble'}),
+    'Fumble Recovery (Opponent)': ('run', {'fumble', 'fumble_lost'}),
+    'Fumble Return Touchdown': ('run', {'fumble', 'fumble_lost', 'touchdown'}),
+    'Field Goal Good': ('field_goal', set()),
+    'Field Goal Missed': ('field_goal', set()),
+    'Blocked Field Goal': ('field_goal', set()),
+    'Punt': ('punt', set()),
+    'Kickoff': ('kickoff', set()),
+}
+
+# ESPN participant type -> play-by-play player column
+ESPN_PARTICIPANTS = {
+    'passer': 'passer_player_id',
+    'rusher': 'rusher_player_id',
+    'receiver': 'receiver_player_id',
+    'fumbler': 'fumbled_1_player_id',
+    'kicker': 'kicker_player_id',
+}
+
+def _ref_id(ref: Optional[Dict]) -> Optional[str]:
+    """Trailing id of an ESPN $ref link (.../athletes/3139477?lang=en -> 3139477)"""
+    match = re.search(r"/(\d+)(?:\?|$)", (ref or {}).get('$ref', ''))
+    return match.group(1) if match else None
+
+class ESPNLiveSource(PlaySource):
+    """Polls ESPN's public NFL scoreboard and play-by-play feeds for games in progress.
+    Play ids are ESPN sequence numbers, stored under their own keys until the week's
+    nflverse job merges them into its plays."""
+
+    key_prefix = "espn_"
+
+    def __init__(self, site_url: Optional[str] = None, core_url: Optional[str] = None,
+                 transport: Optional[httpx.BaseTransport] = None):
+        self.site_url = site_url or os.getenv(
+            "ESPN_SITE_API_URL", "https://site.api.espn.com/apis/site/v2/sports/football/nfl"
+        )
+        self.core_url = core_url or os.getenv(
+            "ESPN_CORE_API_URL", "https://sports.core.api.espn.com/v2/sports/football/leagues/nfl"
+        )
+        self.client = httpx.Client(
+            transport=transport,
+            timeout=httpx.Timeout(float(os.getenv("ESPN_TIMEOUT_SECONDS", "10")))
+        )
+        # Games already read to the end after going final
+        self._finished: set = set()
+        # event id -> (last page read, highest sequence number on the pages before it)
+        self._pages: Dict[str, Tuple[int, int]] = {}
+        self._espn_to_gsis: Optional[Dict[str, str]] = None
+
+    def _get_json(self, url: str, params: Optional[Dict] = None) -> Any:
+        response = self.client.get(url, params=params)
+        response.raise_for_status()
+        return response.json()
+
+    def espn_to_gsis(self) -> Dict[str, str]:
+        """ESPN athlete id -> GSIS id from the nflverse IDs table, loaded once"""
+        if self._espn_to_gsis is None:
+            import nfl_data_py as nfl
+
+            try:
+                ids = nfl.import_ids(columns=['espn_id', 'gsis_id']).dropna(subset=['espn_id', 'gsis_id'])
+            except Exception as e:
+                print(f"Error fetching nflverse ids: {e}")
+                return {}
+            # espn_id comes back as a float column
+            espn_ids = pd.to_numeric(ids['espn_id'], errors='coerce')
+            valid = espn_ids.notna()
+            self._espn_to_gsis = dict(zip(
+                espn_ids[valid].astype('int64').astype(str),
+                ids.loc[valid, 'gsis_id'].astype(str)
+            ))
+        return self._espn_to_gsis
+
+    def _games(self, season: int, week: int) -> List[Dict]:
+        """The week's games that are in progress, or final but not yet read to the end"""
+        scoreboard = self._get_json(f"{self.site_url}/scoreboard", {
+            'dates': season, 'seasontype': 2, 'week': week
+        })
+        games = []
+        for event in scoreboard.get('events', []):
+            state = event.get('status', {}).get('type', {}).get('state')
+            if state == 'pre' or event['id'] in self._finished:
+                continue
+            teams = {}
+            for competitor in event['competitions'][0]['competitors']:
+                abbreviation = competitor['team']['abbreviation']
+                teams[competitor['homeAway']] = (competitor['team']['id'], ESPN_TEAMS.get(abbreviation, abbreviation))
+            games.append({
+                'event_id': event['id'],
+                'game_id': f"{season}_{week:02d}_{teams['away'][1]}_{teams['home'][1]}",
+                'game_date': event.get('date', '')[:10],
+                'home_team': teams['home'][1],
+                'away_team': teams['away'][1],
+                'teams': dict(teams.values()),
+                'final': state == 'post'
+            })
+        return games
+
+    def _plays(self, event_id: str, cursor: int) -> List[Dict]:
+        """The game's plays from the last page read onward (that page may have grown)"""
+        url = f"{self.core_url}/events/{event_id}/competitions/{event_id}/plays"
+        page, before = self._pages.get(event_id, (1, -1))
+        if cursor < before:
+            # A failed tick left plays on earlier pages unsaved; read them again
+            page, before = 1, -1
+        plays = []
+        while True:
+            data = self._get_json(url, {'limit': 1000, 'page': page})
+            items = data.get('items', [])
+            plays.extend(items)
+            if page >= data.get('pageCount', 1):
+                self._pages[event_id] = (page, before)
+                return plays
+            before = max([before] + [int(play['sequenceNumber']) for play in items])
+            page += 1
+
+    def _to_row(self, game: Dict, week: int, play: Dict, espn_to_gsis: Dict[str, str]) -> Optional[Dict]:
+        type_text = play.get('type', {}).get('text')
+        if type_text not in ESPN_PLAY_TYPES:
+            # Timeouts, penalties, end of quarter and the like
+            return None
+        play_type, flags = ESPN_PLAY_TYPES[type_text]
+        quarter = play.get('period', {}).get('number')
+        clock = play.get('clock', {}).get('value') or 0
+        yards = play.get('statYardage') or 0
+        text = play.get('text', '')
+
+        row = {column: None for column in PBP_COLUMNS}
+        row.update({
+            'game_id': game['game_id'],
+            'play_id': int(play['sequenceNumber']),
+            'week': week,
+            'game_date': game['game_date'],
+            'home_team': game['home_team'],
+            'away_team': game['away_team'],
+            'qtr': quarter,
+            'game_seconds_remaining': float(clock) + max(0, 4 - (quarter or 4)) * 900,
+            'posteam': game['teams'].get(_ref_id(play.get('team'))),
+            'play_type': play_type,
+            'yards_gained': yards,
+            'desc': text,
+        })
+        for flag in ('touchdown', 'pass_attempt', 'complete_pass', 'incomplete_pass', 'pass_touchdown',
+                     'rush_attempt', 'rush_touchdown', 'interception', 'sack', 'fumble', 'fumble_lost'):
+            row[flag] = 1 if flag in flags else 0
+        if 'complete_pass' in flags:
+            row['passing_yards'] = row['receiving_yards'] = yards
+        if play_type == 'run' and 'rush_attempt' in flags:
+            row['rushing_yards'] = yards
+        if play_type == 'field_goal':
+            row['field_goal_result'] = {'Field Goal Good': 'made', 'Field Goal Missed': 'missed'}.get(
+                type_text, 'blocked'
+            )
+            distance = re.search(r"(\d+)[ -](?:yd|yard)", text)
+            row['kick_distance'] = int(distance.group(1)) if distance else yards
+
+        for participant in play.get('participants', []):
+            column = ESPN_PARTICIPANTS.get(participant.get('type'))
+            if column and row[column] is None:
+                row[column] = espn_to_gsis.get(_ref_id(participant.get('athlete')))
+        return row
+
+    def fetch_new_plays(self, season: int, week: int, cursors: Dict[str, int]) -> pd.DataFrame:
+        espn_to_gsis = self.espn_to_gsis()
+        rows = []
+        for game in self._games(season, week):
+            cursor = cursors.get(game['game_id'], -1)
+            for play in self._plays(game['event_id'], cursor):
+                if int(play['sequenceNumber']) <= cursor:
+                    continue
+                row = self._to_row(game, week, play, espn_to_gsis)
+                if row is not None:
+                    rows.append(row)
+            if game['final']:
+                # Its last plays are in this batch; there is nothing more to poll for
+                self._finished.add(game['event_id'])
+        return pd.DataFrame(rows, columns=PBP_COLUMNS)
+
+def get_play_source() -> PlaySource:
+    """Source named by LIVE_PBP_SOURCE: "espn", "replay", or "package.module:ClassName" for a custom one"""
+    name = os.getenv("LIVE_PBP_SOURCE", "replay")
+    if name == "espn":
+        return ESPNLiveSource()
+    if name == "replay":
+        return FileReplaySource()
+    if ":" in name:
+        module_name, class_name = name.split(":", 1)
+        return getattr(importlib.import_module(module_name), class_name)()
+    raise ValueError(f"Unknown LIVE_PBP_SOURCE: {name}")
+
+class LiveIngestor:
+    """Polls a play source during games and turns only the new plays into highlights"""
+
+    def __init__(self, db: Session, source: PlaySource, season: int, week: int,
+                 roster_refresh_seconds: Optional[int] = None, resolve_clips: Optional[bool] = None):
+        self.db = db
+        self.source = source
+        self.season = season
+        self.week = week
+        # Rosters barely change during games, so they are not re-read every tick
+        self.roster_refresh_seconds = roster_refresh_seconds or int(
+            os.getenv("LIVE_ROSTER_REFRESH_SECONDS", "300")
+        )
+        if resolve_clips is None:
+            resolve_clips = os.getenv("LIVE_RESOLVE_CLIPS", "true").lower() == "true"
+        self.resolve_clips = resolve_clips
+        self._cursors: Optional[Dict[str, int]] = None
+        self._rosters: List[Roster] = []
+        self._rosters_loaded_at = 0.0
+
+    def cursors(self) -> Dict[str, int]:
+        """game_id -> last ingested play_id, read from the table once and then kept in memory"""
+        if self._cursors is None:
+            self._cursors = dict(self.db.query(LivePlayCursor.game_id, LivePlayCursor.last_play_id).filter(
+                LivePlayCursor.season == self.season,
+                LivePlayCursor.week == self.week
+            ).all())
+        return self._cursors
+
+    def rosters(self) -> List[Roster]:
+        if time.monotonic() - self._rosters_loaded_at >= self.roster_refresh_seconds:
+            self._rosters = self.db.query(Roster).join(League).options(selectinload(Roster.league)).filter(
+                Roster.week == self.week,
+                League.season == str(self.season)
+            ).all()
+            # Detached so commits between refreshes don't expire (and reload) them
+            for league in {roster.league for roster in self._rosters if roster.league}:
+                self.db.expunge(league)
+            for roster in self._rosters:
+                self.db.expunge(roster)
+            self._rosters_loaded_at = time.monotonic()
+        return self._rosters
+
+    async def tick(self) -> Dict:
+        """Ingest the plays added since the last tick"""
+        # Network sources block on HTTP, so the fetch runs off the event loop
+        new_plays = await asyncio.to_thread(self.source.fetch_new_plays, self.season, self.week, self.cursors())
+        stats = {'new_plays': len(new_plays), 'games': 0, 'highlights': 0, 'clips': 0}
+        if new_plays.empty:
+            return stats
+
+        # Only the delta is matched, scored and saved
+        highlight_service = HighlightService(self.db)
+        rosters = self.rosters()
+        highlights_by_roster = highlight_service.route_plays(
+            new_plays, rosters, self.season, self.week, self.source.key_prefix
+        )
+        saved_plays = await highlight_service.save_highlights_to_db(highlights_by_roster)
+        stats['highlights'] = len(saved_plays)
+
+        if saved_plays and self.resolve_clips:
+            # A delta re-read after a crash may include plays that already have clips
+            with_clips = {
+                play_id for (play_id,) in self.db.query(Clip.play_id).filter(
+                    Clip.play_id.in_([play.id for play in saved_plays])
+                ).distinct()
+            }
+            clip_plays = [play for play in saved_plays if play.id not in with_clips]
+            stats['clips'] = await ClipResolver().resolve(self.db, clip_plays, await self._player_names(clip_plays))
+
+        # Advance cursors only after the plays are saved, so a crash re-reads the same delta
+        per_game = new_plays.groupby('game_id')['play_id'].agg(['max', 'size'])
+        for game_id, last_play_id, play_count in per_game.itertuples():
+            updated = self.db.query(LivePlayCursor).filter(LivePlayCursor.game_id == game_id).update({
+                LivePlayCursor.last_play_id: int(last_play_id),
+                LivePlayCursor.plays_ingested: LivePlayCursor.plays_ingested + int(play_count)
+            }, synchronize_session=False)
+            if not updated:
+                self.db.add(LivePlayCursor(
+                    game_id=game_id, season=self.season, week=self.week,
+                    last_play_id=int(last_play_id), plays_ingested=int(play_count)
+                ))
+        stats['games'] = len(per_game)
+
+        feeds = [
+            (roster.league_id, self.week) for roster in rosters if highlights_by_roster.get(roster.id)
+        ]
+        bump_feed_versions(self.db, feeds)
+        self.db.commit()
+        self._cursors.update({game_id: int(last_play_id) for game_id, last_play_id in per_game['max'].items()})
+        get_feed_cache().invalidate(feeds)
+        return stats
+
+    async def _player_names(self, plays) -> Dict[int, str]:
+        player_directory = get_player_directory()
+        await player_directory.ensure_fresh(get_sleeper_service())
+        player_names = {}
+        for play in plays:
+            player = player_directory.get(play.player_ids[0]) if play.player_ids else None
+            if player and player.full_name:
+                player_names[play.id] = player.full_name
+        return player_names
+
+    async def run(self, poll_seconds: float, stop_event) -> None:
+        """Tick until stop_event is set"""
+        await get_player_crosswalk().ensure_fresh(get_sleeper_service())
+        while not stop_event.is_set():
+            started = time.monotonic()
+            try:
+                stats = await self.tick()
+                if stats['new_plays']:
+                    print(f"[live] week {self.week}: {stats['new_plays']} new plays in {stats['games']} games, "
+                          f"{stats['highlights']} highlights ({(time.monotonic() - started) * 1000:.0f} ms)")
+            except Exception as e:
+                print(f"Error ingesting live plays: {e}")
+                self.db.rollback()
+                # Cursors are re-read so they match what was committed
+                self._cursors = None
+            # stop_event is a threading.Event set from a signal handler; wait for it off the loop
+            await asyncio.to_thread(stop_event.wait, max(0.0, poll_seconds - (time.monotonic() - started)))
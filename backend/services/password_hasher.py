@@ -0,0 +1,87 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+from passlib.context import CryptContext
+from dotenv import load_dotenv
+
+load_dotenv()
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many hash/verify calls are already waiting"""
+
+class PasswordHasher:
+    """bcrypt hashing and verification on a dedicated, bounded thread pool"""
+
+    def __init__(self, rounds: Optional[int] = None, max_workers: Optional[int] = None,
+                 max_pending: Optional[int] = None):
+        self.rounds = rounds or int(os.getenv("BCRYPT_ROUNDS", "12"))
+        # bcrypt releases the GIL, so workers hash in parallel without stalling the event loop
+        self.max_workers = max_workers or int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+        self.max_pending = max_pending or int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+        # Hashes with a different cost are reported as needing an update
+        self.context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=self.rounds)
+        self.rejected = 0
+        self._pending = 0
+        self._running = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+
+    def _track(self, fn, *args):
+        with self._lock:
+            self._running += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    def _release(self, future: Future) -> None:
+        # Runs when the call finishes, and also when it is cancelled before a worker
+        # picks it up (the caller went away), in which case _track never runs
+        with self._lock:
+            self._pending -= 1
+
+    async def _submit(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise PasswordHasherBusy()
+            self._pending += 1
+        try:
+            future = self._executor.submit(self._track, fn, *args)
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(self.context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Check a password; on success also return a new hash if the stored one uses another cost"""
+        return await self._submit(self.context.verify_and_update, password, hashed_password)
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            return {
+                'rounds': self.rounds,
+                'workers': self.max_workers,
+                'running': self._running,
+                'queue_depth': self._pending - self._running,
+                'rejected': self.rejected
+            }
+
+_password_hasher: Optional[PasswordHasher] = None
+_password_hasher_lock = threading.Lock()
+
+def get_password_hasher() -> PasswordHasher:
+    """Get the process-wide password hasher"""
+    global _password_hasher
+    with _password_hasher_lock:
+        if _password_hasher is None:
+            _password_hasher = PasswordHasher()
+    return _password_hasher
@@ -0,0 +1,100 @@
+from typing import Dict, List, Tuple
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+from models import Clip, Play, PlayPlayer, Roster, RosterHighlight
+from services.feed_cache import bump_feed_versions, get_feed_cache
+
+# Largest game clock difference between a live play and the nflverse play it is taken to be
+LIVE_MATCH_SECONDS = 5.0
+
+def merge_play_into(db: Session, duplicate_id: int, keeper_id: int) -> None:
+    """Fold a stored play into another row for the same snap, then delete it; the caller commits.
+    The keeper gains the duplicate's players, play_players and roster highlights (keeping its
+    own where both have one) and its clips, unless it already has clips of its own."""
+    keeper_players, duplicate_players = (
+        db.execute(select(Play.player_ids).where(Play.id == play_id)).scalar() or []
+        for play_id in (keeper_id, duplicate_id)
+    )
+    added = [player_id for player_id in duplicate_players if player_id not in keeper_players]
+    if added:
+        db.execute(update(Play).where(Play.id == keeper_id).values(player_ids=list(keeper_players) + added))
+
+    # Repoint the association rows the keeper doesn't have; the rest go with the duplicate
+    indexed = select(PlayPlayer.player_id).where(PlayPlayer.play_id == keeper_id)
+    db.execute(update(PlayPlayer).where(
+        PlayPlayer.play_id == duplicate_id,
+        PlayPlayer.player_id.not_in(indexed)
+    ).values(play_id=keeper_id).execution_options(synchronize_session=False))
+    db.execute(delete(PlayPlayer).where(PlayPlayer.play_id == duplicate_id))
+
+    in_feeds = select(RosterHighlight.roster_id).where(RosterHighlight.play_id == keeper_id)
+    db.execute(update(RosterHighlight).where(
+        RosterHighlight.play_id == duplicate_id,
+        RosterHighlight.roster_id.not_in(in_feeds)
+    ).values(play_id=keeper_id).execution_options(synchronize_session=False))
+    db.execute(delete(RosterHighlight).where(RosterHighlight.play_id == duplicate_id))
+
+    if db.execute(select(Clip.id).where(Clip.play_id == keeper_id).limit(1)).first() is None:
+        db.execute(update(Clip).where(Clip.play_id == duplicate_id).values(play_id=keeper_id)
+                   .execution_options(synchronize_session=False))
+    else:
+        db.execute(delete(Clip).where(Clip.play_id == duplicate_id))
+    db.execute(delete(Play).where(Play.id == duplicate_id))
+
+def _clock(game_clock) -> float:
+    try:
+        return float(game_clock)
+    except (TypeError, ValueError):
+        return float('nan')
+
+def reconcile_live_plays(db: Session, season: int, week: int) -> int:
+    """Merge the week's plays saved by a live source into the nflverse plays for the same snap
+    (same game and quarter, nearest game clock), returning how many were merged. Live plays
+    with no nflverse match are dropped once no roster's feed holds them."""
+    # nflverse plays are keyed "{game_id}_{play_id}"; live sources add a prefix before it
+    key_start = func.substr(Play.play_id, 1, func.length(Play.game_id) + 1)
+    in_week = (Play.season == str(season), Play.week == week, Play.game_id.is_not(None))
+    live = db.execute(
+        select(Play.id, Play.game_id, Play.quarter, Play.game_clock).where(*in_week, key_start != Play.game_id + '_')
+    ).all()
+    if not live:
+        return 0
+
+    nflverse: Dict[Tuple[str, int], List[Tuple[float, int]]] = {}
+    for play_id, game_id, quarter, game_clock in db.execute(
+        select(Play.id, Play.game_id, Play.quarter, Play.game_clock).where(
+            *in_week, Play.game_id.in_({game_id for _, game_id, _, _ in live}), key_start == Play.game_id + '_'
+        )
+    ):
+        nflverse.setdefault((game_id, quarter), []).append((_clock(game_clock), play_id))
+
+    # Leagues whose feeds show these plays change either way
+    live_ids = [play_id for play_id, _, _, _ in live]
+    feeds = [
+        (league_id, week) for (league_id,) in db.execute(
+            select(Roster.league_id).join(RosterHighlight, RosterHighlight.roster_id == Roster.id).where(
+                RosterHighlight.play_id.in_(live_ids)
+            ).distinct()
+        )
+    ]
+
+    merged = 0
+    for play_id, game_id, quarter, game_clock in live:
+        clock = _clock(game_clock)
+        candidates = [
+            (abs(clock - other_clock), other_id) for other_clock, other_id in nflverse.get((game_id, quarter), [])
+            if abs(clock - other_clock) <= LIVE_MATCH_SECONDS
+        ]
+        if candidates:
+            merge_play_into(db, play_id, min(candidates)[1])
+            merged += 1
+        elif db.execute(select(RosterHighlight.id).where(RosterHighlight.play_id == play_id).limit(1)).first() is None:
+            # Not a highlight in the full play-by-play, and in nobody's feed any more
+            db.execute(delete(Clip).where(Clip.play_id == play_id))
+            db.execute(delete(PlayPlayer).where(PlayPlayer.play_id == play_id))
+            db.execute(delete(Play).where(Play.id == play_id))
+
+    bump_feed_versions(db, feeds)
+    db.commit()
+    get_feed_cache().invalidate(feeds)
+    return merged
@@ -0,0 +1,201 @@
+import nfl_data_py as nfl
+import pandas as pd
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from services.scoring_engine import STAT_COLUMNS
+
+load_dotenv()
+
+# Play-by-play columns kept in the store; everything else is pruned on ingest
+PBP_COLUMNS = [
+    'game_id',
+    'play_id',
+    'week',
+    'game_date',
+    'home_team',
+    'away_team',
+    'qtr',
+    'game_seconds_remaining',
+    'posteam',
+    'play_type',
+    'yards_gained',
+    'touchdown',
+    'desc',
+    'passer_player_id',
+    'rusher_player_id',
+    'receiver_player_id',
+    'fumbled_1_player_id',
+    'kicker_player_id',
+] + STAT_COLUMNS
+
+class PlayStore:
+    """Local play-by-play store partitioned by season and week as Parquet files"""
+
+    def __init__(self, root_dir: Optional[str] = None, columns: Optional[List[str]] = None,
+                 max_cached_weeks: Optional[int] = None, refresh_seconds: Optional[int] = None):
+        self.root_dir = root_dir or os.getenv("PBP_STORE_DIR", "./data/pbp")
+        self.columns = list(columns or PBP_COLUMNS)
+        self.max_cached_weeks = max_cached_weeks or int(os.getenv("PBP_STORE_MAX_WEEKS", "32"))
+        # Minimum time between re-downloads of a season that is missing a week or still in progress
+        self.refresh_seconds = refresh_seconds if refresh_seconds is not None else int(
+            os.getenv("PBP_STORE_REFRESH_SECONDS", "3600")
+        )
+        # (season, week) -> (plays, time loaded, whether the week was over when ingested)
+        self._weeks: "OrderedDict[Tuple[int, int], Tuple[pd.DataFrame, float, bool]]" = OrderedDict()
+        self._ingests: Dict[int, Dict] = {}
+        self._lock = threading.Lock()
+        self._season_locks: Dict[int, threading.Lock] = {}
+
+    def season_dir(self, season: int) -> str:
+        return os.path.join(self.root_dir, f"season={season}")
+
+    def partition_path(self, season: int, week: int) -> str:
+        return os.path.join(self.season_dir(season), f"week={week:02d}.parquet")
+
+    def _season_lock(self, season: int) -> threading.Lock:
+        with self._lock:
+            if season not in self._season_locks:
+                self._season_locks[season] = threading.Lock()
+            return self._season_locks[season]
+
+    def _marker_path(self, season: int) -> str:
+        return os.path.join(self.season_dir(season), "_SUCCESS")
+
+    def _last_ingest(self, season: int) -> Optional[Dict]:
+        """When the season was last written with the current column set (ingested_at) and
+        which of its weeks were over by then (final_weeks), if it ever was"""
+        if season in self._ingests:
+            return self._ingests[season]
+        marker = self._marker_path(season)
+        if not os.path.exists(marker):
+            return None
+        try:
+            with open(marker) as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Partitions written before a column was added have to be rebuilt
+        if not set(self.columns).issubset(stored.get('columns', [])):
+            return None
+        self._ingests[season] = {
+            'ingested_at': stored.get('ingested_at', os.path.getmtime(marker)),
+            # Markers written before weeks were tracked say nothing is final, so those are refreshed
+            'final_weeks': set(stored.get('final_weeks', []))
+        }
+        return self._ingests[season]
+
+    @staticmethod
+    def _final_weeks(pbp: pd.DataFrame, ingested_at: float) -> List[int]:
+        """Weeks whose games were all over when the season was downloaded"""
+        weeks = sorted(int(week) for week in pbp['week'].dropna().unique())
+        if not weeks:
+            return []
+        # A week is over once the next one has started
+        final_weeks = weeks[:-1]
+        last_game = pd.to_datetime(pbp.loc[pbp['week'] == weeks[-1], 'game_date'], errors='coerce').max()
+        if pd.notna(last_game) and ingested_at - last_game.timestamp() >= 2 * 86400:
+            # The season's last week, once its last game is well past
+            final_weeks.append(weeks[-1])
+        return final_weeks
+
+    def ingest_season(self, season: int) -> None:
+        """Download a season once and write one pruned Parquet file per week"""
+        pbp = nfl.import_pbp_data([season], columns=self.columns, downcast=True)
+        if pbp.empty:
+            # Nothing published yet (or the download failed); try again next time
+            return
+        # Keep a fixed schema so every partition can be read with the same column list
+        pbp = pbp.reindex(columns=self.columns)
+        ingested_at = time.time()
+        final_weeks = self._final_weeks(pbp, ingested_at)
+
+        os.makedirs(self.season_dir(season), exist_ok=True)
+        for week, week_pbp in pbp.groupby('week'):
+            path = self.partition_path(season, int(week))
+            # Write to a temp file first so readers never see a partial partition
+            tmp_path = f"{path}.tmp"
+            week_pbp.reset_index(drop=True).to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+
+        with open(self._marker_path(season), "w") as marker:
+            json.dump({'columns': self.columns, 'ingested_at': ingested_at, 'final_weeks': final_weeks}, marker)
+
+        self._ingests[season] = {'ingested_at': ingested_at, 'final_weeks': set(final_weeks)}
+        with self._lock:
+            for key in [key for key in self._weeks if key[0] == season]:
+                del self._weeks[key]
+
+    def _is_current(self, season: int, week: int) -> bool:
+        """Whether the week's partition is on disk and won't change: its week was over when
+        ingested, or it was ingested less than refresh_seconds ago"""
+        last_ingest = self._last_ingest(season)
+        if last_ingest is None or not os.path.exists(self.partition_path(season, week)):
+            return False
+        return week in last_ingest['final_weeks'] or time.time() - last_ingest['ingested_at'] < self.refresh_seconds
+
+    def _ensure_partition(self, season: int, week: int) -> bool:
+        """Make sure the week's partition is on disk and up to date, downloading the season if needed"""
+        if self._is_current(season, week):
+            return True
+
+        with self._season_lock(season):
+            # Another thread may have ingested the season while we waited
+            if self._is_current(season, week):
+                return True
+
+            last_ingest = self._last_ingest(season)
+            # Missing and stale in-progress weeks alike wait refresh_seconds between downloads
+            if last_ingest is None or time.time() - last_ingest['ingested_at'] >= self.refresh_seconds:
+                self.ingest_season(season)
+
+        return os.path.exists(self.partition_path(season, week))
+
+    def _is_final(self, season: int, week: int) -> bool:
+        last_ingest = self._last_ingest(season)
+        return last_ingest is not None and week in last_ingest['final_weeks']
+
+    def get_week(self, season: int, week: int) -> pd.DataFrame:
+        """Get one week of plays. The returned frame is shared and must not be modified."""
+        key = (season, week)
+        with self._lock:
+            if key in self._weeks:
+                weekly_pbp, loaded_at, final = self._weeks[key]
+                # Weeks still being played are re-checked so later games are picked up
+                if final or time.time() - loaded_at < self.refresh_seconds:
+                    self._weeks.move_to_end(key)
+                    return weekly_pbp
+
+        if not self._ensure_partition(season, week):
+            # Not cached, so the week is picked up once it is published
+            return pd.DataFrame(columns=self.columns)
+
+        weekly_pbp = pd.read_parquet(self.partition_path(season, week), columns=self.columns)
+        with self._lock:
+            self._weeks[key] = (weekly_pbp, time.time(), self._is_final(season, week))
+            self._weeks.move_to_end(key)
+            while len(self._weeks) > self.max_cached_weeks:
+                self._weeks.popitem(last=False)
+
+        return weekly_pbp
+
+    def clear(self) -> None:
+        """Drop all in-memory weeks (partitions on disk are kept)"""
+        with self._lock:
+            self._weeks.clear()
+
+# Process-wide store shared by every request
+_play_store: Optional[PlayStore] = None
+_play_store_lock = threading.Lock()
+
+def get_play_store() -> PlayStore:
+    """Get the process-wide play store"""
+    global _play_store
+    with _play_store_lock:
+        if _play_store is None:
+            _play_store = PlayStore()
+        return _play_store
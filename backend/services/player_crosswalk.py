@@ -0,0 +1,157 @@
+import nfl_data_py as nfl
+import pandas as pd
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+from dotenv import load_dotenv
+from services.player_directory import PlayerDirectory, get_player_directory
+
+load_dotenv()
+
+class PlayerCrosswalk:
+    """Sleeper player id -> nflverse (GSIS) player id index"""
+
+    def __init__(self, path: Optional[str] = None, max_age_seconds: Optional[int] = None):
+        self.path = path or os.getenv("PLAYER_CROSSWALK_PATH", "./data/player_crosswalk.json")
+        self.max_age_seconds = max_age_seconds or int(os.getenv("PLAYER_CROSSWALK_MAX_AGE_SECONDS", "86400"))
+        self.built_at: Optional[float] = None
+        self.sleeper_to_gsis: Dict[str, str] = {}
+        self.gsis_to_sleeper: Dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._refresh_lock: Optional[asyncio.Lock] = None
+
+    def __len__(self) -> int:
+        return len(self.sleeper_to_gsis)
+
+    def is_fresh(self) -> bool:
+        return self.built_at is not None and time.time() - self.built_at < self.max_age_seconds
+
+    def _set_index(self, sleeper_to_gsis: Dict[str, str], built_at: float) -> None:
+        gsis_to_sleeper = {gsis_id: sleeper_id for sleeper_id, gsis_id in sleeper_to_gsis.items()}
+        self.sleeper_to_gsis, self.gsis_to_sleeper = sleeper_to_gsis, gsis_to_sleeper
+        self.built_at = built_at
+
+    def load_local(self) -> bool:
+        """Load the crosswalk from the local file, if there is one"""
+        try:
+            with open(self.path) as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return False
+        self._set_index(stored['sleeper_to_gsis'], stored['built_at'])
+        return True
+
+    def _save_local(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'built_at': self.built_at, 'sleeper_to_gsis': self.sleeper_to_gsis}, f)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def _nflverse_ids() -> Dict[str, str]:
+        """Sleeper id -> GSIS id from the nflverse IDs table"""
+        try:
+            ids = nfl.import_ids(columns=['sleeper_id', 'gsis_id'])
+        except Exception as e:
+            print(f"Error fetching nflverse ids: {e}")
+            return {}
+
+        ids = ids.dropna(subset=['sleeper_id', 'gsis_id'])
+        # sleeper_id comes back as a float column
+        sleeper_ids = pd.to_numeric(ids['sleeper_id'], errors='coerce')
+        valid = sleeper_ids.notna()
+        return dict(zip(
+            sleeper_ids[valid].astype('int64').astype(str),
+            ids.loc[valid, 'gsis_id'].astype(str)
+        ))
+
+    def build(self, player_directory: PlayerDirectory) -> None:
+        """Rebuild the crosswalk from the nflverse IDs table and the Sleeper dump"""
+        # The Sleeper dump fills in players the nflverse table doesn't know yet
+        sleeper_to_gsis = player_directory.gsis_ids()
+        sleeper_to_gsis.update(self._nflverse_ids())
+        if not sleeper_to_gsis:
+            return
+
+        self._set_index(sleeper_to_gsis, time.time())
+        self._save_local()
+
+    async def ensure_fresh(self, sleeper_service) -> None:
+        """Make sure the crosswalk is loaded and less than max_age old"""
+        if self.is_fresh():
+            return
+
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+        async with self._refresh_lock:
+            if self.is_fresh():
+                return
+            if self.built_at is None and self.load_local() and self.is_fresh():
+                return
+
+            player_directory = get_player_directory()
+            await player_directory.ensure_fresh(sleeper_service)
+            await asyncio.to_thread(self.build, player_directory)
+
+    def to_gsis(self, sleeper_ids: Iterable[str]) -> Dict[str, str]:
+        """Translate a roster's Sleeper ids, returning GSIS id -> Sleeper id"""
+        translated = {}
+        missed = 0
+        for sleeper_id in sleeper_ids:
+            gsis_id = self.sleeper_to_gsis.get(sleeper_id)
+            if gsis_id is None:
+                missed += 1
+            else:
+                translated[gsis_id] = sleeper_id
+
+        with self._lock:
+            self.hits += len(translated)
+            self.misses += missed
+        return translated
+
+    def metrics(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self),
+            'built_at': self.built_at,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else None
+        }
+
+# Process-wide crosswalk shared by every request
+_player_crosswalk: Optional[PlayerCrosswalk] = None
+
+def get_player_crosswalk() -> PlayerCrosswalk:
+    """Get the process-wide player crosswalk"""
+    global _player_crosswalk
+    if _player_crosswalk is None:
+        _player_crosswalk = PlayerCrosswalk()
+    return _player_crosswalk
+
+async def refresh_player_crosswalk() -> Dict:
+    """Refresh job: rebuild the player directory and crosswalk from their sources"""
+    from services.sleeper_service import SleeperService
+
+    sleeper_service = SleeperService()
+    try:
+        player_directory = get_player_directory()
+        if not await player_directory.refresh(sleeper_service):
+            # Fall back to the last local copy of the dump
+            player_directory.load_local()
+
+        player_crosswalk = get_player_crosswalk()
+        await asyncio.to_thread(player_crosswalk.build, player_directory)
+        return player_crosswalk.metrics()
+    finally:
+        await sleeper_service.close()
+
+if __name__ == "__main__":
+    # Run from the backend directory: python -m services.player_crosswalk
+    print(asyncio.run(refresh_player_crosswalk()))
@@ -0,0 +1,148 @@
+import asyncio
+import gzip
+import json
+import os
+import time
+from typing import Dict, Iterable, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Fields kept from Sleeper's player dump; everything else is dropped
+PLAYER_FIELDS = ['full_name', 'position', 'team', 'status', 'gsis_id']
+
+class PlayerRecord:
+    """One player from the Sleeper dump, trimmed to the fields we use"""
+    __slots__ = ('player_id', 'full_name', 'position', 'team', 'status', 'gsis_id')
+
+    def __init__(self, player_id: str, full_name: Optional[str], position: Optional[str],
+                 team: Optional[str], status: Optional[str], gsis_id: Optional[str]):
+        self.player_id = player_id
+        self.full_name = full_name
+        self.position = position
+        self.team = team
+        self.status = status
+        self.gsis_id = gsis_id
+
+    def to_dict(self) -> Dict:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+class PlayerDirectory:
+    """In-memory Sleeper player directory, refreshed at most once per max_age"""
+
+    def __init__(self, path: Optional[str] = None, max_age_seconds: Optional[int] = None):
+        self.path = path or os.getenv("PLAYER_DIRECTORY_PATH", "./data/players.json.gz")
+        self.max_age_seconds = max_age_seconds or int(os.getenv("PLAYER_DIRECTORY_MAX_AGE_SECONDS", "86400"))
+        self.fetched_at: Optional[float] = None
+        self._players: Dict[str, PlayerRecord] = {}
+        self._by_gsis: Dict[str, PlayerRecord] = {}
+        self._refresh_lock: Optional[asyncio.Lock] = None
+
+    def __len__(self) -> int:
+        return len(self._players)
+
+    def is_fresh(self) -> bool:
+        return self.fetched_at is not None and time.time() - self.fetched_at < self.max_age_seconds
+
+    def get(self, player_id: str) -> Optional[PlayerRecord]:
+        return self._players.get(player_id)
+
+    def get_many(self, player_ids: Iterable[str]) -> Dict[str, PlayerRecord]:
+        players = self._players
+        return {player_id: players[player_id] for player_id in player_ids if player_id in players}
+
+    def get_by_gsis_id(self, gsis_id: str) -> Optional[PlayerRecord]:
+        return self._by_gsis.get(gsis_id)
+
+    def gsis_ids(self) -> Dict[str, str]:
+        """Sleeper id -> GSIS id for every player that has one"""
+        return {record.player_id: record.gsis_id for record in self._by_gsis.values()}
+
+    def _load_columns(self, columns: Dict[str, List], fetched_at: float) -> None:
+        players = {}
+        by_gsis = {}
+        for values in zip(columns['player_id'], *(columns[field] for field in PLAYER_FIELDS)):
+            record = PlayerRecord(*values)
+            players[record.player_id] = record
+            if record.gsis_id:
+                by_gsis[record.gsis_id] = record
+
+        # Swap in the new indexes in one step so readers never see a partial directory
+        self._players, self._by_gsis = players, by_gsis
+        self.fetched_at = fetched_at
+
+    def load_local(self) -> bool:
+        """Load the directory from the local file, if there is one"""
+        try:
+            with gzip.open(self.path, 'rt') as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return False
+        self._load_columns(stored['columns'], stored['fetched_at'])
+        return True
+
+    def _save_local(self, columns: Dict[str, List]) -> None:
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with gzip.open(tmp_path, 'wt') as f:
+            json.dump({'fetched_at': self.fetched_at, 'columns': columns}, f, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+    def load_dump(self, players: Dict[str, Dict]) -> None:
+        """Replace the directory with a Sleeper /players/nfl dump and persist it"""
+        columns = {'player_id': [], **{field: [] for field in PLAYER_FIELDS}}
+        for player_id, player_data in players.items():
+            full_name = player_data.get('full_name')
+            if not full_name and (player_data.get('first_name') or player_data.get('last_name')):
+                # Team defenses and some free agents only have first/last names
+                full_name = f"{player_data.get('first_name', '')} {player_data.get('last_name', '')}".strip()
+            gsis_id = (player_data.get('gsis_id') or '').strip() or None
+
+            columns['player_id'].append(player_id)
+            columns['full_name'].append(full_name)
+            columns['position'].append(player_data.get('position'))
+            columns['team'].append(player_data.get('team'))
+            columns['status'].append(player_data.get('status'))
+            columns['gsis_id'].append(gsis_id)
+
+        self._load_columns(columns, time.time())
+        self._save_local(columns)
+
+    async def refresh(self, sleeper_service) -> bool:
+        """Download the dump now, whatever the directory's age"""
+        players = await sleeper_service.get_players()
+        if not players:
+            return False
+        # Trimming and writing the dump is CPU and disk work
+        await asyncio.to_thread(self.load_dump, players)
+        return True
+
+    async def ensure_fresh(self, sleeper_service) -> None:
+        """Make sure the directory is loaded and less than max_age old"""
+        if self.is_fresh():
+            return
+
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+        async with self._refresh_lock:
+            # Another request may have refreshed while we waited
+            if self.is_fresh():
+                return
+
+            # Cold start: the local copy is enough if it is recent
+            if self.fetched_at is None and self.load_local() and self.is_fresh():
+                return
+
+            if not await self.refresh(sleeper_service) and self.fetched_at is not None:
+                # Keep serving the old copy, but retry within the hour rather than the day
+                self.fetched_at = max(self.fetched_at, time.time() - self.max_age_seconds + 3600)
+
+# Process-wide directory shared by every request
+_player_directory: Optional[PlayerDirectory] = None
+
+def get_player_directory() -> PlayerDirectory:
+    """Get the process-wide player directory"""
+    global _player_directory
+    if _player_directory is None:
+        _player_directory = PlayerDirectory()
+    return _player_directory
@@ -0,0 +1,77 @@
+import asyncio
+from typing import Dict, List, Optional
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models import LeagueRosterSnapshot
+from services.sleeper_service import SleeperService
+
+async def fetch_league_week(sleeper_service: SleeperService, sleeper_league_id: str, week: int) -> List[Dict]:
+    """Every team in a Sleeper league for a week, from users, rosters and matchups fetched concurrently"""
+    league_users, rosters, matchups = await asyncio.gather(
+        sleeper_service.get_league_users(sleeper_league_id),
+        sleeper_service.get_league_rosters(sleeper_league_id),
+        sleeper_service.get_league_matchups(sleeper_league_id, week),
+    )
+    users_by_id = {user.get('user_id'): user for user in league_users}
+    matchups_by_roster = {matchup.get('roster_id'): matchup for matchup in matchups}
+
+    teams = []
+    for roster in rosters:
+        roster_id = roster.get('roster_id')
+        if roster_id is None:
+            continue
+        owner = users_by_id.get(roster.get('owner_id')) or {}
+        matchup = matchups_by_roster.get(roster_id) or {}
+        teams.append({
+            'sleeper_league_id': sleeper_league_id,
+            'week': week,
+            'sleeper_roster_id': int(roster_id),
+            'owner_id': roster.get('owner_id'),
+            'co_owner_ids': roster.get('co_owners') or [],
+            'owner_name': owner.get('display_name'),
+            'team_name': (owner.get('metadata') or {}).get('team_name'),
+            'matchup_id': matchup.get('matchup_id'),
+            'points': matchup.get('points'),
+            # The week's matchup lists who was on the team that week; the roster is only current
+            'player_ids': matchup.get('players') or roster.get('players') or [],
+            'starters': matchup.get('starters') or roster.get('starters') or [],
+        })
+    return teams
+
+def load_snapshot(db: Session, sleeper_league_id: str, week: int) -> List[LeagueRosterSnapshot]:
+    teams = db.query(LeagueRosterSnapshot).filter(
+        LeagueRosterSnapshot.sleeper_league_id == sleeper_league_id,
+        LeagueRosterSnapshot.week == week
+    ).order_by(LeagueRosterSnapshot.sleeper_roster_id).all()
+    # Detached, so they can be shared with concurrent requests and outlive this session's commits
+    for team in teams:
+        db.expunge(team)
+    return teams
+
+def save_snapshot(db: Session, sleeper_league_id: str, week: int, teams: List[Dict]) -> List[LeagueRosterSnapshot]:
+    """Replace the league's snapshot for the week with one bulk insert"""
+    db.query(LeagueRosterSnapshot).filter(
+        LeagueRosterSnapshot.sleeper_league_id == sleeper_league_id,
+        LeagueRosterSnapshot.week == week
+    ).delete(synchronize_session=False)
+    try:
+        if teams:
+            db.execute(insert(LeagueRosterSnapshot), teams)
+        db.commit()
+    except IntegrityError:
+        # Another process saved the same snapshot first
+        db.rollback()
+    return load_snapshot(db, sleeper_league_id, week)
+
+def find_owner_team(teams: List[LeagueRosterSnapshot], sleeper_user_id: Optional[str]) -> Optional[LeagueRosterSnapshot]:
+    """The team owned (or co-owned) by the given Sleeper user"""
+    if not sleeper_user_id:
+        return None
+    for team in teams:
+        if team.owner_id == sleeper_user_id:
+            return team
+    for team in teams:
+        if sleeper_user_id in (team.co_owner_ids or []):
+            return team
+    return None
@@ -0,0 +1,215 @@
+import hashlib
+import json
+import threading
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+# Default PPR scoring, using Sleeper scoring_settings keys
+DEFAULT_SCORING_SETTINGS = {
+    'pass_yd': 0.04,
+    'pass_td': 4,
+    'pass_int': -2,
+    'pass_2pt': 2,
+    'rush_yd': 0.1,
+    'rush_td': 6,
+    'rush_2pt': 2,
+    'rec': 1,
+    'rec_yd': 0.1,
+    'rec_td': 6,
+    'rec_2pt': 2,
+    'fum_lost': -2,
+    'fgm_0_19': 3,
+    'fgm_20_29': 3,
+    'fgm_30_39': 3,
+    'fgm_40_49': 4,
+    'fgm_50p': 5,
+    'fgmiss': -1,
+    'xpm': 1,
+    'xpmiss': -1
+}
+
+# nflverse play-by-play stat columns the features are built from
+STAT_COLUMNS = [
+    'passing_yards',
+    'rushing_yards',
+    'receiving_yards',
+    'pass_attempt',
+    'complete_pass',
+    'incomplete_pass',
+    'pass_touchdown',
+    'rush_attempt',
+    'rush_touchdown',
+    'interception',
+    'sack',
+    'fumble',
+    'fumble_lost',
+    'two_point_conv_result',
+    'field_goal_result',
+    'kick_distance',
+    'extra_point_result',
+]
+
+def _numeric(stats: pd.DataFrame, column: str) -> np.ndarray:
+    return pd.to_numeric(stats[column], errors='coerce').fillna(0).to_numpy(dtype=float)
+
+def _equals(stats: pd.DataFrame, column: str, *values: str) -> np.ndarray:
+    return stats[column].isin(values).to_numpy(dtype=float)
+
+def _two_point(stats: pd.DataFrame, play_type: str) -> np.ndarray:
+    return ((stats['two_point_conv_result'] == 'success') & (stats['play_type'] == play_type)).to_numpy(dtype=float)
+
+def _field_goal(stats: pd.DataFrame, low: int, high: int) -> np.ndarray:
+    distance = _numeric(stats, 'kick_distance')
+    made = _equals(stats, 'field_goal_result', 'made')
+    return made * ((distance >= low) & (distance <= high))
+
+# Sleeper scoring key -> per-play stat it multiplies
+SCORING_FEATURES: Dict[str, Callable[[pd.DataFrame], np.ndarray]] = {
+    'pass_yd': lambda stats: _numeric(stats, 'passing_yards'),
+    'pass_att': lambda stats: _numeric(stats, 'pass_attempt'),
+    'pass_cmp': lambda stats: _numeric(stats, 'complete_pass'),
+    'pass_inc': lambda stats: _numeric(stats, 'incomplete_pass'),
+    'pass_td': lambda stats: _numeric(stats, 'pass_touchdown'),
+    'pass_int': lambda stats: _numeric(stats, 'interception'),
+    'pass_sack': lambda stats: _numeric(stats, 'sack'),
+    'pass_2pt': lambda stats: _two_point(stats, 'pass'),
+    'rush_yd': lambda stats: _numeric(stats, 'rushing_yards'),
+    'rush_att': lambda stats: _numeric(stats, 'rush_attempt'),
+    'rush_td': lambda stats: _numeric(stats, 'rush_touchdown'),
+    'rush_2pt': lambda stats: _two_point(stats, 'run'),
+    'rec': lambda stats: _numeric(stats, 'complete_pass'),
+    'rec_yd': lambda stats: _numeric(stats, 'receiving_yards'),
+    'rec_td': lambda stats: _numeric(stats, 'pass_touchdown'),
+    'rec_2pt': lambda stats: _two_point(stats, 'pass'),
+    'fum': lambda stats: _numeric(stats, 'fumble'),
+    'fum_lost': lambda stats: _numeric(stats, 'fumble_lost'),
+    'fgm': lambda stats: _equals(stats, 'field_goal_result', 'made'),
+    'fgm_0_19': lambda stats: _field_goal(stats, 0, 19),
+    'fgm_20_29': lambda stats: _field_goal(stats, 20, 29),
+    'fgm_30_39': lambda stats: _field_goal(stats, 30, 39),
+    'fgm_40_49': lambda stats: _field_goal(stats, 40, 49),
+    'fgm_50p': lambda stats: _field_goal(stats, 50, 1000),
+    'fgmiss': lambda stats: _equals(stats, 'field_goal_result', 'missed', 'blocked'),
+    'xpm': lambda stats: _equals(stats, 'extra_point_result', 'good'),
+    'xpmiss': lambda stats: _equals(stats, 'extra_point_result', 'failed', 'blocked'),
+}
+
+SCORING_KEYS = list(SCORING_FEATURES)
+
+# Play-by-play column naming the player each scoring key is credited to: a TD
+# pass scores pass_td for the passer and rec_td for the receiver, never both
+# for one player.
+ROLE_COLUMNS = [
+    'passer_player_id',
+    'rusher_player_id',
+    'receiver_player_id',
+    'fumbled_1_player_id',
+    'kicker_player_id',
+]
+
+def _scoring_role(key: str) -> str:
+    if key.startswith('pass_'):
+        return 'passer_player_id'
+    if key.startswith('rush_'):
+        return 'rusher_player_id'
+    if key.startswith('rec'):
+        return 'receiver_player_id'
+    if key.startswith('fum'):
+        return 'fumbled_1_player_id'
+    return 'kicker_player_id'
+
+SCORING_ROLES = {key: _scoring_role(key) for key in SCORING_KEYS}
+# Per role, which SCORING_KEYS count toward it
+ROLE_MASKS = {
+    role: np.array([SCORING_ROLES[key] == role for key in SCORING_KEYS], dtype=float) for role in ROLE_COLUMNS
+}
+
+class CompiledScoring:
+    """A league's scoring settings compiled to a coefficient vector over SCORING_KEYS"""
+    __slots__ = ('settings_hash', 'coefficients')
+
+    def __init__(self, settings_hash: str, coefficients: np.ndarray):
+        self.settings_hash = settings_hash
+        self.coefficients = coefficients
+
+class ScoringEngine:
+    """Scores whole play-by-play frames against Sleeper scoring settings"""
+
+    def __init__(self, max_compiled: int = 512):
+        self.max_compiled = max_compiled
+        self._compiled: "OrderedDict[str, CompiledScoring]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def settings_hash(scoring_settings: Dict) -> str:
+        canonical = json.dumps(scoring_settings, sort_keys=True, default=str)
+        return hashlib.sha1(canonical.encode()).hexdigest()
+
+    def compile(self, scoring_settings: Optional[Dict] = None) -> CompiledScoring:
+        """Compile scoring settings once; later calls with equal settings hit the cache"""
+        if not scoring_settings:
+            scoring_settings = DEFAULT_SCORING_SETTINGS
+
+        key = self.settings_hash(scoring_settings)
+        with self._lock:
+            if key in self._compiled:
+                self._compiled.move_to_end(key)
+                return self._compiled[key]
+
+        coefficients = np.zeros(len(SCORING_KEYS))
+        for index, scoring_key in enumerate(SCORING_KEYS):
+            try:
+                coefficients[index] = float(scoring_settings.get(scoring_key) or 0)
+            except (TypeError, ValueError):
+                continue
+        compiled = CompiledScoring(key, coefficients)
+
+        with self._lock:
+            self._compiled[key] = compiled
+            while len(self._compiled) > self.max_compiled:
+                self._compiled.popitem(last=False)
+
+        return compiled
+
+    def feature_matrix(self, plays: pd.DataFrame) -> np.ndarray:
+        """Per-play stat matrix with one column per scoring key"""
+        stats = plays.reindex(columns=STAT_COLUMNS + ['play_type'])
+        if plays.empty:
+            return np.zeros((0, len(SCORING_KEYS)))
+        return np.column_stack([SCORING_FEATURES[key](stats) for key in SCORING_KEYS])
+
+    def score(self, plays: pd.DataFrame, scoring_settings: Optional[Dict] = None) -> np.ndarray:
+        """Fantasy points for every play under one league's settings"""
+        return self.feature_matrix(plays) @ self.compile(scoring_settings).coefficients
+
+    def score_many(self, plays: pd.DataFrame, settings_list: List[Optional[Dict]]) -> np.ndarray:
+        """Fantasy points for every play under several leagues' settings (plays x leagues)"""
+        if not settings_list:
+            return np.zeros((len(plays), 0))
+        coefficients = np.column_stack([self.compile(settings).coefficients for settings in settings_list])
+        return self.feature_matrix(plays) @ coefficients
+
+    def score_roles(self, plays: pd.DataFrame, settings_list: List[Optional[Dict]]) -> np.ndarray:
+        """Fantasy points for every play earned in each role under several leagues' settings
+        (plays x ROLE_COLUMNS x leagues)"""
+        if not settings_list:
+            return np.zeros((len(plays), len(ROLE_COLUMNS), 0))
+        features = self.feature_matrix(plays)
+        coefficients = np.column_stack([self.compile(settings).coefficients for settings in settings_list])
+        return np.stack(
+            [features @ (coefficients * ROLE_MASKS[role][:, None]) for role in ROLE_COLUMNS], axis=1
+        )
+
+# Process-wide engine so compiled settings are shared by every request
+_scoring_engine: Optional[ScoringEngine] = None
+_scoring_engine_lock = threading.Lock()
+
+def get_scoring_engine() -> ScoringEngine:
+    """Get the process-wide scoring engine"""
+    global _scoring_engine
+    with _scoring_engine_lock:
+        if _scoring_engine is None:
+            _scoring_engine = ScoringEngine()
+        return _scoring_engine
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+from sqlalchemy.exc import IntegrityError
+from dotenv import load_dotenv
+from database import SessionLocal
+from models import YouTubeSearchCache
+
+load_dotenv()
+
+def normalize_query(query: str) -> str:
+    """Lowercase and collapse whitespace so trivially different queries share a key.
+    Token order is kept: "KC at BUF" and "BUF at KC" are different games."""
+    return " ".join(query.lower().split())
+
+def make_cache_key(query: str, params: Dict) -> str:
+    payload = json.dumps({'q': normalize_query(query), 'params': params}, sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+class SearchCache:
+    """YouTube search results persisted in the youtube_search_cache table"""
+
+    def __init__(self, ttl_seconds: Optional[int] = None, max_entries: Optional[int] = None,
+                 session_factory=SessionLocal):
+        self.ttl_seconds = ttl_seconds or int(os.getenv("YOUTUBE_SEARCH_CACHE_TTL_SECONDS", "86400"))
+        self.max_entries = max_entries or int(os.getenv("YOUTUBE_SEARCH_CACHE_MAX_ENTRIES", "50000"))
+        self.session_factory = session_factory
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+
+    def get_or_search(self, query: str, params: Dict, search: Callable[[], List[Dict]]) -> List[Dict]:
+        """Return cached results, or run the search once for all concurrent callers"""
+        key = make_cache_key(query, params)
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            # Same search already running on another thread; share its result
+            return future.result()
+
+        try:
+            results = self._load(key)
+            if results is None:
+                with self._lock:
+                    self.misses += 1
+                # Errors propagate and are not cached
+                results = search()
+                self._store(key, query, params, results)
+            else:
+                with self._lock:
+                    self.hits += 1
+            future.set_result(results)
+            return results
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def _load(self, key: str) -> Optional[List[Dict]]:
+        db = self.session_factory()
+        try:
+            now = _utcnow()
+            entry = db.query(YouTubeSearchCache).filter(
+                YouTubeSearchCache.cache_key == key,
+                YouTubeSearchCache.expires_at > now
+            ).first()
+            if entry is None:
+                return None
+
+            # Recency drives LRU eviction
+            entry.last_used_at = now
+            entry.hit_count = (entry.hit_count or 0) + 1
+            db.commit()
+            return entry.results
+        except Exception as e:
+            print(f"Error reading YouTube search cache: {e}")
+            db.rollback()
+            return None
+        finally:
+            db.close()
+
+    def _store(self, key: str, query: str, params: Dict, results: List[Dict]) -> None:
+        db = self.session_factory()
+        try:
+            now = _utcnow()
+            expires_at = now + timedelta(seconds=self.ttl_seconds)
+            entry = db.query(YouTubeSearchCache).filter(YouTubeSearchCache.cache_key == key).first()
+            if entry is None:
+                db.add(YouTubeSearchCache(
+                    cache_key=key,
+                    query=normalize_query(query),
+                    params=params,
+                    results=results,
+                    hit_count=0,
+                    expires_at=expires_at,
+                    last_used_at=now
+                ))
+            else:
+                # Expired entry is refreshed in place
+                entry.results = results
+                entry.expires_at = expires_at
+                entry.last_used_at = now
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another process cached the same search first
+                db.rollback()
+                return
+
+            with self._lock:
+                self._writes += 1
+                evict = self._writes % 100 == 0
+            if evict:
+                self.evict(db)
+        except Exception as e:
+            print(f"Error writing YouTube search cache: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+    def evict(self, db) -> int:
+        """Drop expired entries, then the least recently used ones over max_entries"""
+        removed = db.query(YouTubeSearchCache).filter(
+            YouTubeSearchCache.expires_at <= _utcnow()
+        ).delete(synchronize_session=False)
+
+        overflow = db.query(YouTubeSearchCache.id).order_by(
+            YouTubeSearchCache.last_used_at.desc()
+        ).offset(self.max_entries).subquery()
+        removed += db.query(YouTubeSearchCache).filter(
+            YouTubeSearchCache.id.in_(db.query(overflow.c.id))
+        ).delete(synchronize_session=False)
+        db.commit()
+        return removed
+
+    def metrics(self) -> Dict:
+        # In-process counters only, so scrapes never touch the database
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'stores': self._writes,
+                'in_flight': len(self._in_flight),
+                'hit_rate': self.hits / lookups if lookups else None
+            }
+
+_search_cache: Optional[SearchCache] = None
+_search_cache_lock = threading.Lock()
+
+def get_search_cache() -> SearchCache:
+    """Get the process-wide YouTube search cache"""
+    global _search_cache
+    with _search_cache_lock:
+        if _search_cache is None:
+            _search_cache = SearchCache()
+    return _search_cache
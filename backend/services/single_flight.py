@@ -0,0 +1,146 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+from dotenv import load_dotenv
+
+load_dotenv()
+
+T = TypeVar("T")
+
+class SingleFlight:
+    """One in-flight fetch per key in this process; concurrent callers for the key share its result"""
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.leaders = 0
+        self.shared = 0
+
+    async def do(self, key: str, fetch: Callable[[], Awaitable[T]]) -> T:
+        """Run fetch() for key, or wait for the call already running and return its result.
+        fetch should re-check the database first: under a cross-process backend it runs
+        after the lock holder in another process has committed."""
+        while key in self._in_flight:
+            future = self._in_flight[key]
+            self.shared += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # The leading request was cancelled (client went away); take over
+                if future.cancelled():
+                    continue
+                raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        self.leaders += 1
+        try:
+            async with self.lock(key):
+                result = await fetch()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Followers re-raise it; don't warn about it when there are none
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._in_flight.pop(key, None)
+
+    @asynccontextmanager
+    async def lock(self, key: str):
+        """Cross-process exclusion around a fetch; in-process only by default"""
+        yield
+
+    def metrics(self) -> Dict:
+        return {
+            'backend': type(self).__name__,
+            'in_flight': len(self._in_flight),
+            'leaders': self.leaders,
+            'shared': self.shared
+        }
+
+class AdvisoryLockSingleFlight(SingleFlight):
+    """Also serializes a key across API processes with a PostgreSQL advisory lock"""
+
+    def __init__(self, engine=None):
+        super().__init__()
+        if engine is None:
+            from database import engine
+        if engine.dialect.name != 'postgresql':
+            raise ValueError("SINGLE_FLIGHT_BACKEND=postgres needs a PostgreSQL DATABASE_URL")
+        self.engine = engine
+
+    @asynccontextmanager
+    async def lock(self, key: str):
+        # Session-level lock on its own connection, so the fetch's commits don't release it
+        connection = await run_in_threadpool(self.engine.connect)
+        try:
+            await run_in_threadpool(
+                connection.execute, text("SELECT pg_advisory_lock(hashtextextended(:key, 0))"), {'key': key}
+            )
+            try:
+                yield
+            finally:
+                await run_in_threadpool(
+                    connection.execute, text("SELECT pg_advisory_unlock(hashtextextended(:key, 0))"), {'key': key}
+                )
+        finally:
+            await run_in_threadpool(connection.close)
+
+class RedisLockSingleFlight(SingleFlight):
+    """Also serializes a key across API processes with a Redis lock"""
+
+    def __init__(self, redis_url: Optional[str] = None, lock_timeout_seconds: Optional[float] = None):
+        super().__init__()
+        import redis
+
+        self.redis = redis.Redis.from_url(redis_url or os.getenv("REDIS_URL", "redis://localhost:6379"))
+        self.prefix = os.getenv("SINGLE_FLIGHT_REDIS_PREFIX", "fantasy_clips:single_flight")
+        # Held at most this long, so a crashed process doesn't block the key for good
+        self.lock_timeout_seconds = lock_timeout_seconds or float(
+            os.getenv("SINGLE_FLIGHT_LOCK_TIMEOUT_SECONDS", "30")
+        )
+
+    @asynccontextmanager
+    async def lock(self, key: str):
+        redis_lock = self.redis.lock(
+            f"{self.prefix}:{key}", timeout=self.lock_timeout_seconds, blocking_timeout=self.lock_timeout_seconds
+        )
+        try:
+            acquired = await run_in_threadpool(redis_lock.acquire)
+        except Exception as e:
+            # Redis being down only costs duplicate fetches; unique constraints keep the rows right
+            print(f"Error acquiring single-flight lock from Redis: {e}")
+            acquired = False
+        try:
+            yield
+        finally:
+            if acquired:
+                try:
+                    await run_in_threadpool(redis_lock.release)
+                except Exception as e:
+                    print(f"Error releasing single-flight lock in Redis: {e}")
+
+_single_flight: Optional[SingleFlight] = None
+
+def get_single_flight() -> SingleFlight:
+    """Get the configured single-flight coordinator (SINGLE_FLIGHT_BACKEND=local|postgres|redis)"""
+    global _single_flight
+    if _single_flight is None:
+        backend = os.getenv("SINGLE_FLIGHT_BACKEND", "local").lower()
+        if backend == "postgres":
+            _single_flight = AdvisoryLockSingleFlight()
+        elif backend == "redis":
+            _single_flight = RedisLockSingleFlight()
+        elif backend == "local":
+            _single_flight = SingleFlight()
+        else:
+            raise ValueError(f"Unknown SINGLE_FLIGHT_BACKEND: {backend}")
+    return _single_flight
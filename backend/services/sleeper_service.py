@@ -1,22 +1,71 @@
 import httpx
+import importlib.util
 import os
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional
 from dotenv import load_dotenv
+from services.rate_limiter import TokenBucket
+from services.ttl_cache import TTLCache
 
 load_dotenv()
 
+# Response cache lifetimes in seconds, per endpoint
+DEFAULT_CACHE_TTLS = {
+    'user': int(os.getenv("SLEEPER_TTL_USER", "600")),
+    'user_leagues': int(os.getenv("SLEEPER_TTL_USER_LEAGUES", "300")),
+    'league': int(os.getenv("SLEEPER_TTL_LEAGUE", "300")),
+    'league_users': int(os.getenv("SLEEPER_TTL_LEAGUE_USERS", "300")),
+    'rosters': int(os.getenv("SLEEPER_TTL_ROSTERS", "15")),
+    'matchups': int(os.getenv("SLEEPER_TTL_MATCHUPS", "15")),
+    'player_stats': int(os.getenv("SLEEPER_TTL_PLAYER_STATS", "60")),
+}
+
 class SleeperService:
-    def __init__(self):
-        self.base_url = os.getenv("SLEEPER_BASE_URL", "https://api.sleeper.app/v1")
-        self.client = httpx.AsyncClient()
+    def __init__(self, base_url: Optional[str] = None, transport: Optional[httpx.AsyncBaseTransport] = None,
+                 cache_ttls: Optional[Dict[str, int]] = None, rate_per_minute: Optional[int] = None):
+        self.base_url = base_url or os.getenv("SLEEPER_BASE_URL", "https://api.sleeper.app/v1")
+        self.cache_ttls = {**DEFAULT_CACHE_TTLS, **(cache_ttls or {})}
+        self.cache = TTLCache(maxsize=int(os.getenv("SLEEPER_CACHE_SIZE", "2048")))
+        
+        # Sleeper asks clients to stay under 1000 calls per minute
+        rate_per_minute = rate_per_minute or int(os.getenv("SLEEPER_RATE_LIMIT_PER_MINUTE", "900"))
+        self.rate_limiter = TokenBucket(rate=rate_per_minute / 60, capacity=max(1, rate_per_minute // 20))
+        
+        # HTTP/2 needs the optional h2 package (httpx[http2])
+        http2 = os.getenv("SLEEPER_HTTP2", "true").lower() == "true" and importlib.util.find_spec("h2") is not None
+        self.client = httpx.AsyncClient(
+            http2=http2,
+            transport=transport,
+            timeout=httpx.Timeout(float(os.getenv("SLEEPER_TIMEOUT_SECONDS", "10"))),
+            limits=httpx.Limits(
+                max_connections=int(os.getenv("SLEEPER_MAX_CONNECTIONS", "20")),
+                max_keepalive_connections=int(os.getenv("SLEEPER_MAX_KEEPALIVE", "10")),
+                keepalive_expiry=60
+            )
+        )
+    
+    async def _get_json(self, path: str, cache_kind: Optional[str]) -> Optional[Any]:
+        """GET a Sleeper endpoint through the response cache and rate limiter"""
+        url = f"{self.base_url}{path}"
+        if cache_kind is not None:
+            cached = self.cache.get(url)
+            if cached is not None:
+                return cached
+        
+        await self.rate_limiter.acquire()
+        response = await self.client.get(url)
+        if response.status_code != 200:
+            return None
+        
+        data = response.json()
+        # Sleeper returns null for unknown ids; don't cache those
+        if data is not None and cache_kind is not None:
+            self.cache.set(url, data, ttl=self.cache_ttls[cache_kind])
+        return data
     
     async def get_user_by_username(self, username: str) -> Optional[Dict]:
         """Get user by username"""
         try:
-            response = await self.client.get(f"{self.base_url}/user/{username}")
-            if response.status_code == 200:
-                return response.json()
-            return None
+            return await self._get_json(f"/user/{username}", 'user')
         except Exception as e:
             print(f"Error fetching user: {e}")
             return None
@@ -24,10 +73,7 @@ class SleeperService:
     async def get_user_leagues(self, user_id: str, season: str = "2024") -> List[Dict]:
         """Get all leagues for a user"""
         try:
-            response = await self.client.get(f"{self.base_url}/user/{user_id}/leagues/nfl/{season}")
-            if response.status_code == 200:
-                return response.json()
-            return []
+            return await self._get_json(f"/user/{user_id}/leagues/nfl/{season}", 'user_leagues') or []
         except Exception as e:
             print(f"Error fetching leagues: {e}")
             return []
@@ -35,10 +81,7 @@ class SleeperService:
     async def get_league_rosters(self, league_id: str) -> List[Dict]:
         """Get all rosters for a league"""
         try:
-            response = await self.client.get(f"{self.base_url}/league/{league_id}/rosters")
-            if response.status_code == 200:
-                return response.json()
-            return []
+            return await self._get_json(f"/league/{league_id}/rosters", 'rosters') or []
         except Exception as e:
             print(f"Error fetching rosters: {e}")
             return []
@@ -46,10 +89,7 @@ class SleeperService:
     async def get_league_users(self, league_id: str) -> List[Dict]:
         """Get all users in a league"""
         try:
-            response = await self.client.get(f"{self.base_url}/league/{league_id}/users")
-            if response.status_code == 200:
-                return response.json()
-            return []
+            return await self._get_json(f"/league/{league_id}/users", 'league_users') or []
         except Exception as e:
             print(f"Error fetching league users: {e}")
             return []
@@ -57,21 +97,16 @@ class SleeperService:
     async def get_league_matchups(self, league_id: str, week: int) -> List[Dict]:
         """Get matchups for a specific week"""
         try:
-            response = await self.client.get(f"{self.base_url}/league/{league_id}/matchups/{week}")
-            if response.status_code == 200:
-                return response.json()
-            return []
+            return await self._get_json(f"/league/{league_id}/matchups/{week}", 'matchups') or []
         except Exception as e:
             print(f"Error fetching matchups: {e}")
             return []
     
     async def get_players(self) -> Dict:
-        """Get all NFL players"""
+        """Get all NFL players (several MB; use PlayerDirectory for lookups)"""
         try:
-            response = await self.client.get(f"{self.base_url}/players/nfl")
-            if response.status_code == 200:
-                return response.json()
-            return {}
+            # Not cached here: PlayerDirectory keeps a trimmed copy instead
+            return await self._get_json("/players/nfl", None) or {}
         except Exception as e:
             print(f"Error fetching players: {e}")
             return {}
@@ -80,14 +115,11 @@ class SleeperService:
         """Get player stats for a season/week"""
         try:
             if week:
-                url = f"{self.base_url}/players/nfl/stats/{player_id}/{season}/{week}"
+                path = f"/players/nfl/stats/{player_id}/{season}/{week}"
             else:
-                url = f"{self.base_url}/players/nfl/stats/{player_id}/{season}"
+                path = f"/players/nfl/stats/{player_id}/{season}"
             
-            response = await self.client.get(url)
-            if response.status_code == 200:
-                return response.json()
-            return {}
+            return await self._get_json(path, 'player_stats') or {}
         except Exception as e:
             print(f"Error fetching player stats: {e}")
             return {}
@@ -107,10 +139,7 @@ class SleeperService:
     async def get_league_info(self, league_id: str) -> Optional[Dict]:
         """Get league information"""
         try:
-            response = await self.client.get(f"{self.base_url}/league/{league_id}")
-            if response.status_code == 200:
-                return response.json()
-            return None
+            return await self._get_json(f"/league/{league_id}", 'league')
         except Exception as e:
             print(f"Error fetching league info: {e}")
             return None
@@ -118,3 +147,20 @@ class SleeperService:
     async def close(self):
         """Close the HTTP client"""
         await self.client.aclose()
+
+# Application-lifetime client, opened and closed by the FastAPI lifespan
+_sleeper_service: Optional[SleeperService] = None
+
+def get_sleeper_service() -> SleeperService:
+    """Get the shared SleeperService (usable as a FastAPI dependency)"""
+    global _sleeper_service
+    if _sleeper_service is None:
+        _sleeper_service = SleeperService()
+    return _sleeper_service
+
+async def close_sleeper_service():
+    """Close the shared SleeperService's connection pool"""
+    global _sleeper_service
+    if _sleeper_service is not None:
+        await _sleeper_service.close()
+        _sleeper_service = None
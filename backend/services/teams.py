@@ -0,0 +1,50 @@
+from typing import Optional, Tuple
+
+# nflverse team abbreviation -> (location, nickname)
+TEAM_NAMES = {
+    'ARI': ('Arizona', 'Cardinals'),
+    'ATL': ('Atlanta', 'Falcons'),
+    'BAL': ('Baltimore', 'Ravens'),
+    'BUF': ('Buffalo', 'Bills'),
+    'CAR': ('Carolina', 'Panthers'),
+    'CHI': ('Chicago', 'Bears'),
+    'CIN': ('Cincinnati', 'Bengals'),
+    'CLE': ('Cleveland', 'Browns'),
+    'DAL': ('Dallas', 'Cowboys'),
+    'DEN': ('Denver', 'Broncos'),
+    'DET': ('Detroit', 'Lions'),
+    'GB': ('Green Bay', 'Packers'),
+    'HOU': ('Houston', 'Texans'),
+    'IND': ('Indianapolis', 'Colts'),
+    'JAX': ('Jacksonville', 'Jaguars'),
+    'KC': ('Kansas City', 'Chiefs'),
+    'LA': ('Los Angeles', 'Rams'),
+    'LAC': ('Los Angeles', 'Chargers'),
+    'LV': ('Las Vegas', 'Raiders'),
+    'MIA': ('Miami', 'Dolphins'),
+    'MIN': ('Minnesota', 'Vikings'),
+    'NE': ('New England', 'Patriots'),
+    'NO': ('New Orleans', 'Saints'),
+    'NYG': ('New York', 'Giants'),
+    'NYJ': ('New York', 'Jets'),
+    'PHI': ('Philadelphia', 'Eagles'),
+    'PIT': ('Pittsburgh', 'Steelers'),
+    'SEA': ('Seattle', 'Seahawks'),
+    'SF': ('San Francisco', '49ers'),
+    'TB': ('Tampa Bay', 'Buccaneers'),
+    'TEN': ('Tennessee', 'Titans'),
+    'WAS': ('Washington', 'Commanders'),
+}
+
+def team_nickname(team: Optional[str]) -> str:
+    """Nickname for an abbreviation ("KC" -> "Chiefs"), or the abbreviation itself"""
+    if not team:
+        return ''
+    return TEAM_NAMES.get(team, (team, team))[1]
+
+def parse_game_id(game_id: str) -> Tuple[Optional[str], Optional[str]]:
+    """Away and home team from an nflverse game id (2024_03_BUF_KC)"""
+    parts = str(game_id).split('_')
+    if len(parts) != 4:
+        return None, None
+    return parts[2], parts[3]
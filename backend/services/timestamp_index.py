@@ -0,0 +1,179 @@
+import re
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Tuple
+
+# 1:23, 12:34 or 1:02:03 at the start of a chapter line
+_TIMESTAMP = re.compile(r'^\s*[\[(]?((?:\d{1,2}:)?\d{1,2}:\d{2})[\])]?\s*[-–—|:]?\s*(.*)$')
+_TOKEN = re.compile(r"[a-z0-9']+")
+_QUARTER = re.compile(r"\b(?:q([1-4])|([1-4])(?:st|nd|rd|th) quarter|quarter ([1-4]))\b|\b(ot|overtime)\b")
+_ISO_DURATION = re.compile(r'^P(?:(\d+)D)?T?(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?$')
+_VTT_CUE = re.compile(r'^((?:\d{1,2}:)?\d{1,2}:\d{2})(?:\.\d+)?\s*-->')
+
+NAME_SUFFIXES = {'jr', 'sr', 'ii', 'iii', 'iv', 'v'}
+
+# Words a chapter title uses for each nflverse play type
+PLAY_TYPE_KEYWORDS = {
+    'pass': {'pass', 'catch', 'reception', 'throw', 'touchdown', 'td', 'score'},
+    'run': {'run', 'rush', 'scramble', 'touchdown', 'td', 'score'},
+    'field_goal': {'fg', 'field', 'kick'},
+    'extra_point': {'pat', 'extra', 'kick'},
+    'punt': {'punt', 'return'},
+    'kickoff': {'kickoff', 'return'},
+}
+
+# Seconds of highlights per quarter when nothing better is known
+DEFAULT_QUARTER_SECONDS = 240
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+def parse_clock(value: str) -> int:
+    """'1:02:03' -> 3723, '12:34' -> 754"""
+    seconds = 0
+    for part in value.split(':'):
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+def parse_iso_duration(duration: Optional[str]) -> Optional[int]:
+    """ISO 8601 video duration ('PT12M34S') in seconds"""
+    match = _ISO_DURATION.match(duration or '')
+    if not match or not any(match.groups()):
+        return None
+    days, hours, minutes, seconds = (int(group or 0) for group in match.groups())
+    return ((days * 24 + hours) * 60 + minutes) * 60 + seconds
+
+def parse_webvtt(captions: str) -> List[Tuple[int, str]]:
+    """(start second, text) cues from a WebVTT caption track"""
+    cues = []
+    start = None
+    lines: List[str] = []
+    for line in captions.splitlines() + ['']:
+        match = _VTT_CUE.match(line.strip())
+        if match:
+            start, lines = parse_clock(match.group(1)), []
+        elif not line.strip():
+            if start is not None and lines:
+                cues.append((start, ' '.join(lines)))
+            start, lines = None, []
+        elif start is not None:
+            lines.append(re.sub(r'<[^>]+>', '', line.strip()))
+    return cues
+
+def player_tokens(player_name: Optional[str]) -> List[str]:
+    """Last name (without suffixes) used to find a player in chapter titles"""
+    tokens = [token for token in tokenize(player_name or '') if token not in NAME_SUFFIXES]
+    if not tokens or player_name == "Unknown Player":
+        return []
+    return tokens[-1:]
+
+class TimestampIndex:
+    """Sorted (seconds, tokens) entries for one video, parsed once and reused for every play"""
+
+    def __init__(self, entries: List[Tuple[int, List[str]]], duration: Optional[int] = None):
+        self.entries = sorted(entries, key=lambda entry: entry[0])
+        self.seconds = [seconds for seconds, _ in self.entries]
+        self.duration = duration
+
+        # Token -> entry positions, and where each quarter starts
+        self.positions: Dict[str, List[int]] = {}
+        self.quarter_starts: Dict[int, int] = {}
+        for position, (seconds, tokens) in enumerate(self.entries):
+            for token in set(tokens):
+                self.positions.setdefault(token, []).append(position)
+            quarter = _quarter_of(' '.join(tokens))
+            if quarter and quarter not in self.quarter_starts:
+                self.quarter_starts[quarter] = seconds
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @classmethod
+    def build(cls, description: Optional[str], duration: Optional[str] = None,
+              captions: Optional[str] = None) -> "TimestampIndex":
+        """Index the chapter lines of a description, plus caption cues when available"""
+        entries = []
+        for line in (description or '').splitlines():
+            match = _TIMESTAMP.match(line)
+            if match and match.group(2).strip():
+                entries.append((parse_clock(match.group(1)), tokenize(match.group(2))))
+        if captions:
+            entries.extend((seconds, tokenize(text)) for seconds, text in parse_webvtt(captions))
+        return cls(entries, parse_iso_duration(duration))
+
+    def to_json(self) -> Dict:
+        return {'entries': [[seconds, tokens] for seconds, tokens in self.entries], 'duration': self.duration}
+
+    @classmethod
+    def from_json(cls, data: Optional[Dict]) -> "TimestampIndex":
+        data = data or {}
+        return cls([(seconds, tokens) for seconds, tokens in data.get('entries', [])], data.get('duration'))
+
+    def quarter_window(self, quarter: Optional[int]) -> Tuple[int, Optional[int]]:
+        """Seconds range covered by a quarter's chapters ((0, None) when unknown)"""
+        if not quarter or quarter not in self.quarter_starts:
+            return 0, None
+        start = self.quarter_starts[quarter]
+        later = [seconds for q, seconds in self.quarter_starts.items() if q > quarter and seconds > start]
+        return start, min(later) if later else self.duration
+
+    def expected_seconds(self, quarter: Optional[int], game_seconds_remaining: Optional[float]) -> int:
+        """Where a play should fall if highlights are spread evenly over the game"""
+        quarter = quarter or 1
+        start, end = self.quarter_window(quarter)
+        if end is not None and quarter in self.quarter_starts:
+            # Position within the quarter's own chapters
+            quarter_elapsed = 0.5
+            if game_seconds_remaining is not None:
+                quarter_elapsed = ((3600 - game_seconds_remaining) - (quarter - 1) * 900) / 900
+            return int(start + min(max(quarter_elapsed, 0.0), 1.0) * (end - start))
+
+        if game_seconds_remaining is not None:
+            game_elapsed = min(max((3600 - game_seconds_remaining) / 3600, 0.0), 1.0)
+        else:
+            game_elapsed = (quarter - 0.5) / 4
+        if self.duration:
+            return int(game_elapsed * self.duration)
+        return int(game_elapsed * 4 * DEFAULT_QUARTER_SECONDS)
+
+    def lookup(self, tokens: List[str], start: int = 0, end: Optional[int] = None) -> List[int]:
+        """Positions of entries containing every token, within [start, end) seconds"""
+        low = bisect_left(self.seconds, start)
+        high = bisect_left(self.seconds, end) if end is not None else len(self.entries)
+        matches = None
+        for token in tokens:
+            found = {position for position in self.positions.get(token, ()) if low <= position < high}
+            matches = found if matches is None else matches & found
+        return sorted(matches or ())
+
+    def nearest(self, seconds: int) -> Optional[int]:
+        """Start of the chapter playing at the given second"""
+        position = bisect_right(self.seconds, seconds) - 1
+        return self.seconds[position] if position >= 0 else None
+
+    def align(self, play_data: Dict) -> int:
+        """Start second of a play in the video"""
+        quarter = play_data.get('quarter')
+        expected = self.expected_seconds(quarter, play_data.get('game_clock'))
+
+        name = player_tokens(play_data.get('player_name'))
+        if name and self.entries:
+            start, end = self.quarter_window(quarter)
+            candidates = self.lookup(name, start, end) or self.lookup(name)
+            if candidates:
+                # Prefer chapters that also name the play type, then the one closest to the expected time
+                keywords = PLAY_TYPE_KEYWORDS.get(play_data.get('play_type') or '', set())
+                best = min(candidates, key=lambda position: (
+                    not keywords.intersection(self.entries[position][1]),
+                    abs(self.seconds[position] - expected)
+                ))
+                return self.seconds[best]
+
+        return expected
+
+def _quarter_of(text: str) -> Optional[int]:
+    match = _QUARTER.search(text)
+    if not match:
+        return None
+    if match.group(4):
+        return 5
+    return int(next(group for group in match.groups()[:3] if group))
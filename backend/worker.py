@@ -0,0 +1,72 @@
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+from dotenv import load_dotenv
+
+from database import SessionLocal, engine
+from migrations import run_migrations
+from services.job_queue import get_job_queue
+from services.highlight_pipeline import run_highlight_jobs
+from services.sleeper_service import close_sleeper_service
+
+# Load environment variables
+load_dotenv()
+
+async def run_worker(worker_id: str, stop_event) -> None:
+    """Claim and run highlight jobs until asked to stop"""
+    job_queue = get_job_queue()
+    try:
+        while not stop_event.is_set():
+            db = SessionLocal()
+            try:
+                jobs = job_queue.claim_batch(db, worker_id)
+                if jobs:
+                    print(f"[{worker_id}] running {len(jobs)} job(s) for "
+                          f"season {jobs[0].season} week {jobs[0].week}")
+                    await run_highlight_jobs(db, jobs, worker_id)
+            except Exception as e:
+                print(f"[{worker_id}] error claiming jobs: {e}")
+                jobs = []
+            finally:
+                db.close()
+
+            if not jobs:
+                job_queue.wait()
+    finally:
+        await close_sleeper_service()
+
+def worker_main(worker_id: str, stop_event) -> None:
+    # The parent handles Ctrl+C and tells workers to stop through stop_event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Connections inherited from the parent must not be shared
+    engine.dispose()
+    asyncio.run(run_worker(worker_id, stop_event))
+
+def main():
+    run_migrations(engine)
+
+    worker_count = int(os.getenv("HIGHLIGHT_WORKERS", "2"))
+    context = multiprocessing.get_context("spawn")
+    stop_event = context.Event()
+    hostname = socket.gethostname()
+
+    processes = [
+        context.Process(target=worker_main, args=(f"{hostname}-{os.getpid()}-{index}", stop_event))
+        for index in range(worker_count)
+    ]
+    for process in processes:
+        process.start()
+
+    def stop(signum, frame):
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for process in processes:
+        process.join()
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import {
   View,
   Text,
@@ -19,16 +19,36 @@ export default function HighlightsScreen({ navigation, route }) {
   const [refreshing, setRefreshing] = useState(false);
   const [currentWeek, setCurrentWeek] = useState(1);
   const [generating, setGenerating] = useState(false);
+  const [progress, setProgress] = useState(null);
+  // X-Next-Cursor of the last page loaded; null once the whole week is shown
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const closeStream = useRef(null);
+  // Changes with every first-page load, so pages requested for an earlier week are dropped
+  const feedKey = useRef(0);
 
   useEffect(() => {
     loadHighlights();
   }, [leagueId, currentWeek]);
 
+  // Stop following a job when the week changes or the screen closes
+  useEffect(() => () => stopStream(), [leagueId, currentWeek]);
+
+  const stopStream = () => {
+    if (closeStream.current) {
+      closeStream.current();
+      closeStream.current = null;
+    }
+  };
+
   const loadHighlights = async () => {
     setLoading(true);
+    const key = ++feedKey.current;
     try {
       const response = await highlightsAPI.getHighlightsForWeek(leagueId, currentWeek);
+      if (key !== feedKey.current) return;
       setHighlights(response.data);
+      setNextCursor(response.headers['x-next-cursor'] || null);
     } catch (error) {
       console.error('Error loading highlights:', error);
       Alert.alert('Error', 'Failed to load highlights');
@@ -37,29 +57,64 @@ export default function HighlightsScreen({ navigation, route }) {
     }
   };
 
+  const loadMoreHighlights = async () => {
+    if (!nextCursor || loadingMore || loading) return;
+    setLoadingMore(true);
+    const key = feedKey.current;
+    try {
+      const response = await highlightsAPI.getHighlightsForWeek(leagueId, currentWeek, nextCursor);
+      if (key !== feedKey.current) return;
+      setHighlights((current) => {
+        // Highlights streamed in by a running job may already be in the list
+        const seen = new Set(current.map((highlight) => highlight.id));
+        return [...current, ...response.data.filter((highlight) => !seen.has(highlight.id))];
+      });
+      setNextCursor(response.headers['x-next-cursor'] || null);
+    } catch (error) {
+      console.error('Error loading more highlights:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleRefresh = async () => {
     setRefreshing(true);
     await loadHighlights();
     setRefreshing(false);
   };
 
+  const handleJobEvent = (event) => {
+    if (event.type === 'highlight') {
+      // Add or replace the highlight as soon as the job saves it
+      setHighlights((current) => [
+        ...current.filter((highlight) => highlight.id !== event.data.id),
+        event.data,
+      ]);
+    } else if (event.type === 'progress') {
+      setProgress(event.data);
+    } else if (event.type === 'completed' || event.type === 'failed') {
+      stopStream();
+      setProgress(null);
+      setGenerating(false);
+      if (event.type === 'failed') {
+        Alert.alert('Error', 'Failed to generate highlights');
+      }
+    }
+  };
+
   const handleGenerateHighlights = async () => {
     setGenerating(true);
     try {
-      await highlightsAPI.generateHighlights({
+      const response = await highlightsAPI.generateHighlights({
         league_id: leagueId,
         week: currentWeek,
         season: 2024,
       });
       
-      Alert.alert(
-        'Highlights Generating',
-        'Your highlights are being processed. This may take a few minutes.',
-        [{ text: 'OK', onPress: () => loadHighlights() }]
-      );
+      stopStream();
+      closeStream.current = highlightsAPI.streamJobEvents(response.data.job_id, handleJobEvent);
     } catch (error) {
       Alert.alert('Error', 'Failed to generate highlights');
-    } finally {
       setGenerating(false);
     }
   };
@@ -144,7 +199,9 @@ export default function HighlightsScreen({ navigation, route }) {
             disabled={generating}
           >
             <Text style={styles.generateButtonText}>
-              {generating ? 'Generating...' : 'Generate Highlights'}
+              {generating
+                ? `Generating... ${progress ? `${progress.highlights_found} found, ${progress.clips_resolved} clips` : ''}`
+                : 'Generate Highlights'}
             </Text>
           </TouchableOpacity>
         </View>
@@ -154,6 +211,11 @@ export default function HighlightsScreen({ navigation, route }) {
           renderItem={renderHighlightItem}
           keyExtractor={(item) => item.id.toString()}
           style={styles.highlightsList}
+          onEndReached={loadMoreHighlights}
+          onEndReachedThreshold={0.5}
+          ListFooterComponent={
+            loadingMore ? <ActivityIndicator style={styles.footerLoader} color="#007AFF" /> : null
+          }
           refreshControl={
             <RefreshControl
               refreshing={refreshing}
@@ -239,6 +301,9 @@ const styles = StyleSheet.create({
   highlightsList: {
     flex: 1,
   },
+  footerLoader: {
+    paddingVertical: 15,
+  },
   highlightItem: {
     backgroundColor: '#333',
     borderRadius: 10,
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import {
   View,
   Text,
@@ -15,6 +15,11 @@ export default function PlayerHighlightsScreen({ navigation, route }) {
   const { playerId, playerName, week } = route.params;
   const [highlights, setHighlights] = useState([]);
   const [loading, setLoading] = useState(true);
+  // X-Next-Cursor of the last page loaded; null once every highlight is shown
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  // Changes with every first-page load, so pages requested for another player are dropped
+  const feedKey = useRef(0);
 
   useEffect(() => {
     loadPlayerHighlights();
@@ -22,9 +27,12 @@ export default function PlayerHighlightsScreen({ navigation, route }) {
 
   const loadPlayerHighlights = async () => {
     setLoading(true);
+    const key = ++feedKey.current;
     try {
       const response = await highlightsAPI.getPlayerHighlights(playerId, week);
+      if (key !== feedKey.current) return;
       setHighlights(response.data);
+      setNextCursor(response.headers['x-next-cursor'] || null);
     } catch (error) {
       console.error('Error loading player highlights:', error);
       Alert.alert('Error', 'Failed to load player highlights');
@@ -33,6 +41,22 @@ export default function PlayerHighlightsScreen({ navigation, route }) {
     }
   };
 
+  const loadMoreHighlights = async () => {
+    if (!nextCursor || loadingMore || loading) return;
+    setLoadingMore(true);
+    const key = feedKey.current;
+    try {
+      const response = await highlightsAPI.getPlayerHighlights(playerId, week, nextCursor);
+      if (key !== feedKey.current) return;
+      setHighlights((current) => [...current, ...response.data]);
+      setNextCursor(response.headers['x-next-cursor'] || null);
+    } catch (error) {
+      console.error('Error loading more player highlights:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handlePlayHighlight = (highlight) => {
     if (highlight.clips && highlight.clips.length > 0) {
       navigation.navigate('VideoPlayer', { 
@@ -94,6 +118,11 @@ export default function PlayerHighlightsScreen({ navigation, route }) {
           renderItem={renderHighlightItem}
           keyExtractor={(item) => item.id.toString()}
           style={styles.highlightsList}
+          onEndReached={loadMoreHighlights}
+          onEndReachedThreshold={0.5}
+          ListFooterComponent={
+            loadingMore ? <ActivityIndicator style={styles.footerLoader} color="#007AFF" /> : null
+          }
           ListEmptyComponent={
             <View style={styles.emptyContainer}>
               <Text style={styles.emptyText}>No highlights found for {playerName}</Text>
@@ -147,6 +176,9 @@ const styles = StyleSheet.create({
   highlightsList: {
     flex: 1,
   },
+  footerLoader: {
+    paddingVertical: 15,
+  },
   highlightItem: {
     backgroundColor: '#333',
     borderRadius: 10,
@@ -35,6 +35,32 @@ api.interceptors.response.use(
   }
 );
 
+// Feed pages carry an ETag; sending it back turns an unchanged page into an empty 304
+const MAX_CACHED_FEEDS = 100;
+const cachedFeeds = new Map();
+
+const getWithETag = async (url, params) => {
+  const key = api.getUri({ url, params });
+  const cached = cachedFeeds.get(key);
+  const response = await api.get(url, {
+    params,
+    headers: cached ? { 'If-None-Match': cached.etag } : {},
+    validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
+  });
+
+  if (response.status === 304 && cached) {
+    return { ...response, status: 200, data: cached.data };
+  }
+  if (response.headers.etag) {
+    cachedFeeds.delete(key);
+    cachedFeeds.set(key, { etag: response.headers.etag, data: response.data });
+    if (cachedFeeds.size > MAX_CACHED_FEEDS) {
+      cachedFeeds.delete(cachedFeeds.keys().next().value);
+    }
+  }
+  return response;
+};
+
 export const authAPI = {
   register: (userData) => api.post('/auth/register', userData),
   login: (credentials) => api.post('/auth/login', credentials),
@@ -50,8 +76,97 @@ export const leaguesAPI = {
 
 export const highlightsAPI = {
   generateHighlights: (requestData) => api.post('/highlights/generate', requestData),
-  getHighlightsForWeek: (leagueId, week) => api.get(`/highlights/league/${leagueId}/week/${week}`),
-  getPlayerHighlights: (playerId, week) => api.get(`/highlights/player/${playerId}/week/${week}`),
+  // Pass the previous response's X-Next-Cursor header to get the next page
+  getHighlightsForWeek: (leagueId, week, cursor) => getWithETag(`/highlights/league/${leagueId}/week/${week}`, { cursor }),
+  getPlayerHighlights: (playerId, week, cursor) => api.get(`/highlights/player/${playerId}/week/${week}`, { params: { cursor } }),
+  streamJobEvents: (jobId, onEvent, lastEventId) => streamJobEvents(jobId, onEvent, lastEventId),
 };
 
+// Reconnect delay after a dropped stream, doubled per failed attempt up to the max
+const STREAM_RETRY_MS = 1000;
+const STREAM_MAX_RETRY_MS = 30000;
+
+// Follow a generation job's Server-Sent Events (progress, highlight, completed, failed).
+// XMLHttpRequest works in React Native and browsers and can send the auth header,
+// which EventSource can't. A dropped stream reconnects with Last-Event-ID, so no
+// events are missed or repeated. Returns a function that closes the stream.
+function streamJobEvents(jobId, onEvent, lastEventId) {
+  let xhr = null;
+  let retryTimer = null;
+  let retryMs = STREAM_RETRY_MS;
+  let lastId = lastEventId;
+  let closed = false;
+
+  const connect = () => {
+    const request = new XMLHttpRequest();
+    let offset = 0;
+    let buffer = '';
+    xhr = request;
+
+    request.open('GET', `${API_BASE_URL}/highlights/jobs/${jobId}/events`);
+    const token = localStorage.getItem('access_token');
+    if (token) {
+      request.setRequestHeader('Authorization', `Bearer ${token}`);
+    }
+    if (lastId) {
+      request.setRequestHeader('Last-Event-ID', String(lastId));
+    }
+
+    const readMessages = () => {
+      buffer += request.responseText.slice(offset);
+      offset = request.responseText.length;
+
+      const messages = buffer.split('\n\n');
+      buffer = messages.pop();
+      messages.forEach((message) => {
+        const event = { id: null, type: 'message', data: '' };
+        message.split('\n').forEach((line) => {
+          if (line.startsWith('id: ')) event.id = Number(line.slice(4));
+          else if (line.startsWith('event: ')) event.type = line.slice(7);
+          else if (line.startsWith('data: ')) event.data += line.slice(6);
+        });
+        if (event.id) {
+          lastId = event.id;
+        }
+        if (event.data) {
+          retryMs = STREAM_RETRY_MS;
+          if (event.type === 'completed' || event.type === 'failed') {
+            closed = true;
+          }
+          onEvent({ ...event, data: JSON.parse(event.data) });
+        }
+      });
+    };
+
+    request.onprogress = readMessages;
+    request.onloadend = () => {
+      if (closed) {
+        return;
+      }
+      readMessages();
+      if (closed) {
+        return;
+      }
+      if (request.status >= 400 && request.status < 500) {
+        // Signed out, or the job is gone: retrying won't help
+        closed = true;
+        onEvent({ id: null, type: 'failed', data: { status: 'failed', error: `HTTP ${request.status}` } });
+        return;
+      }
+      // The connection dropped before the job finished; resume after the last event seen
+      retryTimer = setTimeout(connect, retryMs);
+      retryMs = Math.min(retryMs * 2, STREAM_MAX_RETRY_MS);
+    };
+    request.send();
+  };
+
+  connect();
+
+  return () => {
+    closed = true;
+    clearTimeout(retryTimer);
+    xhr.abort();
+  };
+}
+
 export default api;